@@ -13,86 +13,98 @@ import threading
 from src.iBotViewApp import IBotView
 from src.OrderManager import OrderManager
 from src.strategies.tv_signal_overlays_helper import reverse_position_quantity_adjustment_helper
+from src.utils.webhook_ingest import AlertError, OrderWorkers, parse_alert, run_server
+from src.utils.idempotency_cache import IdempotencyCache, alert_key
+from src.utils.order_id_allocator import OrderIdAllocator
+from src.utils.position_cache import PositionCache
 
 """
 Main Flask app that receives requests from TradingView and places orders on IBKR
 
-Usage: python iBotView.py <webhook_port> <port> <client_id>
+Usage: python iBotView.py <webhook_port> <port> <client_id> [--async]
 
 Arguments:
     webhook_port: Port for webhook (defaults to 5678)
     port: IB Gateway port (defaults to 7497 for paper trading)
     client_id: Custom client ID (randomly generated if not provided)
+    --async: serve the webhook with aiohttp, alerts are validated, answered
+        with 202 and placed by order worker threads (see utils.webhook_ingest)
 
 Examples:
     python iBotView.py 5678                  # Paper Trading (port 7497)
     python iBotView.py 5678 7496             # Live Trading
     python iBotView.py 5678 7496 888         # Live Trading with custom client ID
+    python iBotView.py 5678 7497 --async     # Paper Trading, asynchronous ingestion
 """
 
 # Parse command line arguments
 WEBHOOK_PORT = int(sys.argv[1]) if len(sys.argv) > 1 else 5678
 IB_PORT = int(sys.argv[2]) if len(sys.argv) > 2 and sys.argv[2].isdigit() else 7497
-DEFAULT_QUANTITY = 1
+ASYNC_INGEST = '--async' in sys.argv
+ORDER_WORKERS = 4
+# TradingView retries within seconds, keep alert keys for 5 minutes
+ALERT_TTL_SECONDS = 300
 
 app = Flask(__name__)
 
 # Initialize IBKRClient
-ibkr = IBotView(port=IB_PORT)
-orderManager = OrderManager(port=IB_PORT)
+# Positions are kept current from IBotView's position stream and OrderManager's fills
+position_cache = PositionCache()
+# One id sequence for every order placed by this process
+order_ids = OrderIdAllocator()
+ibkr = IBotView(port=IB_PORT, order_id_allocator=order_ids, position_cache=position_cache)
+orderManager = OrderManager(port=IB_PORT, order_id_allocator=order_ids, position_cache=position_cache)
+# Retried alerts are answered from here and never reach orderManager
+alert_cache = IdempotencyCache(ttl=ALERT_TTL_SECONDS, redis_client=ibkr.redis)
 
 @app.route('/webhook', methods=['POST'])
 def webhook():
     """Handle incoming webhook requests from TradingView"""
     try:
-        # Parse incoming JSON data
-        data_str = request.data.decode('utf-8')
-        print("Received data:", json.dumps(json.loads(data_str), indent=2))
-        data = json.loads(data_str)
-        
-    except json.JSONDecodeError as e:
-        print(f"JSON decode error: {e}")
-        return "Invalid JSON", 400
-
-    # Validate required fields
-    required_fields = ['ticker', 'action', 'contract', 'order', 'price', 'reason']
-    for field in required_fields:
-        if field not in data:
-            return f"Missing required field: {field}", 400
-
-    # Extract order parameters
-    symbol = data.get('ticker')  # MES1!, MGC1!, AAPL
-    contract_type = data.get('contract')  # STK, FUT
-    exchange = data.get('exchange', None)  # SMART, CME, NYSE, etc
-    
-    # Handle futures contract symbols
-    if contract_type == "FUT":
-        symbol = symbol[:-2] if symbol[-1] == '!' and symbol[-2].isdigit() else symbol
-
-    order_type = data.get('order')  # MKT, LMT
-    action = data.get('action').upper()  # BUY, SELL
-    reason = data.get('reason').lower()  # Open-Long, Open-Short, Close-Long, Close-Short
-    
-    try:
-        price = float(data.get('price', 0))
-        quantity = int(data.get('quantity', DEFAULT_QUANTITY))
-    except ValueError as e:
-        return f"Invalid price or quantity format: {str(e)}", 400
-
-    # Adjust quantity based on current position 
-    adjusted_quantity = reverse_position_quantity_adjustment_helper(ibkr.positions.get(symbol, 0), 
-                                                                    symbol, action, quantity, reason)
+        alert = parse_alert(request.get_data())
+    except AlertError as e:
+        print(f"Invalid alert: {e}")
+        return str(e), 400
+
+    # Redis errors fall back to the in-memory cache inside claim/complete/release
+    key = alert_key(alert)
+    cached = alert_cache.claim(key) if key is not None else None
+    if cached is not None:
+        print(f"Duplicate alert for {alert['symbol']} {alert['action']}, answered from cache")
+        return cached
 
     try:
-        # Place order on IBKR        
-        order_id = orderManager.place_order(symbol, contract_type, order_type, action, adjusted_quantity, price)
-        ibkr.record_order(order_id, symbol, contract_type, action, order_type, adjusted_quantity, price)
-                
+        handle_alert(alert)
     except Exception as e:
         print(f"Error executing strategy: {e}")
+        if key is not None:
+            alert_cache.release(key)
         return "Strategy execution failed", 400
     
-    return "Order placed successfully", 200  # Add return statement for successful case
+    response = ("Order placed successfully", 200)
+    if key is not None:
+        alert_cache.complete(key, response)
+    return response
+
+@app.route('/webhook/stats', methods=['GET'])
+def webhook_stats():
+    """Idempotency cache hits and misses, a burst of hits is a retry storm"""
+    return alert_cache.get_stats()
+
+def handle_alert(alert):
+    """Place and record the order for a parsed alert, see utils.webhook_ingest.parse_alert"""
+    print("Received data:", json.dumps(alert['raw'], indent=2))
+    symbol = alert['symbol']
+
+    # Adjust quantity based on current position 
+    adjusted_quantity = reverse_position_quantity_adjustment_helper(position_cache.get(symbol, 0), 
+                                                                    symbol, alert['action'], alert['quantity'], alert['reason'])
+
+    # Place order on IBKR        
+    ticket = orderManager.place_order(symbol, alert['contract_type'], alert['order_type'], alert['action'],
+                                      adjusted_quantity, alert['price'])
+    ibkr.record_order(ticket.order_id, symbol, alert['contract_type'], alert['action'], alert['order_type'],
+                      adjusted_quantity, alert['price'])
 
 def start_ibkr():
     """Initialize and start IB connection with retry logic"""
@@ -111,7 +123,7 @@ def start_ibkr():
             if retry_count < max_retries:
                 new_client_id = random.randint(8000, 8999)
                 print(f"Attempting to reconnect with new client ID: {new_client_id}")
-                ibkr = IBotView(port=IB_PORT)
+                ibkr = IBotView(port=IB_PORT, order_id_allocator=order_ids, position_cache=position_cache)
                 ibkr.client_id = new_client_id
             else:
                 print("Max retries reached. Exiting.")
@@ -142,7 +154,18 @@ def reverse_position_quantity_adjustment_helper(current_position, symbol, action
 def start_flask():
     """Start Flask web server"""
     print("Please ensure ngrok is running and connected to this port: 5678")
-    app.run(debug=True, port=WEBHOOK_PORT)
+    # No debug reloader, it would start a second process with its own IB connections
+    app.run(debug=False, port=WEBHOOK_PORT, threaded=True)
+
+
+def start_async_server():
+    """Start the aiohttp server, orders are placed by the worker threads"""
+    print(f"Please ensure ngrok is running and connected to this port: {WEBHOOK_PORT}")
+    workers = OrderWorkers(handle_alert, num_workers=ORDER_WORKERS, idempotency=alert_cache)
+    try:
+        run_server(workers, port=WEBHOOK_PORT)
+    finally:
+        workers.close()
 
 
 if __name__ == '__main__':
@@ -159,5 +182,8 @@ if __name__ == '__main__':
             sys.exit(1)
         time.sleep(0.1)
 
-    # Start Flask app in the main thread
-    start_flask()
+    # Start the webhook server in the main thread
+    if ASYNC_INGEST:
+        start_async_server()
+    else:
+        start_flask()
@@ -9,6 +9,7 @@ class TradingApp(EWrapper, EClient):
         EClient.__init__(self, self)
         self.client_id = random.randint(9000, 9999)
         self.signal_processor = SignalProcessor(self)
+        self.req_id_to_symbol = {}
         
         # Initialize strategies
         symbols = ["MES", "MNQ", "MGC", "MBT"]  # Example symbols
@@ -27,22 +28,21 @@ class TradingApp(EWrapper, EClient):
         """Start the trading process"""
         print("Starting trading system...")
         
-        # Request market data for all symbols
-        for symbol in self.signal_processor.active_symbols:
+        # Request market data for all symbols, one request id per symbol
+        for req_id, symbol in enumerate(sorted(self.signal_processor.active_symbols), start=1):
             # Request real-time data
+            self.req_id_to_symbol[req_id] = symbol
             contract = self.signal_processor._create_contract(symbol)
-            self.reqMktData(1, contract, "", False, False, [])
+            self.reqMktData(req_id, contract, "", False, False, [])
 
     def tickPrice(self, reqId, tickType, price, attrib):
         """Handle price updates"""
-        # Update strategy with new prices
-        symbol = self.get_symbol_for_reqId(reqId)  # You'll need to implement this
-        for strategy in self.signal_processor.strategies:
-            if isinstance(strategy, SimpleMovingAverageStrategy):
-                strategy.update_price(symbol, price)
-
-        # Process signals
-        self.signal_processor.process_signals()
+        symbol = self.req_id_to_symbol.get(reqId)
+        if symbol is None:
+            return
+
+        # Only the strategies subscribed to this symbol are updated and evaluated
+        self.signal_processor.on_price(symbol, price)
 
 def main():
     app = TradingApp()
@@ -0,0 +1,151 @@
+"""
+Memory-mapped columnar bar cache
+
+Each (source db, symbol, barsize) series is materialized once into one .npy
+file per column (timestamp, open, high, low, close, volume). Later loads map
+those files read-only with np.load(mmap_mode='r'), so nothing is parsed or
+copied until the data is touched. The cache entry is rebuilt whenever the
+source database (or its WAL file) changes size or modification time.
+
+Usage:
+    python DataBarCache.py <db_path> [symbol] [barsize]
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+
+import numpy as np
+import pandas as pd
+
+from DataBarStore import BarStore, BAR_COLUMNS, decode_legacy_blobs, parse_legacy_file_name
+from utils.barsize_valid_check import barsize_to_seconds
+
+DEFAULT_CACHE_DIR = "data/cache"
+CACHE_VERSION = 1
+
+
+class BarCache:
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def source_signature(self, db_path):
+        """Size and mtime of the db and its WAL file, changes whenever the data does"""
+        signature = {'version': CACHE_VERSION}
+        for suffix in ('', '-wal'):
+            path = db_path + suffix
+            if os.path.exists(path):
+                stat = os.stat(path)
+                signature[f"size{suffix}"] = stat.st_size
+                signature[f"mtime_ns{suffix}"] = stat.st_mtime_ns
+        return signature
+
+    def entry_dir(self, db_path, symbol, barsize):
+        source_id = hashlib.sha1(os.path.abspath(db_path).encode()).hexdigest()[:12]
+        return os.path.join(self.cache_dir, f"{source_id}_{symbol}_{barsize}s")
+
+    def is_valid(self, entry, signature):
+        meta_path = os.path.join(entry, "meta.json")
+        if not os.path.exists(meta_path):
+            return False
+        with open(meta_path) as f:
+            return json.load(f).get('signature') == signature
+
+    def load(self, db_path, symbol, barsize=None):
+        """
+        Columns of one series as read-only memory-mapped NumPy arrays.
+        barsize may be omitted for legacy files, it is then taken from the file name.
+        """
+        if not os.path.exists(db_path):
+            raise FileNotFoundError(f"Source database not found: {db_path}")
+
+        if barsize is None:
+            parsed = parse_legacy_file_name(db_path)
+            if parsed is None:
+                raise ValueError(f"barsize is required, it cannot be inferred from {db_path}")
+            barsize = parsed[1]
+        barsize = barsize_to_seconds(barsize)
+
+        entry = self.entry_dir(db_path, symbol, barsize)
+        signature = self.source_signature(db_path)
+        if not self.is_valid(entry, signature):
+            self.materialize(db_path, symbol, barsize, entry, signature)
+
+        return {col: np.load(os.path.join(entry, f"{col}.npy"), mmap_mode='r') for col in BAR_COLUMNS}
+
+    def load_frame(self, db_path, symbol, barsize=None):
+        """DataFrame indexed by timestamp, the same shape clean_data() produces"""
+        arrays = self.load(db_path, symbol, barsize)
+        df = pd.DataFrame({col: arrays[col] for col in BAR_COLUMNS[1:]},
+                          index=pd.to_datetime(np.asarray(arrays['timestamp']), unit='s'))
+        df.index.name = 'timestamp'
+        return df
+
+    def materialize(self, db_path, symbol, barsize, entry, signature):
+        arrays = self.read_source(db_path, symbol, barsize)
+        os.makedirs(entry, exist_ok=True)
+
+        # Drop the meta first so a crash half way leaves the entry invalid
+        meta_path = os.path.join(entry, "meta.json")
+        if os.path.exists(meta_path):
+            os.remove(meta_path)
+
+        for col in BAR_COLUMNS:
+            tmp_path = os.path.join(entry, f"{col}.tmp.npy")
+            np.save(tmp_path, arrays[col])
+            os.replace(tmp_path, os.path.join(entry, f"{col}.npy"))
+
+        with open(meta_path, "w") as f:
+            json.dump({'source': os.path.abspath(db_path), 'symbol': symbol, 'barsize': barsize,
+                       'rows': int(len(arrays['timestamp'])), 'signature': signature}, f)
+
+        print(f"Cached {len(arrays['timestamp'])} {symbol} {barsize}s bars from {db_path}")
+
+    def read_source(self, db_path, symbol, barsize):
+        """Read a series from a BarStore file or a legacy per-day file"""
+        with sqlite3.connect(f"file:{db_path}?mode=ro", uri=True) as db:
+            tables = [name for (name,) in db.execute("SELECT name FROM sqlite_master WHERE type='table'")]
+
+            if not any(t.startswith('bars_') for t in tables):
+                table_name = next((t for t in ('historical_data', 'market_data', 'data') if t in tables), None)
+                if table_name is None:
+                    raise ValueError(f"No bar table found in {db_path}")
+                df = pd.read_sql_query(
+                    f"SELECT timestamp, open, high, low, close, volume FROM {table_name} WHERE symbol = ?",
+                    db, params=(symbol,))
+                return self.clean_legacy_frame(df)
+
+        # Read-only, a research cache must not change the journal mode of the store it reads
+        store = BarStore(db_path, read_only=True)
+        try:
+            return store.query(symbol, barsize)
+        finally:
+            store.close()
+
+    def clean_legacy_frame(self, df):
+        # Same rules as clean_data: drop invalid timestamps and duplicates, sort by time
+        df = decode_legacy_blobs(df)
+        df = df[df['timestamp'] >= 0].drop_duplicates(subset=['timestamp']).sort_values('timestamp')
+
+        arrays = {col: np.ascontiguousarray(df[col].to_numpy(dtype=np.float64)) for col in BAR_COLUMNS}
+        arrays['timestamp'] = np.ascontiguousarray(df['timestamp'].to_numpy(dtype=np.int64))
+        arrays['volume'] = np.ascontiguousarray(df['volume'].fillna(0).to_numpy(dtype=np.int64))
+        return arrays
+
+
+if __name__ == "__main__":
+    import time
+
+    DB_PATH = sys.argv[1] if len(sys.argv) > 1 else "data/HistoricalData_MES_FUT_1min_20241022.db"
+    SYMBOL = sys.argv[2] if len(sys.argv) > 2 else "MES"
+    BARSIZE = sys.argv[3] if len(sys.argv) > 3 else None
+
+    cache = BarCache()
+    for attempt in ("cold", "warm"):
+        start = time.perf_counter()
+        bars = cache.load(DB_PATH, SYMBOL, BARSIZE)
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"[{attempt}] loaded {len(bars['close'])} bars in {elapsed:.2f} ms")
@@ -0,0 +1,288 @@
+"""
+Consolidated bar store
+
+All symbols and bar sizes live in one SQLite file, partitioned into one
+table per month (bars_YYYYMM). Rows are keyed by (symbol, barsize, timestamp)
+where barsize is in seconds and timestamp is an integer epoch in seconds
+(naive exchange wall clock stored as if it were UTC, see to_epoch_seconds).
+
+Usage:
+    python DataBarStore.py [legacy_data_dir] [store_path]    # migrate src/data/*.db
+"""
+
+import glob
+import os
+import re
+import sqlite3
+import sys
+import threading
+
+import numpy as np
+import pandas as pd
+
+from utils.barsize_valid_check import barsize_to_seconds
+from utils.data_cleaner import to_epoch_seconds
+from utils.sqlite_helper import apply_pragmas
+
+DEFAULT_STORE_PATH = "data/BarStore.db"
+BAR_COLUMNS = ['timestamp', 'open', 'high', 'low', 'close', 'volume']
+
+# HistoricalData_MES_FUT_1min_1M_20241023.db, MarketData_MES_60s_20241024.db,
+# MarketData_MES-MNQ_5s-60s_20241024.db (one market_data_<n>s table per bar size)
+LEGACY_TABLE_PATTERN = re.compile(r"^(historical_data|market_data|data)(?:_(?P<barsize>\d+)s)?$")
+LEGACY_FILE_PATTERN = re.compile(
+    r"^(?P<kind>HistoricalData|MarketData)_(?P<symbol>[A-Za-z0-9-]+)_"
+    r"(?:(?P<contract_type>FUT|STK|OPT)_)?(?P<barsize>\d+[A-Za-z]+)(?:-\d+[A-Za-z]+)*"
+    r"(?:_(?P<duration>\d+[A-Z]))?_(?P<date>\d{8})\.db$"
+)
+
+
+def partition_name(epoch_seconds):
+    """Name of the monthly table holding a given epoch timestamp"""
+    month = np.datetime64(int(epoch_seconds), 's').astype('datetime64[M]')
+    return "bars_" + str(month).replace("-", "")
+
+
+def to_epoch(value):
+    """Accepts epoch seconds, datetime/Timestamp or a date string"""
+    if value is None:
+        return None
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    return int(to_epoch_seconds([value])[0])
+
+
+class BarStore:
+    def __init__(self, db_name=DEFAULT_STORE_PATH, profile='market_data', read_only=False):
+        """read_only: open an existing store with mode=ro, it is neither written nor switched to WAL"""
+        self.db_name = db_name
+        self.lock = threading.Lock()
+        if read_only:
+            self.db = sqlite3.connect(f"file:{db_name}?mode=ro", uri=True, check_same_thread=False)
+        else:
+            self.db = sqlite3.connect(db_name, check_same_thread=False)
+        apply_pragmas(self.db, profile, read_only=read_only)
+        self.partitions = self.load_partitions()
+
+    def load_partitions(self):
+        rows = self.db.execute(
+            "SELECT name FROM sqlite_master WHERE type='table' AND name LIKE 'bars_%'"
+        ).fetchall()
+        return set(name for (name,) in rows)
+
+    def create_partition(self, table_name):
+        self.db.execute(f'''
+        CREATE TABLE IF NOT EXISTS {table_name} (
+            symbol TEXT NOT NULL,
+            barsize INTEGER NOT NULL,
+            timestamp INTEGER NOT NULL,
+            open REAL,
+            high REAL,
+            low REAL,
+            close REAL,
+            volume INTEGER,
+            PRIMARY KEY (symbol, barsize, timestamp)
+        ) WITHOUT ROWID
+        ''')
+        self.partitions.add(table_name)
+
+    def write_bars(self, symbol, barsize, timestamps, opens, highs, lows, closes, volumes):
+        """Insert or replace bars given as equally sized arrays, in one transaction"""
+        barsize = barsize_to_seconds(barsize)
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        if len(timestamps) == 0:
+            return 0
+
+        months = timestamps.astype('datetime64[s]').astype('datetime64[M]')
+        columns = [np.asarray(c, dtype=np.float64) for c in (opens, highs, lows, closes)]
+        volumes = np.asarray(volumes, dtype=np.int64)
+
+        with self.lock, self.db:
+            for month in np.unique(months):
+                table_name = "bars_" + str(month).replace("-", "")
+                if table_name not in self.partitions:
+                    self.create_partition(table_name)
+
+                mask = months == month
+                rows = zip(
+                    [symbol] * int(mask.sum()), [barsize] * int(mask.sum()),
+                    timestamps[mask].tolist(),
+                    *(c[mask].tolist() for c in columns),
+                    volumes[mask].tolist(),
+                )
+                self.db.executemany(f'''
+                INSERT OR REPLACE INTO {table_name}
+                (symbol, barsize, timestamp, open, high, low, close, volume)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ''', rows)
+
+        return len(timestamps)
+
+    def write_frame(self, symbol, barsize, df):
+        """Insert a DataFrame with timestamp/open/high/low/close/volume columns"""
+        timestamps = df['timestamp'] if 'timestamp' in df.columns else df.index
+        if not np.issubdtype(np.asarray(timestamps).dtype, np.integer):
+            timestamps = to_epoch_seconds(timestamps)
+        return self.write_bars(symbol, barsize, timestamps, df['open'], df['high'],
+                               df['low'], df['close'], df['volume'].fillna(0))
+
+    def query(self, symbol, barsize, start=None, end=None):
+        """
+        Bars for symbol/barsize with start <= timestamp < end, sorted by time.
+        Returns a dict of NumPy arrays keyed by BAR_COLUMNS.
+        """
+        barsize = barsize_to_seconds(barsize)
+        start, end = to_epoch(start), to_epoch(end)
+
+        tables = sorted(self.partitions)
+        if start is not None:
+            tables = [t for t in tables if t >= partition_name(start)]
+        if end is not None:
+            tables = [t for t in tables if t <= partition_name(end - 1)]
+
+        arrays = {col: np.empty(0, dtype=np.float64) for col in BAR_COLUMNS}
+        arrays['timestamp'] = np.empty(0, dtype=np.int64)
+        arrays['volume'] = np.empty(0, dtype=np.int64)
+        if not tables:
+            return arrays
+
+        conditions, params = "symbol = ? AND barsize = ?", [symbol, barsize]
+        if start is not None:
+            conditions += " AND timestamp >= ?"
+            params.append(start)
+        if end is not None:
+            conditions += " AND timestamp < ?"
+            params.append(end)
+
+        # Partitions are disjoint months, so concatenating them in name order keeps time order
+        sql = " UNION ALL ".join(
+            f"SELECT timestamp, open, high, low, close, volume FROM {t} WHERE {conditions}"
+            for t in tables
+        ) + " ORDER BY timestamp"
+
+        with self.lock:
+            rows = self.db.execute(sql, params * len(tables)).fetchall()
+
+        if not rows:
+            return arrays
+
+        data = np.array(rows, dtype=np.float64)
+        arrays = {col: data[:, i] for i, col in enumerate(BAR_COLUMNS)}
+        arrays['timestamp'] = data[:, 0].astype(np.int64)
+        arrays['volume'] = data[:, 5].astype(np.int64)
+        return arrays
+
+    def query_frame(self, symbol, barsize, start=None, end=None):
+        """Same as query() but as a DataFrame indexed by timestamp"""
+        arrays = self.query(symbol, barsize, start, end)
+        df = pd.DataFrame({col: arrays[col] for col in BAR_COLUMNS[1:]},
+                          index=pd.to_datetime(arrays['timestamp'], unit='s'))
+        df.index.name = 'timestamp'
+        return df
+
+    def list_series(self):
+        """(symbol, barsize, bar count, first timestamp, last timestamp) per series"""
+        with self.lock:
+            summary = {}
+            for table_name in sorted(self.partitions):
+                for symbol, barsize, count, first, last in self.db.execute(
+                    f"SELECT symbol, barsize, COUNT(*), MIN(timestamp), MAX(timestamp) FROM {table_name} GROUP BY symbol, barsize"
+                ):
+                    key = (symbol, barsize)
+                    if key in summary:
+                        _, _, prev_count, prev_first, _ = summary[key]
+                        summary[key] = (symbol, barsize, prev_count + count, min(prev_first, first), last)
+                    else:
+                        summary[key] = (symbol, barsize, count, first, last)
+        return sorted(summary.values())
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+
+def parse_legacy_file_name(path):
+    """symbol and barsize (seconds) encoded in a legacy per-day file name, or None"""
+    match = LEGACY_FILE_PATTERN.match(os.path.basename(path))
+    if not match:
+        return None
+    return match.group('symbol'), barsize_to_seconds(match.group('barsize'))
+
+
+def decode_legacy_blobs(df):
+    """
+    Rows written from a DataFrame through SQLiteHelper.queue_insert ended up
+    with NumPy scalars stored as 8 byte blobs: datetime64[ns] timestamps and
+    int64 volumes. Turn them back into epoch seconds and integers.
+    """
+    is_blob = df['timestamp'].map(lambda v: isinstance(v, bytes))
+    timestamps = np.full(len(df), -1, dtype=np.int64)
+    if is_blob.any():
+        timestamps[is_blob.values] = [int.from_bytes(v, 'little', signed=True) // 10**9
+                                      for v in df.loc[is_blob, 'timestamp']]
+    if (~is_blob).any():
+        timestamps[~is_blob.values] = to_epoch_seconds(df.loc[~is_blob, 'timestamp'])
+
+    df['timestamp'] = timestamps
+    df['volume'] = [int.from_bytes(v, 'little', signed=True) if isinstance(v, bytes) else v
+                    for v in df['volume']]
+    return df
+
+
+def migrate_legacy_databases(store, paths):
+    """Ingest legacy HistoricalData_*.db / MarketData_*.db files into a BarStore"""
+    total = 0
+    for path in sorted(paths):
+        parsed = parse_legacy_file_name(path)
+        if parsed is None:
+            print(f"Skipping {path}: file name does not match the legacy naming scheme")
+            continue
+        _, file_barsize = parsed
+
+        with sqlite3.connect(f"file:{path}?mode=ro", uri=True) as db:
+            tables = [name for (name,) in db.execute("SELECT name FROM sqlite_master WHERE type='table'")]
+            frames = []
+            for table_name in tables:
+                match = LEGACY_TABLE_PATTERN.match(table_name)
+                if match:
+                    barsize = int(match.group('barsize')) if match.group('barsize') else file_barsize
+                    frames.append((table_name, barsize, pd.read_sql_query(f"SELECT * FROM {table_name}", db)))
+
+        if not frames:
+            print(f"Skipping {path}: no bar table found")
+            continue
+
+        for table_name, barsize, df in frames:
+            if df.empty:
+                print(f"Skipping {path} [{table_name}]: no rows")
+                continue
+
+            df = decode_legacy_blobs(df)
+            invalid = int((df['timestamp'] < 0).sum())
+            df = df[df['timestamp'] >= 0]
+
+            written = 0
+            for symbol, group in df.groupby('symbol'):
+                written += store.write_frame(symbol, barsize, group)
+
+            total += written
+            print(f"Migrated {written} bars from {path} [{table_name}]" + (f" ({invalid} invalid timestamps dropped)" if invalid else ""))
+
+    return total
+
+
+if __name__ == "__main__":
+    DATA_DIR = sys.argv[1] if len(sys.argv) > 1 else "data"
+    STORE_PATH = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_STORE_PATH
+
+    store = BarStore(STORE_PATH)
+    try:
+        legacy_files = [p for p in glob.glob(os.path.join(DATA_DIR, "*.db"))
+                        if os.path.abspath(p) != os.path.abspath(STORE_PATH)]
+        total = migrate_legacy_databases(store, legacy_files)
+        print(f"\nMigrated {total} bars into {STORE_PATH}")
+        for symbol, barsize, count, first, last in store.list_series():
+            print(f"{symbol} {barsize}s: {count} bars, "
+                  f"{pd.to_datetime(first, unit='s')} - {pd.to_datetime(last, unit='s')}")
+    finally:
+        store.close()
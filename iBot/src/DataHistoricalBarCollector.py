@@ -10,9 +10,10 @@ from iBot.src.utils.sample_ib_contract import create_contract
 from utils.barsize_valid_check import barsize_valid_check
 from utils.sqlite_helper import SQLiteHelper
 from utils.data_cleaner import clean_data
+from utils.request_pacer import RequestPacer
 
 class IBHistoricalDataCollector(EWrapper, EClient):
-    def __init__(self, port, client_id, symbol, contract_type, frequency, duration):
+    def __init__(self, port, client_id, symbol, contract_type, frequency, duration, bar_store=None):
         EClient.__init__(self, self)
         self.port = port
         self.client_id = client_id
@@ -23,7 +24,11 @@ class IBHistoricalDataCollector(EWrapper, EClient):
         self.data = []
         self.event = threading.Event()
         self.db_name = f"data/HistoricalData_{symbol}_{contract_type}_{frequency.replace(' ', '')}_{duration.replace(' ', '')}_{datetime.now().strftime('%Y%m%d')}.db"
-        self.sqlite_helper = SQLiteHelper(self.db_name)
+        self.sqlite_helper = SQLiteHelper(self.db_name, batch_size=500, flush_interval=0.5, profile='market_data')
+        # Optional consolidated store (DataBarStore.BarStore), written once per request
+        self.bar_store = bar_store
+        # Keeps historical requests within the IB pacing limits
+        self.pacer = RequestPacer()
 
     def historicalData(self, reqId, bar):
         self.data.append([bar.date, self.symbol, bar.open, bar.high, bar.low, bar.close, bar.volume])
@@ -37,6 +42,8 @@ class IBHistoricalDataCollector(EWrapper, EClient):
         print(f"Error {errorCode}: {errorString}")
 
     def ib_connect(self):
+        # A previous ib_disconnect closed the pacer
+        self.pacer.open()
         self.connect("127.0.0.1", self.port, self.client_id)
         threading.Thread(target=self.run, daemon=True).start()
         max_wait = 10
@@ -47,7 +54,8 @@ class IBHistoricalDataCollector(EWrapper, EClient):
 
     def ib_disconnect(self):
         if self.isConnected():
-            self.cancelHistoricalData(1)
+            self.pacer.submit(RequestPacer.CANCEL, self.cancelHistoricalData, 1)
+            self.pacer.close()
             super().disconnect()
         self.sqlite_helper.close()
 
@@ -59,12 +67,14 @@ class IBHistoricalDataCollector(EWrapper, EClient):
 
     def request_data(self, contract, end_time, duration):
         bar_size = barsize_valid_check(self.frequency)
-        self.reqHistoricalData(1, contract, end_time, duration, bar_size, "TRADES", 1, 1, False, [])
+        self.pacer.submit(RequestPacer.HISTORICAL, self.reqHistoricalData, 1, contract, end_time, duration, bar_size, "TRADES", 1, 1, False, [])
         self.event.wait(timeout=60)
         if not self.data:
             return None
         df = pd.DataFrame(self.data, columns=['date', 'symbol', 'open', 'high', 'low', 'close', 'volume'])
         df['date'] = pd.to_datetime(df['date'])
+        if self.bar_store is not None:
+            self.bar_store.write_frame(self.symbol, self.frequency, df.rename(columns={'date': 'timestamp'}))
         return df.set_index('date')
 
 if __name__ == "__main__":
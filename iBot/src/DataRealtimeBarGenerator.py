@@ -8,42 +8,96 @@ from datetime import datetime, timedelta
 from iBot.src.utils.sample_ib_contract import create_contract
 import pytz
 from utils.sqlite_helper import SQLiteHelper
+from utils.bar_book import BarBook
+from utils.bar_scheduler import BarCloseScheduler, bar_start_for
+from utils.tick_recorder import TickRecorder
+from utils.request_pacer import RequestPacer
 import sys
 
+# Market data request ids are REQ_ID_BASE + index of the symbol
+REQ_ID_BASE = 1
+
 
 class IBRealtimeDataBarGenerator(EWrapper, EClient):
 
-    def __init__(self, port, client_id, symbol, contract_type, bar_frequency_seconds=60):
+    def __init__(self, port, client_id, symbol, contract_type, bar_frequency_seconds=60, empty_bars=None, record_ticks=False):
+        """
+        symbol: a single symbol or a list of symbols, all of them are streamed
+            over this one connection and written to the same database.
+        bar_frequency_seconds: a bar size or a list of bar sizes, e.g. [5, 60, 300, 900].
+            Ticks only build the finest bars, every coarser bar is rolled up
+            from those, each bar size is written to its own table.
+        empty_bars: what to do at a bar boundary for a symbol without ticks,
+            None skips the bar, 'carry' emits a flat bar at the last close with 0 volume.
+        record_ticks: also append every raw tick to a binary log under data/ticks,
+            see utils.tick_recorder.
+        """
+        if empty_bars not in (None, 'carry'):
+            raise ValueError(f"Invalid empty_bars: {empty_bars}. Expected None or 'carry'.")
+
         EClient.__init__(self, self)
         self.port = port
         self.client_id = client_id
 
-        # Initialize contract
-        self.symbol = symbol
+        # Initialize contracts, one market data subscription (reqId) per symbol
+        self.symbols = [symbol] if isinstance(symbol, str) else list(symbol)
+        if not self.symbols:
+            raise ValueError("At least one symbol is required")
+        self.symbol = self.symbols[0]
         self.contract_type = contract_type
-        self.contract = create_contract(symbol, contract_type)
-
-        # Initialize current bar
-        self.current_bar = {'open': None, 'high': None, 'low': None, 'close': None, 'volume': 0}
-        self.bar_start_time = None
+        self.contracts = [create_contract(s, contract_type) for s in self.symbols]
+        self.contract = self.contracts[0]
+        self.req_id_map = {REQ_ID_BASE + i: i for i in range(len(self.symbols))}
+        self.subscribed_req_ids = []
+        # Subscriptions for many symbols are queued to stay within the IB message rate
+        self.pacer = RequestPacer()
+
+        # Bar sizes, the finest one is built from ticks and the others are
+        # rolled up from it, so each must be a multiple of the finest
+        timeframes = [bar_frequency_seconds] if isinstance(bar_frequency_seconds, int) else bar_frequency_seconds
+        self.timeframes = sorted(set(int(tf) for tf in timeframes))
+        if not self.timeframes or any(tf % self.timeframes[0] for tf in self.timeframes):
+            raise ValueError(f"Every bar frequency must be a multiple of the finest one: {self.timeframes}")
+        bar_frequency_seconds = self.timeframes[0]
+
+        # Initialize current bars, one book per timeframe. Ticks (reader thread)
+        # and bar closes (scheduler thread) both touch them, bar_lock serializes them.
+        self.bar_books = {tf: BarBook(self.symbols) for tf in self.timeframes}
+        self.bar_book = self.bar_books[bar_frequency_seconds]
+        self.bar_lock = threading.Lock()
+        self.last_close = {tf: [None] * len(self.symbols) for tf in self.timeframes}
+        self.empty_bars = empty_bars
         self.bar_frequency = timedelta(seconds=bar_frequency_seconds)
-        self.bar_frequency_str = f"{bar_frequency_seconds}s"
-        self.db_name = f"data/MarketData_{self.symbol}_{self.bar_frequency_str}_{datetime.now().strftime('%Y%m%d')}.db"
+        self.bar_frequency_seconds = bar_frequency_seconds
+        self.bar_frequency_str = "-".join(f"{tf}s" for tf in self.timeframes)
+
+        # Bars are closed on exact boundaries by a timer, not by the next tick
+        self.bar_scheduler = BarCloseScheduler(bar_frequency_seconds, self.on_bar_boundary)
+        self.current_bar_start = None
+        self.bar_subscribers = []
+        self.db_name = f"data/MarketData_{'-'.join(self.symbols)}_{self.bar_frequency_str}_{datetime.now().strftime('%Y%m%d')}.db"
         
         # Initialize SQLite
         print(f"Using SQLite for market data storage: {self.db_name}")
-        self.sqlite_helper = SQLiteHelper(self.db_name)
+        self.sqlite_helper = SQLiteHelper(self.db_name, batch_size=100, flush_interval=1.0, profile='market_data')
+        # With several timeframes every bar size gets its own table, e.g. market_data_300s
+        self.table_names = {tf: (f"{self.sqlite_helper.table_name}_{tf}s" if len(self.timeframes) > 1 else None)
+                            for tf in self.timeframes}
 
-        # Initialize market status
+        # Raw tick capture, symbol id in the log is the symbol index
+        self.tick_recorder = TickRecorder("data/ticks", self.symbols) if record_ticks else None
+
+        # Initialize market status, contract details are keyed by symbol index
         self.market_open = False
-        self.contract_details_received = threading.Event()
-        self.contract_details = None
-        self.contract_details_end = threading.Event()
+        self.contract_details = {}
+        self.contract_details_end = {i: threading.Event() for i in range(len(self.symbols))}
 
     def ib_connect(self):
         print("Attempting to connect to TWS...")
         if not hasattr(self, 'port') or not hasattr(self, 'client_id'):
             raise AttributeError("port and client_id must be set before calling ib_connect")
+        # A previous ib_disconnect closed the pacer
+        self.pacer.open()
         self.connect("127.0.0.1", self.port, self.client_id)
 
         if not hasattr(self, 'contract_type'):
@@ -64,13 +118,22 @@ class IBRealtimeDataBarGenerator(EWrapper, EClient):
         return True
     
     def start(self):
-        # Check if market is open
-        if self.is_market_open():
-            # Request market data
-            print(f"Requesting market data for {self.symbol}...")
-            self.reqMktData(1, self.contract, "", False, False, [])
-
-            print(f"Fetching realtime data for {self.symbol} and generating {self.bar_frequency_str} bars. Press Ctrl+C to stop.")
+        # Request market data for the symbols whose market is open
+        for req_id, index in self.req_id_map.items():
+            symbol = self.symbols[index]
+            if self.is_market_open(index):
+                print(f"Requesting market data for {symbol}...")
+                self.pacer.submit(RequestPacer.MARKET_DATA, self.reqMktData, req_id, self.contracts[index], "", False, False, [])
+                self.subscribed_req_ids.append(req_id)
+            else:
+                print(f"Market is currently closed for {symbol}. No real-time data will be collected.")
+
+        if self.subscribed_req_ids:
+            symbols = ", ".join(self.symbols[self.req_id_map[r]] for r in self.subscribed_req_ids)
+            print(f"Fetching realtime data for {symbols} and generating {self.bar_frequency_str} bars. Press Ctrl+C to stop.")
+
+            self.current_bar_start = self.bar_scheduler.current_bar_start()
+            self.bar_scheduler.start()
 
             try:
                 while True:
@@ -80,83 +143,152 @@ class IBRealtimeDataBarGenerator(EWrapper, EClient):
                 print("\nStopping data fetch...")
                 self.ib_disconnect()
         else:
-            print(f"Market is currently closed for {self.symbol}. No real-time data will be collected.")
             self.ib_disconnect()
 
     def ib_disconnect(self):
-        super().disconnect()
-        self.cancelMktData(1)
+        self.bar_scheduler.stop()
+        if self.isConnected():
+            for req_id in self.subscribed_req_ids:
+                self.pacer.submit(RequestPacer.CANCEL, self.cancelMktData, req_id)
+            self.pacer.close()
+            super().disconnect()
+        self.subscribed_req_ids = []
         self.sqlite_helper.close()
+        if self.tick_recorder is not None:
+            self.tick_recorder.close()
 
     def error(self, reqId: TickerId, errorCode: int, errorString: str):
         print(f"Error {errorCode}: {errorString}")
 
     def tickPrice(self, reqId: TickerId, tickType: TickAttrib, price: float, attrib: TickAttrib):
+        index = self.req_id_map.get(reqId)
+        if index is None:
+            return
+        if self.tick_recorder is not None:
+            self.tick_recorder.record(index, tickType, price)
         if tickType == 4:  # Last price
-            self.update_bar(price)
+            self.update_bar(index, price)
 
     def tickSize(self, reqId: TickerId, tickType: TickAttrib, size: int):
+        index = self.req_id_map.get(reqId)
+        if index is None:
+            return
+        if self.tick_recorder is not None:
+            self.tick_recorder.record(index, tickType, 0.0, size)
         if tickType == 8:  # Volume
-            self.current_bar['volume'] += size
-
-    def update_bar(self, price):
-        current_time = datetime.now()
-
-        if self.bar_start_time is None:
-            self.bar_start_time = current_time.replace(second=0, microsecond=0)
-            self.current_bar['open'] = price
-            self.current_bar['high'] = price
-            self.current_bar['low'] = price
-            
-        elif current_time >= self.bar_start_time + self.bar_frequency:
-            # Complete the current bar
-            self.current_bar['close'] = price
-            self.add_bar_to_database(self.bar_start_time, self.current_bar)
-            
-            # Start a new bar
-            self.bar_start_time = current_time.replace(second=0, microsecond=0)
-            self.current_bar = {'open': price, 'high': price, 'low': price, 'close': price, 'volume': 0}
-        else:
-            self.current_bar['high'] = max(self.current_bar['high'], price)
-            self.current_bar['low'] = min(self.current_bar['low'], price)
-
-        self.current_bar['close'] = price
+            with self.bar_lock:
+                self.bar_book.add_volume(index, size)
+
+    def update_bar(self, index, price):
+        with self.bar_lock:
+            if self.current_bar_start is None:
+                self.current_bar_start = self.bar_scheduler.current_bar_start()
+
+            if self.bar_book.is_open(index):
+                self.bar_book.update_price(index, price)
+            else:
+                self.bar_book.open_bar(index, self.current_bar_start, price)
+
+    def on_bar_boundary(self, boundary, lateness):
+        """
+        Scheduler callback at every boundary of the finest timeframe. Closes the
+        finest bars, folds them into the coarser books and closes those whose
+        own boundary it is as well. Work is per closed bar, never per tick.
+        """
+        closed = []
+        # Offsets at the bar itself rather than now, so bars keep their alignment across DST changes
+        finest = self.timeframes[0]
+        tz_offset = self.bar_scheduler.tz_offset(boundary)
+        finest_tz_offset = self.bar_scheduler.tz_offset(boundary - finest)
+        with self.bar_lock:
+            self.current_bar_start = boundary
+
+            for req_id in self.subscribed_req_ids:
+                index = self.req_id_map[req_id]
+                bar = self.close_timeframe_bar(finest, index)
+                if bar is not None:
+                    closed.append((finest, self.symbols[index], boundary - finest, bar))
+
+                for tf in self.timeframes[1:]:
+                    book = self.bar_books[tf]
+                    if bar is not None:
+                        book.merge_bar(index, bar_start_for(boundary - finest, tf, finest_tz_offset), *bar)
+                    if (boundary + tz_offset) % tf == 0:
+                        coarse_bar = self.close_timeframe_bar(tf, index)
+                        if coarse_bar is not None:
+                            closed.append((tf, self.symbols[index], boundary - tf, coarse_bar))
+
+        for tf, symbol, bar_start, (open_, high, low, close, volume) in closed:
+            timestamp = datetime.fromtimestamp(bar_start)
+            bar_data = {'open': open_, 'high': high, 'low': low, 'close': close, 'volume': int(volume)}
+            self.publish_bar(symbol, timestamp, bar_data, lateness, tf)
+            self.add_bar_to_database(symbol, timestamp, bar_data, tf)
+
+    def close_timeframe_bar(self, tf, index):
+        """(open, high, low, close, volume) of the bar closing now, None if there is nothing to emit"""
+        book = self.bar_books[tf]
+        if book.is_open(index):
+            _, open_, high, low, close, volume = book.close_bar(index)
+            self.last_close[tf][index] = close
+            return open_, high, low, close, volume
+        if self.empty_bars == 'carry' and self.last_close[tf][index] is not None:
+            close = self.last_close[tf][index]
+            # Size ticks without a price tick still belong to this bar
+            return close, close, close, close, book.take_volume(index)
+        return None
+
+    def subscribe_bars(self, callback, timeframe=None):
+        """callback(symbol, bar_start, bar_data, lateness) for every closed bar of timeframe (finest by default)"""
+        timeframe = timeframe or self.timeframes[0]
+        if timeframe not in self.bar_books:
+            raise ValueError(f"Timeframe {timeframe}s is not configured, expected one of {self.timeframes}")
+        self.bar_subscribers.append((timeframe, callback))
+
+    def publish_bar(self, symbol, timestamp, bar_data, lateness, timeframe):
+        for subscribed_timeframe, callback in self.bar_subscribers:
+            if subscribed_timeframe != timeframe:
+                continue
+            try:
+                callback(symbol, timestamp, bar_data, lateness)
+            except Exception as e:
+                print(f"Error in bar subscriber for {symbol}: {e}")
 
-    def add_bar_to_database(self, timestamp, bar_data):
-        # Queue SQLite operation
+    def add_bar_to_database(self, symbol, timestamp, bar_data, timeframe=None):
+        # Queue SQLite operation, all symbols and timeframes share the same batched writer
+        timeframe = timeframe or self.timeframes[0]
         self.sqlite_helper.queue_insert((
-            timestamp.isoformat(), self.symbol, bar_data['open'], bar_data['high'],
+            timestamp.isoformat(), symbol, bar_data['open'], bar_data['high'],
             bar_data['low'], bar_data['close'], bar_data['volume']
-        ))
+        ), self.table_names[timeframe])
 
-        print(f"\n{self.bar_frequency_str} Bar - Time: {timestamp}, Symbol: {self.symbol}, Open: {bar_data['open']}, "
+        print(f"\n{timeframe}s Bar - Time: {timestamp}, Symbol: {symbol}, Open: {bar_data['open']}, "
               f"High: {bar_data['high']}, Low: {bar_data['low']}, "
               f"Close: {bar_data['close']}, Volume: {bar_data['volume']}")
 
         # Check if the bar data is complete
         if None in bar_data.values():
-            print(f"Warning: Incomplete bar data for {self.symbol} at {timestamp}")
+            print(f"Warning: Incomplete bar data for {symbol} at {timestamp}")
 
         # Ensure volume is non-negative
         if bar_data['volume'] < 0:
-            print(f"Warning: Negative volume ({bar_data['volume']}) for {self.symbol} at {timestamp}")
+            print(f"Warning: Negative volume ({bar_data['volume']}) for {symbol} at {timestamp}")
             bar_data['volume'] = 0
 
         # Check for price consistency
         if bar_data['low'] > bar_data['high'] or bar_data['open'] > bar_data['high'] or bar_data['open'] < bar_data['low'] or bar_data['close'] > bar_data['high'] or bar_data['close'] < bar_data['low']:
-            print(f"Warning: Inconsistent price data for {self.symbol} at {timestamp}")
+            print(f"Warning: Inconsistent price data for {symbol} at {timestamp}")
 
-    def is_market_open(self):
-        if self.contract_details is None:
-            self.reqContractDetails(1, self.contract)
-            self.contract_details_end.wait(timeout=10)
+    def is_market_open(self, index=0):
+        if index not in self.contract_details:
+            self.pacer.submit(RequestPacer.MARKET_DATA, self.reqContractDetails, REQ_ID_BASE + index, self.contracts[index])
+            self.contract_details_end[index].wait(timeout=10)
         
-        if self.contract_details is None:
-            print("Failed to retrieve contract details")
+        if index not in self.contract_details:
+            print(f"Failed to retrieve contract details for {self.symbols[index]}")
             return False
 
         now = datetime.now(pytz.timezone('US/Eastern'))
-        trading_hours = self.contract_details.tradingHours
+        trading_hours = self.contract_details[index].tradingHours
         sessions = trading_hours.split(';')
         
         for session in sessions:
@@ -171,27 +303,32 @@ class IBRealtimeDataBarGenerator(EWrapper, EClient):
         return False
 
     def contractDetails(self, reqId: int, contractDetails: ContractDetails):
-        self.contract = contractDetails.contract
-        self.contract_details_received.set()
-        self.contract_details = contractDetails
+        index = self.req_id_map.get(reqId)
+        if index is None:
+            return
+        self.contracts[index] = contractDetails.contract
+        self.contract = self.contracts[0]
+        self.contract_details[index] = contractDetails
 
     def contractDetailsEnd(self, reqId):
-        self.contract_details_end.set()
+        index = self.req_id_map.get(reqId)
+        if index is not None:
+            self.contract_details_end[index].set()
 
     def show_bar_progress(self):
-        if self.bar_start_time is None:
+        if self.current_bar_start is None:
             return
 
-        current_time = datetime.now()
-        elapsed_time = current_time - self.bar_start_time
-        remaining_time = self.bar_frequency - elapsed_time
-        progress = min(elapsed_time / self.bar_frequency, 1.0)
+        elapsed_time = time.time() - self.current_bar_start
+        remaining_time = self.bar_frequency_seconds - elapsed_time
+        progress = min(elapsed_time / self.bar_frequency_seconds, 1.0)
         bar_length = 20
         filled_length = int(bar_length * progress)
         bar = '█' * filled_length + '-' * (bar_length - filled_length)
         percent = progress * 100
-        remaining_seconds = int(remaining_time.total_seconds())
-        sys.stdout.write(f'\rGenerating bar: |{bar}| {percent:.1f}% Complete | {remaining_seconds}s remaining ')
+        remaining_seconds = int(remaining_time)
+        lateness = self.bar_scheduler.get_stats()['max_lateness_ms']
+        sys.stdout.write(f'\rGenerating bar: |{bar}| {percent:.1f}% Complete | {remaining_seconds}s remaining | max close lateness {lateness:.3f}ms ')
         sys.stdout.flush()
 
 
@@ -199,10 +336,10 @@ if __name__ == "__main__":
 
     PORT = 7497
     CLIENT_ID = 0
-    SYMBOL = "MES"
+    SYMBOLS = ["MES", "MNQ", "MGC", "MBT", "M2K", "MYM"]
     CONTRACT_TYPE = "FUT"
 
-    app = IBRealtimeDataBarGenerator(PORT, CLIENT_ID, SYMBOL, CONTRACT_TYPE, bar_frequency_seconds=60)
+    app = IBRealtimeDataBarGenerator(PORT, CLIENT_ID, SYMBOLS, CONTRACT_TYPE, bar_frequency_seconds=[5, 60, 300, 900])
     if app.ib_connect():
         app.start()
     else:
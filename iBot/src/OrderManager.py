@@ -5,29 +5,45 @@ from ibapi.utils import iswrapper
 from ibapi.contract import Contract
 from ibapi.order import Order
 
-import time
 import threading
-from datetime import datetime
 import random
 
+from .utils.order_id_allocator import OrderIdAllocator
+from .utils.request_pacer import RequestPacer
+from .utils.order_tracker import OrderTracker, SEND_FAILED
+from .utils.order_journal import DEFAULT_JOURNAL_PATH, OrderJournal
+from .utils.order_state import OrderStateMachine
+
 
 class OrderManager(EWrapper, EClient):
     """IB API wrapper for managing orders"""
     
-    def __init__(self, port, max_wait_time=30):
+    def __init__(self, port, max_wait_time=30, order_id_allocator=None, journal_path=DEFAULT_JOURNAL_PATH,
+                 position_cache=None):
         EClient.__init__(self, self)
-        self.nextOrderId = None
+        # Order ids, safe to draw from concurrent webhook threads
+        self.order_ids = order_id_allocator or OrderIdAllocator()
+        # Outbound requests go through the pacer to stay within the IB message rate
+        self.pacer = RequestPacer()
+        # orderId -> OrderTicket, resolved from the order callbacks
+        self.order_tracker = OrderTracker()
         self.port = port
         self.client_id = random.randint(2000, 2999)
         self.max_wait_time = max_wait_time
         self.connection_event = threading.Event()
-        self.openOrders = {}
-        self.openContracts = {}
         self.task_name = "OrderManager"
         self.positions = {}
         self.position_event = threading.Event()
+        # Optional utils.position_cache.PositionCache, fills of this client are applied to it
+        self.position_cache = position_cache
         self.tick_given = 1
 
+        # Live orders, rebuilt from the journal and reconciled with TWS once connected
+        self.journal = OrderJournal(journal_path) if journal_path else None
+        self.orders = OrderStateMachine(self.journal, client_id=self.client_id)
+        if self.journal is not None:
+            self.orders.replay(self.journal.read())
+
         # Contract mapping
         self.contract_map = {
             "MES": "MESZ4",  # Micro E-mini S&P 500 June 2024
@@ -81,31 +97,33 @@ class OrderManager(EWrapper, EClient):
         api_thread.start()
 
         # Wait for connection and nextOrderId
-        timeout = time.time() + max_wait_time
-        while not self.nextOrderId and time.time() < timeout:
-            time.sleep(0.1)
-            
-        if not self.nextOrderId:
+        if not self.order_ids.wait_ready(max_wait_time):
             raise TimeoutError("Failed to receive nextOrderId within timeout period")
 
-        print(f"Received nextValidId: {self.nextOrderId}")
+        print(f"Received nextValidId: {self.order_ids.last_valid_id}")
         print("Connection established.")
 
+        # Orders of earlier sessions used other client ids, so ask for all of them
+        self.pacer.submit(RequestPacer.ORDER, self.reqAllOpenOrders)
+
     def ib_disconnect(self):
         """Disconnect from IB API"""
         print(f"Disconnecting client task [{self.task_name}] ...")
+        self.pacer.close()
         self.disconnect()
+        if self.journal is not None:
+            self.journal.close()
         print("Client disconnected.")
 
     @iswrapper
     def nextValidId(self, orderId: int):
         super().nextValidId(orderId)
-        self.nextOrderId = orderId
-        print(f"The next valid order id is: {self.nextOrderId}")
+        self.order_ids.resync(orderId)
+        print(f"The next valid order id is: {orderId}")
         self.connection_event.set()
 
     """
-    Place an order for either futures or stocks
+    Place an order for either futures or stocks, returns an OrderTicket (see utils.order_tracker)
     """
     def place_order(self, symbol, sec_type, order_type, action, quantity, price=None):
         if sec_type == "FUT":
@@ -147,12 +165,8 @@ class OrderManager(EWrapper, EClient):
             order = self.create_order(symbol, order_type, action, quantity, price)
             
             # Place the order
-            current_order_id = self.nextOrderId
-            self.nextOrderId += 1
-            
             print(f"Placing order for {contract.localSymbol}")
-            self.placeOrder(current_order_id, contract, order)
-            return current_order_id
+            return self.send_order(contract, order)
             
         except Exception as e:
             print(f"Error placing futures order: {str(e)}")
@@ -179,35 +193,64 @@ class OrderManager(EWrapper, EClient):
             order = self.create_order(symbol, order_type, action, quantity, price)
             
             # Place the order
-            current_order_id = self.nextOrderId
-            self.nextOrderId += 1
-            
             print(f"Placing order for {contract.symbol}")
-            self.placeOrder(current_order_id, contract, order)
-            return current_order_id
+            return self.send_order(contract, order)
             
         except Exception as e:
             print(f"Error placing stock order: {str(e)}")
             raise
 
+    def send_order(self, contract, order):
+        """Assign an order id, track the order and queue it for sending"""
+        order_id = self.order_ids.next_id()
+        ticket = self.order_tracker.track(order_id, contract.symbol, order.action, order.totalQuantity)
+        self.orders.on_submit(order_id, contract, order)
+        future = self.pacer.submit(RequestPacer.ORDER, self.placeOrder, order_id, contract, order)
+
+        def on_sent(future):
+            # The order never reached TWS, nothing else will resolve the ticket
+            if future.exception() is not None:
+                self.order_tracker.on_error(order_id, SEND_FAILED, str(future.exception()))
+
+        future.add_done_callback(on_sent)
+        return ticket
+
     @iswrapper
     def orderStatus(self, orderId, status, filled, remaining, avgFillPrice, 
                     permId, parentId, lastFillPrice, clientId, whyHeld, mktCapPrice):
         print(f"OrderStatus. Id: {orderId}, Status: {status}, Filled: {filled}, Remaining: {remaining}, LastFillPrice: {lastFillPrice}")
+        self.order_tracker.on_order_status(orderId, status, filled, remaining, avgFillPrice)
+        self.orders.on_order_status(orderId, status, filled, avgFillPrice, permId, clientId)
 
     @iswrapper
     def openOrder(self, orderId, contract, order, orderState):
         print(f"OpenOrder. ID: {orderId}, {contract.symbol}, {contract.secType} @ {contract.exchange}: {order.action}, {order.orderType} Qty: {order.totalQuantity} @ ${order.lmtPrice}")
         print(f"Order State: {orderState.status}")
         
-        self.openOrders[orderId] = order
-        self.openContracts[orderId] = contract
+        self.orders.on_open_order(orderId, contract, order, orderState.status)
+        self.order_tracker.on_open_order(orderId, orderState.status)
+
+    @iswrapper
+    def openOrderEnd(self):
+        closed = self.orders.reconcile()
+        if closed:
+            print(f"Closed {len(closed)} journaled orders TWS no longer reports as open, outcome unknown")
 
     @iswrapper
     def execDetails(self, reqId, contract, execution):
         print(f"ExecDetails. ReqId: {reqId}, Symbol: {contract.symbol}, SecType: {contract.secType}, Currency: {contract.currency}, "
               f"Execution: {execution.execId}, Time: {execution.time}, Account: {execution.acctNumber}, Exchange: {execution.exchange}, "
               f"Side: {execution.side}, Shares: {execution.shares}, Price: {execution.price}")
+        self.order_tracker.on_exec_details(execution.orderId, execution.execId, execution.shares, execution.price)
+        if self.position_cache is not None:
+            self.position_cache.apply_fill(execution.execId, execution.acctNumber, contract.symbol,
+                                           execution.side, execution.shares)
+
+    @iswrapper
+    def error(self, reqId, errorCode, errorString):
+        print(f"Error {errorCode}: {errorString}")
+        # Errors for an order carry its id as reqId
+        self.order_tracker.on_error(reqId, errorCode, errorString)
 
     def get_exchange(self, symbol):
         """
@@ -296,45 +339,36 @@ class OrderManager(EWrapper, EClient):
         if not symbol or not action or price is None:
             raise ValueError("Missing required parameters")
             
-        if not self.openOrders:
-            print("No open orders to cancel")
+        live = self.orders.find_by_details(symbol, action, price, client_id=self.client_id)
+        if live is None:
+            print(f"No matching order found for {symbol} {action} @ {price}")
             return False
-            
-        for orderId, order in self.openOrders.items():
-            contract = self.openContracts.get(orderId)
-            if not contract:
-                continue
-                
-            if (contract.symbol == symbol and 
-                order.action == action and 
-                order.lmtPrice == price):
-                
-                print(f"Cancelling order: ID {orderId}, {symbol} {action} @ {price}")
-                self.cancelOrder(orderId)
-                return True
-        
-        print(f"No matching order found for {symbol} {action} @ {price}")
-        return False
+
+        print(f"Cancelling order: ID {live.order_id}, {symbol} {action} @ {price}")
+        self.pacer.submit(RequestPacer.CANCEL, self.cancelOrder, live.order_id)
+        return True
     
-    # TODO: Seems it can only cancel for current function order, not any order which still live in TWS
+    # Only orders of this client id can be cancelled by id, orders of earlier sessions are tracked but skipped
     def cancel_all_orders(self):
         """Cancel all open orders"""
-        if self.openOrders:
-            for orderId in list(self.openOrders.keys()):
-                print(f"Cancelling order: ID {orderId}")
-                self.cancelOrder(orderId)
+        live_orders = self.orders.live_orders(client_id=self.client_id)
+        if live_orders:
+            for live in live_orders:
+                print(f"Cancelling order: ID {live.order_id}")
+                self.pacer.submit(RequestPacer.CANCEL, self.cancelOrder, live.order_id)
             print("All open orders have been cancelled.")
         else:
             print("No open orders to cancel.")
 
     def cancel_order_by_id(self, order_id):
         """Cancel a specific unfilled order by order ID"""
-        if order_id not in self.openOrders:
+        live = self.orders.get(order_id)
+        if live is None:
             print(f"No open order found with ID {order_id}")
             return False
             
         print(f"Cancelling order: ID {order_id}")
-        self.cancelOrder(order_id)
+        self.pacer.submit(RequestPacer.CANCEL, self.cancelOrder, order_id)
         return True
 
     @iswrapper
@@ -366,18 +400,30 @@ def main():
             ("AMZN", "STK", "LMT", "BUY", 1, 155.00)
         ]
         
+        tickets = []
         for symbol, sec_type, order_type, action, qty, price in test_orders:
-            order_id = app.place_order(symbol, sec_type, order_type, action, qty, price)
-            print(f"Placed {sec_type} {order_type} order {order_id}: {symbol} {action} {qty} @ {price}")
-            time.sleep(1)
+            ticket = app.place_order(symbol, sec_type, order_type, action, qty, price)
+            tickets.append(ticket)
+            print(f"Placed {sec_type} {order_type} order {ticket.order_id}: {symbol} {action} {qty} @ {price}")
             
-            # Test cancelling individual order
+            # Test cancelling individual order once TWS acknowledged it
             if symbol == "MGC1!":
-                app.cancel_order_by_id(order_id)
-                print(f"Cancelled order {order_id}")
-                time.sleep(1)
-
-        time.sleep(5)  # Wait to see the order status
+                ticket.wait_acknowledged(timeout=5)
+                app.cancel_order_by_id(ticket.order_id)
+                ticket.wait_done(timeout=5)
+                print(f"Cancelled order {ticket.order_id}: {ticket.status}")
+
+        # Wait to see the order status
+        for ticket in tickets:
+            try:
+                ticket.wait_acknowledged(timeout=5)
+            except TimeoutError:
+                pass
+            # None if the order timed out or ended (e.g. rejected) without an acknowledgement
+            if ticket.ack_latency is None:
+                print(f"{ticket}, not acknowledged")
+            else:
+                print(f"{ticket}, acknowledged after {ticket.ack_latency:.3f}s")
         app.cancel_all_orders()
         
     except Exception as e:
@@ -388,4 +434,5 @@ def main():
             app.ib_disconnect()
 
 if __name__ == "__main__":
+    # Run from iBot: python -m src.OrderManager
     main()
@@ -11,8 +11,13 @@ import time
 from datetime import datetime
 import threading
 
+from .utils.order_id_allocator import OrderIdAllocator
+from .utils.redis_order_writer import OrderStatusWriter
+from .utils.position_cache import PositionCache
+
 class IBotView(EWrapper, EClient):
-    def __init__(self, port=7497):
+    def __init__(self, port=7497, order_id_allocator=None, redis_client=None, position_cache=None,
+                 position_reconcile_interval=60):
         EClient.__init__(self, self)
         
         # Core attributes
@@ -22,13 +27,13 @@ class IBotView(EWrapper, EClient):
         self.is_connected = False
         
         # Order management
-        self.nextOrderId = 0
+        self.order_ids = order_id_allocator or OrderIdAllocator()
         self.openOrders = {}
         self.order_records = {}
-        self.order_id_lock = Lock()
         
-        # Position tracking
-        self.positions = {}
+        # Position tracking, share the cache with OrderManager so its fills are applied too
+        self.position_cache = position_cache or PositionCache()
+        self.position_reconcile_interval = position_reconcile_interval
         self.openContracts = {}
         self.contractDetails = {}
         
@@ -38,13 +43,14 @@ class IBotView(EWrapper, EClient):
         self.connection_event = threading.Event()
         self.last_keepalive = time.time()
         
-        # Initialize Redis connection
-        self.init_db()
+        # Initialize Redis connection, order hashes are written by a background writer
+        self.init_db(redis_client)
+        self.status_writer = OrderStatusWriter(self.redis)
 
-    def init_db(self):
-        """Initialize Redis database connection"""
+    def init_db(self, redis_client=None):
+        """Initialize Redis database connection, redis_client e.g. a fakeredis.FakeRedis for tests"""
         try:
-            self.redis = redis.Redis(host='localhost', port=6379, db=0)
+            self.redis = redis_client if redis_client is not None else redis.Redis(host='localhost', port=6379, db=0)
             self.redis.ping()
             
             # Initialize positions hash if it doesn't exist
@@ -72,8 +78,8 @@ class IBotView(EWrapper, EClient):
                     raise ConnectionError("Timeout: Could not connect to TWS/IB Gateway")
                 time.sleep(0.1)
             
-            # Request initial positions
-            self.reqPositions()
+            # Request initial positions, then reconcile periodically
+            self.position_cache.start_periodic(self.request_positions, self.position_reconcile_interval)
             
         except Exception as e:
             print(f"Error connecting to TWS/IB Gateway: {e}")
@@ -82,16 +88,17 @@ class IBotView(EWrapper, EClient):
     def ib_disconnect(self):
         """Disconnect from IB API"""
         print(f"Disconnecting client task [{self.task_name}] ...")
+        self.position_cache.stop()
         self.disconnect()
+        self.status_writer.close()
         print("Client disconnected.")
 
     @iswrapper
     def nextValidId(self, orderId: int):
         """Callback when connection is established and next valid order ID is received"""
         super().nextValidId(orderId)
-        with self.order_id_lock:
-            self.nextOrderId = orderId
-        print(f"Next valid order ID: {self.nextOrderId}")
+        self.order_ids.resync(orderId)
+        print(f"Next valid order ID: {orderId}")
         self.connection_event.set()
         self.is_connected = True
 
@@ -100,15 +107,13 @@ class IBotView(EWrapper, EClient):
         """Callback for order status updates"""
         print(f"OrderStatus. Id: {orderId}, Status: {status}, Filled: {filled}, Remaining: {remaining}, LastFillPrice: {lastFillPrice}")
         
-        with self.lock:
-            order_key = f"order:{orderId}"
-            if self.redis.exists(order_key):
-                order_data = self.redis.hgetall(order_key)
-                order_data[b'status'] = status.encode()
-                order_data[b'filled'] = str(filled).encode()
-                order_data[b'avgFillPrice'] = str(avgFillPrice).encode()
-                order_data[b'lastUpdate'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S").encode()
-                self.redis.hset(order_key, mapping=order_data)
+        # Queued, only orders recorded with record_order are updated
+        self.status_writer.update(orderId, {
+            'status': status,
+            'filled': str(filled),
+            'avgFillPrice': str(avgFillPrice),
+            'lastUpdate': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        })
 
     @iswrapper
     def openOrder(self, orderId, contract, order, orderState):
@@ -127,6 +132,8 @@ class IBotView(EWrapper, EClient):
               f"Currency: {contract.currency}, Execution: {execution.execId}, Time: {execution.time}, "
               f"Account: {execution.acctNumber}, Exchange: {execution.exchange}, Side: {execution.side}, "
               f"Shares: {execution.shares}, Price: {execution.price}")
+        self.position_cache.apply_fill(execution.execId, execution.acctNumber, contract.symbol,
+                                       execution.side, execution.shares)
 
     def connectionClosed(self):
         """Callback when connection is closed"""
@@ -148,30 +155,43 @@ class IBotView(EWrapper, EClient):
         super().contractDetailsEnd(reqId)
         print(f"Contract details request completed for reqId: {reqId}")
 
+    @property
+    def positions(self):
+        """Read-only symbol -> position of the latest snapshot, no lock and no network call"""
+        return self.position_cache.snapshot().positions
+
+    def request_positions(self):
+        """(Re)subscribe to positions, positionEnd closes the reconciliation"""
+        self.cancelPositions()
+        self.reqPositions()
+
     @iswrapper
     def position(self, account: str, contract: Contract, position: float, avgCost: float):
         """Handle position updates"""
-        if hasattr(self, 'positions'):
-            symbol = contract.symbol
-            self.positions[symbol] = position
-            print(f"Position update received for {symbol}: {position}")
-            return position
-        return None
+        symbol = contract.symbol
+        self.position_cache.on_position(account, symbol, position)
+        print(f"Position update received for {symbol}: {position}")
+        return position
+
+    @iswrapper
+    def positionEnd(self):
+        """All positions were reported"""
+        self.position_cache.end_reconcile()
+        self.position_event.set()
 
     def record_order(self, order_id, symbol, contract_type, action, order_type, quantity, price):
         """Record order details in Redis"""
-        with self.lock:
-            order_data = {
-                'symbol': symbol,
-                'contract_type': contract_type,
-                'action': action,
-                'order_type': order_type,
-                'quantity': str(quantity),
-                'price': str(price),
-                'status': 'Submitted',
-                'filled': '0',
-                'avgFillPrice': '0',
-                'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                'lastUpdate': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            }
-            self.redis.hset(f"order:{order_id}", mapping=order_data)
+        order_data = {
+            'symbol': symbol,
+            'contract_type': contract_type,
+            'action': action,
+            'order_type': order_type,
+            'quantity': str(quantity),
+            'price': str(price),
+            'status': 'Submitted',
+            'filled': '0',
+            'avgFillPrice': '0',
+            'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            'lastUpdate': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        }
+        self.status_writer.create(order_id, order_data)
@@ -5,12 +5,23 @@ from .SignalProcessor import TradingSignal
 class BaseStrategy(ABC):
     def __init__(self):
         self.symbols = set()
+        # Identifies the strategy's signals, e.g. for SignalCoalescer
+        self.name = type(self).__name__
 
     @abstractmethod
     def generate_signals(self) -> List[TradingSignal]:
         """Generate trading signals for the strategy"""
         pass
 
+    def update_price(self, symbol: str, price: float):
+        """Receive a price update for one of the strategy's symbols"""
+        pass
+
+    def generate_signals_for_symbol(self, symbol: str) -> List[TradingSignal]:
+        """Signals for one symbol, called by SignalProcessor.on_price after its price changed.
+        Override when the strategy can evaluate a single symbol without the others."""
+        return [signal for signal in self.generate_signals() if signal.symbol == symbol]
+
     def get_symbols(self) -> set:
         """Return set of symbols used by this strategy"""
-        return self.symbols 
\ No newline at end of file
+        return self.symbols
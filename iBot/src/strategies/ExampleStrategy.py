@@ -1,4 +1,5 @@
 from .BaseStrategy import BaseStrategy
+from .RingBuffer import RingBuffer
 from .SignalProcessor import TradingSignal, SignalType
 from typing import List
 
@@ -8,46 +9,50 @@ class SimpleMovingAverageStrategy(BaseStrategy):
         self.symbols = set(symbols)
         self.fast_period = fast_period
         self.slow_period = slow_period
-        self.prices = {symbol: [] for symbol in symbols}
+        # Keep only needed history, with running sums for both MA windows
+        max_length = max(self.fast_period, self.slow_period)
+        self.prices = {symbol: RingBuffer(max_length, windows=(fast_period, slow_period)) for symbol in symbols}
 
     def update_price(self, symbol: str, price: float):
         """Update price data for a symbol"""
         if symbol in self.prices:
-            self.prices[symbol].append(price)
-            # Keep only needed history
-            max_length = max(self.fast_period, self.slow_period)
-            self.prices[symbol] = self.prices[symbol][-max_length:]
+            self.prices[symbol].push(price)
 
     def generate_signals(self) -> List[TradingSignal]:
         """Generate trading signals based on moving average crossover"""
         signals = []
         
         for symbol in self.symbols:
-            prices = self.prices[symbol]
-            
-            if len(prices) < self.slow_period:
-                continue
+            signals.extend(self.generate_signals_for_symbol(symbol))
                 
-            # Calculate moving averages
-            fast_ma = sum(prices[-self.fast_period:]) / self.fast_period
-            slow_ma = sum(prices[-self.slow_period:]) / self.slow_period
-            current_price = prices[-1]
+        return signals
+
+    def generate_signals_for_symbol(self, symbol: str) -> List[TradingSignal]:
+        """Moving average crossover signal for one symbol"""
+        prices = self.prices[symbol]
+        
+        if len(prices) < self.slow_period:
+            return []
             
-            # Generate signals based on MA crossover
-            if fast_ma > slow_ma:
-                signals.append(TradingSignal(
-                    symbol=symbol,
-                    signal_type=SignalType.BUY,
-                    price=current_price,
-                    reason="Fast MA crossed above Slow MA"
-                ))
-            elif fast_ma < slow_ma:
-                signals.append(TradingSignal(
-                    symbol=symbol,
-                    signal_type=SignalType.SELL,
-                    price=current_price,
-                    reason="Fast MA crossed below Slow MA"
-                ))
-                
-                
-        return signals 
\ No newline at end of file
+        # Calculate moving averages
+        fast_ma = prices.mean(self.fast_period)
+        slow_ma = prices.mean(self.slow_period)
+        current_price = prices.last
+        
+        # Generate signals based on MA crossover
+        if fast_ma > slow_ma:
+            return [TradingSignal(
+                symbol=symbol,
+                signal_type=SignalType.BUY,
+                price=current_price,
+                reason="Fast MA crossed above Slow MA"
+            )]
+        elif fast_ma < slow_ma:
+            return [TradingSignal(
+                symbol=symbol,
+                signal_type=SignalType.SELL,
+                price=current_price,
+                reason="Fast MA crossed below Slow MA"
+            )]
+            
+        return []
@@ -0,0 +1,164 @@
+"""
+Offline replay of recorded bars or ticks through the live strategy path
+
+Each price goes through SignalProcessor.on_price, exactly like
+TradingApp.tickPrice in main.py. Orders go to a SimulatedOrderManager
+instead of TWS, so strategies can be regression tested and benchmarked
+without a connection.
+
+Usage (from src/):
+    python -m strategies.ReplayEngine <db_path> [symbol] [speed]
+"""
+
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .SignalProcessor import SignalProcessor
+
+
+class SimulatedOrderManager:
+    """Stands in for the order manager used by SignalProcessor, fills every order immediately"""
+
+    def __init__(self, commission_per_contract: float = 0.0):
+        self.commission_per_contract = commission_per_contract
+        self.positions: Dict[str, float] = {}
+        self.avg_costs: Dict[str, float] = {}
+        self.realized_pnl: Dict[str, float] = {}
+        self.last_prices: Dict[str, float] = {}
+        self.fills: List[dict] = []
+        self.clock = 0.0
+        self.next_order_id = 1
+
+    def set_price(self, symbol: str, price: float, timestamp: float):
+        self.last_prices[symbol] = price
+        self.clock = timestamp
+
+    def get_position_for_symbol(self, symbol: str) -> Optional[dict]:
+        if symbol not in self.positions:
+            return None
+        return {'position': self.positions[symbol], 'avgCost': self.avg_costs.get(symbol, 0.0)}
+
+    def placeOrder(self, contract, order):
+        """Fill at the limit price, or at the last replayed price for market orders"""
+        symbol = contract.symbol
+        price = order.lmtPrice if order.orderType == "LMT" else self.last_prices.get(symbol)
+        quantity = order.totalQuantity if order.action == "BUY" else -order.totalQuantity
+
+        position = self.positions.get(symbol, 0)
+        avg_cost = self.avg_costs.get(symbol, 0.0)
+        realized = 0.0
+        if position and (position > 0) != (quantity > 0):
+            # Reducing or reversing, realize PnL on the closed part
+            closed = min(abs(quantity), abs(position))
+            realized = closed * (price - avg_cost) * (1 if position > 0 else -1)
+
+        new_position = position + quantity
+        if new_position == 0:
+            avg_cost = 0.0
+        elif position == 0 or (position > 0) != (new_position > 0):
+            avg_cost = price
+        elif (position > 0) == (quantity > 0):
+            avg_cost = (avg_cost * abs(position) + price * abs(quantity)) / abs(new_position)
+
+        commission = self.commission_per_contract * abs(quantity)
+        self.positions[symbol] = new_position
+        self.avg_costs[symbol] = avg_cost
+        self.realized_pnl[symbol] = self.realized_pnl.get(symbol, 0.0) + realized - commission
+
+        order_id = self.next_order_id
+        self.next_order_id += 1
+        self.fills.append({
+            'order_id': order_id, 'time': self.clock, 'symbol': symbol, 'action': order.action,
+            'quantity': order.totalQuantity, 'price': price, 'commission': commission,
+            'realized_pnl': realized, 'position': new_position,
+        })
+        return order_id
+
+
+class ReplayEngine:
+    def __init__(self, signal_processor: SignalProcessor, speed: Optional[float] = None):
+        """
+        speed: None replays as fast as possible, otherwise recorded time is
+            scaled by this factor (1.0 real time, 60.0 one minute per second).
+        """
+        self.signal_processor = signal_processor
+        self.speed = speed
+        self.streams = []
+
+    def add_prices(self, symbol: str, timestamps, prices):
+        """Add a price stream, timestamps in epoch seconds"""
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        prices = np.asarray(prices, dtype=np.float64)
+        if len(timestamps) != len(prices):
+            raise ValueError("timestamps and prices must have the same length")
+        self.streams.append((symbol, timestamps, prices))
+
+    def add_bars(self, symbol: str, bars: dict, price_field: str = 'close'):
+        """Add bars as returned by BarStore.query or BarCache.load"""
+        self.add_prices(symbol, bars['timestamp'], bars[price_field])
+
+    def add_ticks(self, symbol: str, ticks, header, symbol_id: int):
+        """Add LAST price ticks of one symbol from a tick log (utils.tick_recorder)"""
+        from utils.tick_recorder import TICK_LAST, tick_epoch_ns
+        ticks = ticks[(ticks['symbol_id'] == symbol_id) & (ticks['tick_type'] == TICK_LAST)]
+        self.add_prices(symbol, tick_epoch_ns(ticks, header) / 1e9, ticks['price'])
+
+    def merged_events(self):
+        """All streams merged by time, ties broken by the order streams were added in"""
+        if not self.streams:
+            return np.empty(0), np.empty(0, dtype=np.int64), np.empty(0)
+        timestamps = np.concatenate([ts for _, ts, _ in self.streams])
+        prices = np.concatenate([p for _, _, p in self.streams])
+        stream_ids = np.concatenate([np.full(len(ts), i) for i, (_, ts, _) in enumerate(self.streams)])
+        order = np.lexsort((stream_ids, timestamps))
+        return timestamps[order], stream_ids[order], prices[order]
+
+    def run(self) -> dict:
+        timestamps, stream_ids, prices = self.merged_events()
+        symbols = [symbol for symbol, _, _ in self.streams]
+        order_manager = self.signal_processor.order_manager
+
+        start = time.perf_counter()
+        for ts, stream_id, price in zip(timestamps.tolist(), stream_ids.tolist(), prices.tolist()):
+            if self.speed:
+                delay = (ts - timestamps[0]) / self.speed - (time.perf_counter() - start)
+                if delay > 0:
+                    time.sleep(delay)
+
+            symbol = symbols[stream_id]
+            if isinstance(order_manager, SimulatedOrderManager):
+                order_manager.set_price(symbol, price, ts)
+
+            # Same path as TradingApp.tickPrice
+            self.signal_processor.on_price(symbol, price)
+
+        elapsed = time.perf_counter() - start
+        stats = {
+            'events': len(timestamps),
+            'elapsed_seconds': elapsed,
+            'events_per_second': len(timestamps) / elapsed if elapsed > 0 else 0.0,
+        }
+        if isinstance(order_manager, SimulatedOrderManager):
+            stats['fills'] = len(order_manager.fills)
+            stats['positions'] = dict(order_manager.positions)
+            stats['realized_pnl'] = dict(order_manager.realized_pnl)
+        return stats
+
+
+if __name__ == "__main__":
+    import sys
+    from DataBarCache import BarCache
+    from .ExampleStrategy import SimpleMovingAverageStrategy
+
+    DB_PATH = sys.argv[1] if len(sys.argv) > 1 else "data/HistoricalData_MES_FUT_1min_20241022.db"
+    SYMBOL = sys.argv[2] if len(sys.argv) > 2 else "MES"
+    SPEED = float(sys.argv[3]) if len(sys.argv) > 3 else None
+
+    processor = SignalProcessor(SimulatedOrderManager(commission_per_contract=0.62))
+    processor.add_strategy(SimpleMovingAverageStrategy([SYMBOL]))
+
+    engine = ReplayEngine(processor, speed=SPEED)
+    engine.add_bars(SYMBOL, BarCache().load(DB_PATH, SYMBOL))
+    print(engine.run())
@@ -0,0 +1,84 @@
+import math
+
+import numpy as np
+
+
+class RingBuffer:
+    """
+    Fixed-capacity price history in a NumPy array, with running sums for a
+    set of trailing window lengths. push() and mean() are O(1) regardless of
+    the capacity, so strategies can keep rolling windows per symbol without
+    re-slicing or re-summing lists on every tick.
+    """
+
+    # Pushes between exact re-sums of the running window sums, bounds float drift
+    RESUM_INTERVAL = 100_000
+
+    def __init__(self, capacity: int, windows=()):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        windows = tuple(sorted(set(windows)))
+        if any(w < 1 or w > capacity for w in windows):
+            raise ValueError(f"Window lengths must be between 1 and the capacity ({capacity})")
+
+        self.capacity = capacity
+        self.data = np.zeros(capacity, dtype=np.float64)
+        self.head = 0  # slot the next value goes into
+        self.count = 0
+        self.sums = {w: 0.0 for w in windows}
+        self.pushes_since_resum = 0
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    @property
+    def full(self):
+        return self.count >= self.capacity
+
+    def push(self, value: float):
+        data, head = self.data, self.head
+        for window in self.sums:
+            if self.count >= window:
+                self.sums[window] += value - data[head - window]  # negative index wraps around
+            else:
+                self.sums[window] += value
+        data[head] = value
+        self.head = head + 1 if head + 1 < self.capacity else 0
+        self.count += 1
+
+        self.pushes_since_resum += 1
+        if self.pushes_since_resum >= self.RESUM_INTERVAL:
+            self.resum()
+
+    def resum(self):
+        """Recompute the running sums exactly from the stored values"""
+        for window in self.sums:
+            self.sums[window] = math.fsum(self.last_n(min(window, len(self))))
+        self.pushes_since_resum = 0
+
+    def window_sum(self, window: int) -> float:
+        return self.sums[window]
+
+    def mean(self, window: int) -> float:
+        """Mean of the last `window` values, NaN until that many values were pushed"""
+        if self.count < window:
+            return float('nan')
+        return self.sums[window] / window
+
+    @property
+    def last(self) -> float:
+        if self.count == 0:
+            raise IndexError("RingBuffer is empty")
+        return float(self.data[self.head - 1])
+
+    def last_n(self, n: int) -> np.ndarray:
+        """Copy of the last n values, oldest first"""
+        n = min(n, len(self))
+        start = self.head - n
+        if start >= 0:
+            return self.data[start:self.head].copy()
+        return np.concatenate((self.data[start:], self.data[:self.head]))
+
+    def values(self) -> np.ndarray:
+        """Copy of every stored value, oldest first"""
+        return self.last_n(len(self))
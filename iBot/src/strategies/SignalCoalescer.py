@@ -0,0 +1,58 @@
+"""
+Collapses repeated signals before they reach order placement.
+
+Strategies such as the moving average crossover emit the same BUY or SELL on
+every tick while the condition holds. Each one costs a position lookup and,
+if the position is out of sync, a duplicate order. The coalescer remembers
+the last (signal_type, target_position, position) forwarded per (strategy,
+symbol) and only passes signals that change it. The position is the one
+observed when the signal arrived, so a signal whose order is still working
+stays suppressed until the fill moves the position, then goes through
+again if the target is not reached yet. Suppressed signals are counted in
+total and per key.
+
+Call reset() when the forwarded state no longer matches the account, e.g.
+after an order for the key was rejected, so the next signal goes through
+again.
+"""
+
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+class SignalCoalescer:
+    def __init__(self):
+        # (strategy, symbol) -> (signal_type, target_position, position) last forwarded
+        self.last_state: Dict[Tuple[str, str], tuple] = {}
+        self.forwarded = 0
+        self.suppressed = 0
+        self.suppressed_by_key: Dict[Tuple[str, str], int] = {}
+
+    def accept(self, signal, position=None) -> bool:
+        """Whether the signal changes its (strategy, symbol) state at the observed position, records it if so"""
+        key = (signal.strategy, signal.symbol)
+        state = (signal.signal_type, signal.target_position, position)
+        if self.last_state.get(key) == state:
+            self.suppressed += 1
+            self.suppressed_by_key[key] = self.suppressed_by_key.get(key, 0) + 1
+            return False
+        self.last_state[key] = state
+        self.forwarded += 1
+        return True
+
+    def filter(self, signals, position_of: Optional[Callable[[str], float]] = None) -> List:
+        """Return the signals that change their (strategy, symbol) state, in order"""
+        return [signal for signal in signals
+                if self.accept(signal, position_of(signal.symbol) if position_of is not None else None)]
+
+    def reset(self, strategy: Optional[str] = None, symbol: Optional[str] = None):
+        """Forget the forwarded state of matching keys, all keys when both are None"""
+        for key in list(self.last_state):
+            if (strategy is None or key[0] == strategy) and (symbol is None or key[1] == symbol):
+                del self.last_state[key]
+
+    def get_stats(self) -> dict:
+        return {
+            'forwarded': self.forwarded,
+            'suppressed': self.suppressed,
+            'suppressed_by_key': dict(self.suppressed_by_key),
+        }
@@ -2,7 +2,9 @@ from ibapi.contract import Contract
 from ibapi.order import Order
 from enum import Enum
 import time
-from typing import Dict, Optional
+from typing import Dict, List, Optional
+
+from .SignalCoalescer import SignalCoalescer
 
 class SignalType(Enum):
     BUY = "BUY"
@@ -12,46 +14,113 @@ class SignalType(Enum):
 
 class TradingSignal:
     def __init__(self, symbol: str, signal_type: SignalType, price: float, 
-                 target_position: float = None, reason: str = ""):
+                 target_position: float = None, reason: str = "", strategy: str = None):
         self.symbol = symbol
         self.signal_type = signal_type
         self.price = price
         self.target_position = target_position
         self.reason = reason
+        # Name of the strategy that produced the signal, filled in by SignalProcessor if not set
+        self.strategy = strategy
         self.timestamp = time.time()
+        # Set when the strategy produced the signal after its evaluation deadline
+        self.late = False
+
+def tag_signals(strategy, signals) -> List[TradingSignal]:
+    """Fill in the strategy name of signals that do not carry one"""
+    if not signals:
+        return []
+    name = getattr(strategy, 'name', type(strategy).__name__)
+    for signal in signals:
+        if signal.strategy is None:
+            signal.strategy = name
+    return signals
 
 class SignalProcessor:
-    def __init__(self, order_manager, max_position_size: int = 1):
+    def __init__(self, order_manager, max_position_size: int = 1, execution_mode: str = 'serial',
+                 max_workers: Optional[int] = None, strategy_deadline: float = 0.05, late_policy: str = 'drop',
+                 coalesce_signals: bool = True):
+        """
+        execution_mode: 'serial' evaluates strategies on the calling thread, 'thread' or
+            'process' in a worker pool with a per-round deadline (see StrategyExecutor)
+        coalesce_signals: only act on signals that change a strategy's state for a symbol
+            (see SignalCoalescer)
+        """
         self.order_manager = order_manager
         self.max_position_size = max_position_size
+        self.coalescer = SignalCoalescer() if coalesce_signals else None
+        self.executor = None
+        if execution_mode != 'serial':
+            from .StrategyExecutor import StrategyExecutor
+            self.executor = StrategyExecutor(execution_mode, max_workers, strategy_deadline, late_policy)
         self.strategies = []
         self.active_symbols = set()
+        # Strategies indexed by the symbols they subscribe to
+        self.subscribers: Dict[str, List] = {}
 
     def add_strategy(self, strategy):
         """Add a trading strategy to the processor"""
         self.strategies.append(strategy)
         # Add symbols from strategy to active symbols
-        self.active_symbols.update(strategy.get_symbols())
+        symbols = strategy.get_symbols()
+        self.active_symbols.update(symbols)
+        for symbol in symbols:
+            self.subscribers.setdefault(symbol, []).append(strategy)
+
+    def on_price(self, symbol: str, price: float):
+        """Route a price update to the strategies subscribed to symbol and evaluate only that symbol"""
+        strategies = self.subscribers.get(symbol)
+        if not strategies:
+            return
+
+        if self.executor is not None:
+            self._dispatch(self.executor.on_price(strategies, symbol, price))
+            return
+
+        signals = []
+        for strategy in strategies:
+            strategy.update_price(symbol, price)
+            signals.extend(tag_signals(strategy, strategy.generate_signals_for_symbol(symbol)))
+
+        self._dispatch(signals)
 
     def process_signals(self):
         """Process signals from all strategies and generate orders"""
         all_signals = []
         
         # Collect signals from all strategies
-        for strategy in self.strategies:
-            signals = strategy.generate_signals()
-            if signals:
-                all_signals.extend(signals)
+        if self.executor is not None:
+            all_signals = self.executor.run(self.strategies)
+        else:
+            for strategy in self.strategies:
+                all_signals.extend(tag_signals(strategy, strategy.generate_signals()))
 
         # Process each signal
-        for signal in all_signals:
-            self._handle_signal(signal)
+        self._dispatch(all_signals)
+
+    def _dispatch(self, signals: List[TradingSignal]):
+        """Drop repeated signals, then turn the rest into orders"""
+        for signal in signals:
+            position_size = self._get_position_size(signal.symbol)
+            # A repeat is only acted on once the position moved, an order that is still
+            # working is not placed again
+            if self.coalescer is None or self.coalescer.accept(signal, position_size):
+                self._handle_signal(signal, position_size)
+
+    def close(self):
+        """Shut down the strategy worker pool, if any"""
+        if self.executor is not None:
+            self.executor.close()
+
+    def _get_position_size(self, symbol: str) -> float:
+        current_position = self.order_manager.get_position_for_symbol(symbol)
+        return current_position['position'] if current_position else 0
 
-    def _handle_signal(self, signal: TradingSignal):
-        """Handle individual trading signals"""
+    def _handle_signal(self, signal: TradingSignal, position_size: Optional[float] = None):
+        """Handle individual trading signals, position_size is looked up if not given"""
         # Get current position
-        current_position = self.order_manager.get_position_for_symbol(signal.symbol)
-        position_size = current_position['position'] if current_position else 0
+        if position_size is None:
+            position_size = self._get_position_size(signal.symbol)
 
         # Calculate order quantity based on signal and current position
         order_quantity = self._calculate_order_quantity(signal, position_size)
@@ -0,0 +1,130 @@
+"""
+Runs strategy evaluation in a worker pool so one slow strategy cannot stall
+tick processing on the IB reader thread.
+
+Every round submits each strategy at most once and waits up to `deadline`
+seconds. Results that are ready are merged in strategy registration order,
+so the signal order does not depend on which worker finished first. A
+strategy whose previous run is still in flight is skipped, never
+resubmitted. A run that misses the deadline is late: its signals are
+dropped (late_policy='drop') or handed out with signal.late = True at the
+start of the next round (late_policy='flag').
+
+In 'thread' mode price updates are queued per strategy and applied by the
+worker right before it evaluates, so strategy state is only touched by one
+thread at a time. In 'process' mode the parent applies updates and the
+worker evaluates a pickled snapshot, so strategies must be picklable.
+"""
+
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait
+from functools import partial
+from typing import List, Optional
+
+from .SignalProcessor import tag_signals
+
+
+def evaluate_strategy(strategy, symbol: Optional[str] = None):
+    """Signals of one strategy, for a single symbol or for all its symbols"""
+    if symbol is None:
+        return strategy.generate_signals()
+    return strategy.generate_signals_for_symbol(symbol)
+
+
+def drain_and_evaluate(strategy, updates: deque, symbol: Optional[str] = None):
+    while updates:
+        update_symbol, price = updates.popleft()
+        strategy.update_price(update_symbol, price)
+    return evaluate_strategy(strategy, symbol)
+
+
+class StrategyExecutor:
+    MODES = ('thread', 'process')
+    LATE_POLICIES = ('drop', 'flag')
+
+    def __init__(self, mode: str = 'thread', max_workers: Optional[int] = None,
+                 deadline: float = 0.05, late_policy: str = 'drop'):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown execution mode {mode}, expected one of {self.MODES}")
+        if late_policy not in self.LATE_POLICIES:
+            raise ValueError(f"Unknown late policy {late_policy}, expected one of {self.LATE_POLICIES}")
+        self.mode = mode
+        self.deadline = deadline
+        self.late_policy = late_policy
+        pool_class = ThreadPoolExecutor if mode == 'thread' else ProcessPoolExecutor
+        self.pool = pool_class(max_workers=max_workers)
+
+        self.lock = threading.Lock()
+        self.in_flight = {}
+        self.updates = {}
+        self.late_signals = []
+        self.stats = {'submitted': 0, 'completed': 0, 'late': 0, 'skipped_in_flight': 0, 'errors': 0}
+
+    def on_price(self, strategies, symbol: str, price: float) -> list:
+        """Deliver a price update to strategies and evaluate them for symbol"""
+        for strategy in strategies:
+            if self.mode == 'thread':
+                self.updates.setdefault(strategy, deque()).append((symbol, price))
+            else:
+                strategy.update_price(symbol, price)
+        return self.run(strategies, symbol)
+
+    def run(self, strategies, symbol: Optional[str] = None) -> list:
+        """One evaluation round, returns the signals that made the deadline"""
+        submitted = []
+        for strategy in strategies:
+            future = self.in_flight.get(strategy)
+            if future is not None and not future.done():
+                self.stats['skipped_in_flight'] += 1
+                continue
+
+            if self.mode == 'thread':
+                updates = self.updates.setdefault(strategy, deque())
+                future = self.pool.submit(drain_and_evaluate, strategy, updates, symbol)
+            else:
+                future = self.pool.submit(evaluate_strategy, strategy, symbol)
+            self.in_flight[strategy] = future
+            self.stats['submitted'] += 1
+            submitted.append((strategy, future))
+
+        done, _ = wait([future for _, future in submitted], timeout=self.deadline)
+
+        with self.lock:
+            signals, self.late_signals = self.late_signals, []
+
+        for strategy, future in submitted:
+            if future not in done:
+                self.stats['late'] += 1
+                future.add_done_callback(partial(self.on_late_result, strategy))
+                continue
+            signals.extend(self.result_of(strategy, future))
+        return signals
+
+    def result_of(self, strategy, future) -> List:
+        try:
+            signals = future.result() or []
+        except Exception as e:
+            with self.lock:
+                self.stats['errors'] += 1
+            print(f"Error in strategy {type(strategy).__name__}: {e}")
+            return []
+        with self.lock:
+            self.stats['completed'] += 1
+        return tag_signals(strategy, signals)
+
+    def on_late_result(self, strategy, future):
+        signals = self.result_of(strategy, future)
+        if self.late_policy == 'drop' or not signals:
+            return
+        for signal in signals:
+            signal.late = True
+        with self.lock:
+            self.late_signals.extend(signals)
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            return dict(self.stats)
+
+    def close(self):
+        self.pool.shutdown(wait=True)
@@ -0,0 +1,151 @@
+"""
+Streaming indicators with O(1) work and memory per bar
+
+Each indicator keeps only the state its recursion needs and exposes
+update(bar), where bar is anything indexable by 'high', 'low' and 'close'
+(the bar_data dict published by IBRealtimeDataBarGenerator, a DataFrame row,
+...). Values are NaN until enough bars have been seen, like the batch
+versions in supertrend_basic.py.
+
+The 'ewm' ATR repeats pandas' ewm(adjust=True) update step by step, so
+SuperTrend over a stream gives exactly the same floats as supertrend().
+"""
+
+import math
+from collections import deque
+
+NAN = float('nan')
+
+
+class TrueRange:
+    def __init__(self):
+        self.prev_close = NAN
+        self.value = NAN
+
+    def update(self, bar):
+        high, low, close = bar['high'], bar['low'], bar['close']
+        # NaN terms are skipped, so the first bar is high - low
+        ranges = [r for r in (high - low, abs(high - self.prev_close), abs(low - self.prev_close)) if r == r]
+        self.value = max(ranges) if ranges else NAN
+        self.prev_close = close
+        return self.value
+
+
+class ATR:
+    """
+    mode:
+        'ewm': tr.ewm(com=period, min_periods=period).mean(), what supertrend() uses
+        'wilder': Wilder's RMA, seeded with the mean of the first `period` bars
+        'sma': tr.rolling(period).mean(), what supertrend_ai() uses
+    """
+
+    MODES = ('ewm', 'wilder', 'sma')
+
+    def __init__(self, period=10, mode='ewm'):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown ATR mode {mode}, expected one of {self.MODES}")
+        if period < 1:
+            raise ValueError("period must be at least 1")
+        self.period = period
+        self.mode = mode
+        self.true_range = TrueRange()
+        self.value = NAN
+        self.count = 0
+
+        # ewm state, same names as pandas' ewm loop
+        alpha = 1.0 / (1.0 + period)
+        self.old_wt_factor = 1.0 - alpha
+        self.old_wt = 1.0
+        self.weighted = NAN
+
+        # sma state
+        self.window = deque(maxlen=period)
+        self.window_sum = 0.0
+
+    @property
+    def ready(self):
+        return self.value == self.value
+
+    def update(self, bar):
+        return self.update_tr(self.true_range.update(bar))
+
+    def update_tr(self, tr):
+        is_observation = tr == tr
+        if is_observation:
+            self.count += 1
+
+        if self.mode == 'ewm':
+            if self.weighted == self.weighted:
+                self.old_wt *= self.old_wt_factor
+                if is_observation:
+                    if self.weighted != tr:
+                        self.weighted = (self.old_wt * self.weighted + tr) / (self.old_wt + 1.0)
+                    self.old_wt += 1.0
+            elif is_observation:
+                self.weighted = tr
+            self.value = self.weighted if self.count >= self.period else NAN
+
+        elif self.mode == 'wilder':
+            if not is_observation:
+                return self.value
+            if self.count < self.period:
+                self.window_sum += tr
+            elif self.count == self.period:
+                self.window_sum += tr
+                self.value = self.window_sum / self.period
+            else:
+                self.value = (self.value * (self.period - 1) + tr) / self.period
+
+        else:
+            # Running sum, recomputed from the window now and then so rounding errors cannot build up
+            if len(self.window) == self.period:
+                self.window_sum -= self.window[0]
+            self.window.append(tr)
+            self.window_sum += tr
+            if self.count % (self.period * 1000) == 0:
+                self.window_sum = math.fsum(self.window)
+            full = len(self.window) == self.period and all(v == v for v in self.window)
+            self.value = self.window_sum / self.period if full else NAN
+
+        return self.value
+
+
+class SuperTrend:
+    """
+    Streaming supertrend_basic.supertrend(): direction 1 (up) / -1 (down),
+    the line starts on bar `period` (0-based) and only moves with the trend.
+    update(bar) returns (supertrend, direction).
+    """
+
+    def __init__(self, period=10, multiplier=3, atr_mode='ewm'):
+        self.period = period
+        self.multiplier = multiplier
+        self.atr = ATR(period, atr_mode)
+        self.bars = 0
+        self.upper = NAN
+        self.lower = NAN
+        self.value = NAN
+        self.direction = NAN
+
+    def update(self, bar):
+        atr = self.atr.update(bar)
+        hl2 = (bar['high'] + bar['low']) / 2
+        upper = hl2 + (self.multiplier * atr)
+        lower = hl2 - (self.multiplier * atr)
+        close = bar['close']
+
+        if self.bars >= self.period:
+            if close > self.upper:
+                self.value = lower
+                self.direction = 1.0
+            elif close < self.lower:
+                self.value = upper
+                self.direction = -1.0
+            elif self.direction == 1.0 and lower < self.value:
+                self.value = lower
+            elif self.direction == -1.0 and upper > self.value:
+                self.value = upper
+
+        self.upper, self.lower = upper, lower
+        self.bars += 1
+        return self.value, self.direction
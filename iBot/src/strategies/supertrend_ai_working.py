@@ -10,7 +10,10 @@ from tensorflow.keras.layers import LSTM, Dense
 import os
 import sqlite3
 
-def supertrend_ai(data, atr_period=10, factor_range=(1, 5), factor_step=0.5, perf_alpha=10, **kwargs):
+from .supertrend_kernel import supertrend_bands, supertrend_factor_sweep, supertrend_kernel
+from .vectorized_backtest import vectorized_backtest
+
+def supertrend_ai(data, atr_period=10, factor_range=(1, 5), factor_step=0.5, perf_alpha=10, batched=True, **kwargs):
     high, low, close = data['high'], data['low'], data['close']
     
     # Calculate ATR
@@ -23,40 +26,27 @@ def supertrend_ai(data, atr_period=10, factor_range=(1, 5), factor_step=0.5, per
     factors = np.arange(factor_range[0], factor_range[1] + factor_step, factor_step)
     
     # Calculate SuperTrend for each factor
-    supertrends = []
-    performances = []
-    
-    for factor in factors:
-        upper = (high + low) / 2 + factor * atr
-        lower = (high + low) / 2 - factor * atr
-        
-        supertrend = pd.Series(index=data.index, dtype=float)
-        trend = pd.Series(index=data.index, dtype=int)
-        
-        for i in range(1, len(data.index)):
-            if close[i] > upper[i-1]:
-                supertrend[i] = lower[i]
-                trend[i] = 1
-            elif close[i] < lower[i-1]:
-                supertrend[i] = upper[i]
-                trend[i] = 0
-            else:
-                supertrend[i] = supertrend[i-1]
-                trend[i] = trend[i-1]
-                
-                if (supertrend[i] < upper[i]) and (close[i] > supertrend[i-1]):
-                    supertrend[i] = lower[i]
-                    trend[i] = 1
-                elif (supertrend[i] > lower[i]) and (close[i] < supertrend[i-1]):
-                    supertrend[i] = upper[i]
-                    trend[i] = 0
-        
-        # Calculate performance
-        diff = np.sign(close.shift(1) - supertrend)
-        perf = (close.diff() * diff).ewm(alpha=2/(perf_alpha+1), adjust=False).mean()
-        
-        supertrends.append(supertrend)
-        performances.append(perf)
+    if batched:
+        # All factors and their performance in one (bars x factors) pass sharing hl2 and ATR
+        st_matrix, perf_matrix = supertrend_factor_sweep(high, low, close, atr, factors,
+                                                         perf_alpha=2/(perf_alpha+1))
+        supertrends = list(st_matrix.T)
+        performances = perf_matrix.T
+    else:
+        supertrends = []
+        performances = []
+
+        for factor in factors:
+            upper, lower = supertrend_bands(high, low, atr, factor)
+            st_values, _ = supertrend_kernel(close, upper, lower, variant='ai', start=1, lag=1)
+            supertrend = pd.Series(st_values, index=data.index)
+
+            # Calculate performance
+            diff = np.sign(close.shift(1) - supertrend)
+            perf = (close.diff() * diff).ewm(alpha=2/(perf_alpha+1), adjust=False).mean()
+
+            supertrends.append(supertrend)
+            performances.append(perf)
     
     # Prepare data for ML models
     X = np.array(performances).T
@@ -137,114 +127,41 @@ def supertrend_ai(data, atr_period=10, factor_range=(1, 5), factor_step=0.5, per
     # Use the median of all model factors as the final best factor
     best_factor = np.median(all_factors, axis=1)
     
-    # Recalculate SuperTrend with best factor
-    supertrend = pd.Series(index=data.index, dtype=float)
-    trend = pd.Series(index=data.index, dtype=int)
-    
-    for i in range(1, len(data.index)):
-        upper = (high[i] + low[i]) / 2 + best_factor[i] * atr[i]
-        lower = (high[i] + low[i]) / 2 - best_factor[i] * atr[i]
-        
-        if close[i] > upper:
-            supertrend[i] = lower
-            trend[i] = 1
-        elif close[i] < lower:
-            supertrend[i] = upper
-            trend[i] = 0
-        else:
-            supertrend[i] = supertrend[i-1]
-            trend[i] = trend[i-1]
-            
-            if (supertrend[i] < upper) and (close[i] > supertrend[i-1]):
-                supertrend[i] = lower
-                trend[i] = 1
-            elif (supertrend[i] > lower) and (close[i] < supertrend[i-1]):
-                supertrend[i] = upper
-                trend[i] = 0
+    # Recalculate SuperTrend with best factor, comparing against the current bar's bands
+    upper, lower = supertrend_bands(high, low, atr, best_factor)
+    supertrend, trend = supertrend_kernel(close, upper, lower, variant='ai', start=1, lag=0)
     
     return pd.DataFrame({
         'SuperTrend': supertrend,
         'Trend': trend,
         'BestFactor': best_factor
-    })
+    }, index=data.index)
 
-def backtest(data, st_data, contract_size=1):
+def backtest(data, st_data, contract_size=1, symbol="MES"):
     """
     Backtest the SuperTrend strategy
     
     :param data: DataFrame with OHLC data
     :param st_data: DataFrame with SuperTrend data
     :param contract_size: Number of contracts to trade (1 or 2)
+    :param symbol: MicroFamily symbol, sets tick value and commission
     :return: DataFrame with backtest results
     """
+    results = vectorized_backtest(data.index, data['close'], st_data['Trend'], symbol=symbol,
+                                  contracts=contract_size)
+
+    print(f"Total Profit: ${results['total_profit']:.2f}")
+    print(f"Max Drawdown: ${results['max_drawdown']:.2f}")
+    print(f"Win Rate: {results['win_rate']:.2%}")
+    print(f"Number of Trades: {results['num_trades']}")
     
-    # Initialize variables
-    position = 0
-    entry_price = 0
-    trades = []
-    
-    for i in range(1, len(data)):
-        if st_data['Trend'][i] == 1 and st_data['Trend'][i-1] == 0:  # Buy signal
-            if position <= 0:
-                entry_price = data['close'][i]
-                position = contract_size
-                trades.append({
-                    'entry_date': data.index[i],
-                    'entry_price': entry_price,
-                    'position': position
-                })
-        elif st_data['Trend'][i] == 0 and st_data['Trend'][i-1] == 1:  # Sell signal
-            if position >= 0:
-                exit_price = data['close'][i]
-                if position > 0:
-                    profit = (exit_price - entry_price) * position
-                    trades[-1]['exit_date'] = data.index[i]
-                    trades[-1]['exit_price'] = exit_price
-                    trades[-1]['profit'] = profit
-                position = -contract_size
-                entry_price = exit_price
-                trades.append({
-                    'entry_date': data.index[i],
-                    'entry_price': entry_price,
-                    'position': position
-                })
-    
-    # Close any open position at the end
-    if position != 0:
-        exit_price = data['close'][-1]
-        profit = (exit_price - entry_price) * position
-        trades[-1]['exit_date'] = data.index[-1]
-        trades[-1]['exit_price'] = exit_price
-        trades[-1]['profit'] = profit
-    
-    # Create a DataFrame from the trades list
-    trades_df = pd.DataFrame(trades)
-    
-    # Calculate cumulative profit and other statistics
-    trades_df['cumulative_profit'] = trades_df['profit'].cumsum()
-    total_profit = trades_df['profit'].sum()
-    win_rate = (trades_df['profit'] > 0).mean()
-    
-    print(f"Total Profit: ${total_profit:.2f}")
-    print(f"Win Rate: {win_rate:.2%}")
-    print(f"Number of Trades: {len(trades_df)}")
-    
-    return trades_df
+    return results['trades']
 
 if __name__ == "__main__":
-    # Example usage
-    import sqlite3
-    import pandas as pd
-
-    # Connect to the SQLite database
-    conn = sqlite3.connect('data/HistoricalData_MES_FUT_1min_20241022.db')
-
-    # Read data from the database
-    query = "SELECT * FROM historical_data"
-    data = pd.read_sql_query(query, conn)
-
-    # Close the database connection
-    conn.close()
+    # Example usage, run from src: python -m strategies.supertrend_ai_working
+    # Load the bars from the memory-mapped cache, it is rebuilt only when the db changes
+    from DataBarCache import BarCache
+    data = BarCache().load_frame('data/HistoricalData_MES_FUT_1min_20241022.db', symbol='MES').reset_index()
 
     # Print the column names to verify the structure
     print("Columns in the loaded data:", data.columns)
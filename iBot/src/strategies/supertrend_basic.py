@@ -1,9 +1,8 @@
 import pandas as pd
 import numpy as np
 import sqlite3
-import matplotlib.pyplot as plt
-from mplfinance.original_flavor import candlestick_ohlc
-import matplotlib.dates as mdates
+
+from .supertrend_kernel import supertrend_bands, supertrend_kernel
 
 def clean_data(data):
     # Convert timestamp to datetime
@@ -44,30 +43,11 @@ def supertrend(data, period=10, multiplier=3):
     atr = tr.ewm(com=period, min_periods=period).mean()
 
     # Calculate basic upper and lower bands
-    hl2 = (high + low) / 2
-    final_upperband = hl2 + (multiplier * atr)
-    final_lowerband = hl2 - (multiplier * atr)
-
-    # Initialize SuperTrend Series
-    supertrend = pd.Series(index=data.index, dtype=float)
-    direction = pd.Series(index=data.index, dtype=int)
+    final_upperband, final_lowerband = supertrend_bands(high, low, atr, multiplier)
 
     # Calculate SuperTrend
-    for i in range(period, len(data)):
-        if close.iloc[i] > final_upperband.iloc[i-1]:
-            supertrend.iloc[i] = final_lowerband.iloc[i]
-            direction.iloc[i] = 1
-        elif close.iloc[i] < final_lowerband.iloc[i-1]:
-            supertrend.iloc[i] = final_upperband.iloc[i]
-            direction.iloc[i] = -1
-        else:
-            supertrend.iloc[i] = supertrend.iloc[i-1]
-            direction.iloc[i] = direction.iloc[i-1]
-
-            if (direction.iloc[i] == 1) and (final_lowerband.iloc[i] < supertrend.iloc[i]):
-                supertrend.iloc[i] = final_lowerband.iloc[i]
-            elif (direction.iloc[i] == -1) and (final_upperband.iloc[i] > supertrend.iloc[i]):
-                supertrend.iloc[i] = final_upperband.iloc[i]
+    supertrend, direction = supertrend_kernel(close, final_upperband, final_lowerband,
+                                              variant='basic', start=period)
 
     # Create DataFrame with SuperTrend data
     st_data = pd.DataFrame(index=data.index)
@@ -77,18 +57,10 @@ def supertrend(data, period=10, multiplier=3):
     return st_data
 
 if __name__ == "__main__":
-    # Connect to the SQLite database
-    conn = sqlite3.connect('data/HistoricalData_MES_FUT_1min_20241022.db')
-
-    # Read data from the database
-    query = "SELECT * FROM historical_data"
-    data = pd.read_sql_query(query, conn)
-
-    # Close the database connection
-    conn.close()
-
-    # Clean the data
-    data = clean_data(data)
+    # Run from src: python -m strategies.supertrend_basic
+    # Load the cleaned bars from the memory-mapped cache, it is rebuilt only when the db changes
+    from DataBarCache import BarCache
+    data = BarCache().load_frame('data/HistoricalData_MES_FUT_1min_20241022.db', symbol='MES')
 
     # Calculate SuperTrend
     st_data = supertrend(data)
@@ -117,6 +89,11 @@ if __name__ == "__main__":
     avg_trend_duration = len(st_data) / trend_changes
     print(f"Average trend duration: {avg_trend_duration:.2f} periods")
 
+    # Plotting only, the indicator itself does not need matplotlib
+    import matplotlib.pyplot as plt
+    from mplfinance.original_flavor import candlestick_ohlc
+    import matplotlib.dates as mdates
+
     # Create a plot
     fig, ax = plt.subplots(figsize=(20,10))
 
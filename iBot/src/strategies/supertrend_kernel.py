@@ -0,0 +1,205 @@
+"""
+SuperTrend band recursion on raw float64 arrays
+
+The bands are vectorized, only the trend state recursion is sequential. It
+runs as a compiled loop when numba is installed and as a plain Python loop
+over lists otherwise (still ~100x faster than Series.iloc assignment).
+Values before `start` are NaN, and comparisons against NaN are False, the
+same as the pandas implementations these replace.
+
+Variants:
+    basic: supertrend_basic.supertrend(), direction is 1 / -1 and the line
+        only moves with the trend once it is set.
+    ai: supertrend_ai_working.supertrend_ai(), trend is 1 / 0 and the line
+        can flip inside the band. lag=1 compares the close with the previous
+        bar's bands (per-factor pass), lag=0 with the current bar's bands
+        (best-factor pass).
+
+supertrend_factor_sweep runs the 'ai' recursion and its performance EWMA
+for many factors at once, as one (bars x factors) pass.
+"""
+
+import numpy as np
+import pandas as pd
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+
+def true_range(high, low, close):
+    """max(high - low, |high - prev close|, |low - prev close|), first bar is high - low"""
+    high, low, close = (np.asarray(a, dtype=np.float64) for a in (high, low, close))
+    prev_close = np.empty_like(close)
+    prev_close[0] = np.nan
+    prev_close[1:] = close[:-1]
+    return np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+
+
+def supertrend_bands(high, low, atr, multiplier):
+    """Upper and lower bands, hl2 +/- multiplier * atr"""
+    hl2 = (np.asarray(high, dtype=np.float64) + np.asarray(low, dtype=np.float64)) / 2
+    atr = np.asarray(atr, dtype=np.float64)
+    return hl2 + multiplier * atr, hl2 - multiplier * atr
+
+
+def supertrend_factor_bands(high, low, atr, factors):
+    """(bars x factors) upper and lower bands sharing one hl2 and ATR"""
+    hl2 = (np.asarray(high, dtype=np.float64) + np.asarray(low, dtype=np.float64)) / 2
+    offset = np.asarray(factors, dtype=np.float64)[None, :] * np.asarray(atr, dtype=np.float64)[:, None]
+    return hl2[:, None] + offset, hl2[:, None] - offset
+
+
+def _basic_loop(close, upper, lower, supertrend, direction, start):
+    for i in range(start, len(close)):
+        if close[i] > upper[i - 1]:
+            supertrend[i] = lower[i]
+            direction[i] = 1.0
+        elif close[i] < lower[i - 1]:
+            supertrend[i] = upper[i]
+            direction[i] = -1.0
+        else:
+            supertrend[i] = supertrend[i - 1]
+            direction[i] = direction[i - 1]
+
+            if direction[i] == 1.0 and lower[i] < supertrend[i]:
+                supertrend[i] = lower[i]
+            elif direction[i] == -1.0 and upper[i] > supertrend[i]:
+                supertrend[i] = upper[i]
+
+
+def _ai_loop(close, upper, lower, supertrend, direction, start, lag):
+    for i in range(start, len(close)):
+        if close[i] > upper[i - lag]:
+            supertrend[i] = lower[i]
+            direction[i] = 1.0
+        elif close[i] < lower[i - lag]:
+            supertrend[i] = upper[i]
+            direction[i] = 0.0
+        else:
+            supertrend[i] = supertrend[i - 1]
+            direction[i] = direction[i - 1]
+
+            if supertrend[i] < upper[i] and close[i] > supertrend[i - 1]:
+                supertrend[i] = lower[i]
+                direction[i] = 1.0
+            elif supertrend[i] > lower[i] and close[i] < supertrend[i - 1]:
+                supertrend[i] = upper[i]
+                direction[i] = 0.0
+
+
+def _ai_sweep_loop(close, hl2, atr, factors, alpha, supertrend, performance):
+    # Factors are the inner loop, so each bar writes one contiguous row. The
+    # performance EWMA (adjust=False) is updated in the same pass with the
+    # same arithmetic as pandas' ewm, so the results match bit for bit.
+    n, m = supertrend.shape
+    old_wt_factor = 1.0 - alpha
+    weighted = np.full(m, np.nan)
+    old_wt = np.ones(m)
+    for i in range(1, n):
+        c = close[i]
+        prev_close = close[i - 1]
+        for k in range(m):
+            upper = hl2[i] + factors[k] * atr[i]
+            lower = hl2[i] - factors[k] * atr[i]
+            prev_st = supertrend[i - 1, k]
+            if c > hl2[i - 1] + factors[k] * atr[i - 1]:
+                st = lower
+            elif c < hl2[i - 1] - factors[k] * atr[i - 1]:
+                st = upper
+            else:
+                st = prev_st
+                if st < upper and c > prev_st:
+                    st = lower
+                elif st > lower and c < prev_st:
+                    st = upper
+            supertrend[i, k] = st
+
+            cur = (c - prev_close) * np.sign(prev_close - st)
+            w = weighted[k]
+            if w == w:
+                old_wt[k] *= old_wt_factor
+                if cur == cur:
+                    if w != cur:
+                        w = (old_wt[k] * w + alpha * cur) / (old_wt[k] + alpha)
+                    old_wt[k] = 1.0
+            elif cur == cur:
+                w = cur
+            weighted[k] = w
+            performance[i, k] = w
+
+
+if njit is not None:
+    _basic_loop_jit = njit(cache=True)(_basic_loop)
+    _ai_loop_jit = njit(cache=True)(_ai_loop)
+    _ai_sweep_loop_jit = njit(cache=True)(_ai_sweep_loop)
+
+
+def supertrend_kernel(close, upper, lower, variant='basic', start=1, lag=1, use_jit=True):
+    """
+    Run the SuperTrend recursion from bar `start`.
+    Returns (supertrend, direction) float64 arrays, NaN before `start`.
+    """
+    if variant not in ('basic', 'ai'):
+        raise ValueError(f"Unknown SuperTrend variant: {variant}")
+    if variant == 'basic' and lag != 1:
+        raise ValueError("The basic variant only supports lag=1")
+    start = max(start, 1)
+
+    close, upper, lower = (np.ascontiguousarray(a, dtype=np.float64) for a in (close, upper, lower))
+    n = len(close)
+
+    if use_jit and njit is not None:
+        supertrend = np.full(n, np.nan)
+        direction = np.full(n, np.nan)
+        if variant == 'basic':
+            _basic_loop_jit(close, upper, lower, supertrend, direction, start)
+        else:
+            _ai_loop_jit(close, upper, lower, supertrend, direction, start, lag)
+        return supertrend, direction
+
+    # Python floats in lists are much cheaper to index than NumPy scalars
+    supertrend = [np.nan] * n
+    direction = [np.nan] * n
+    if variant == 'basic':
+        _basic_loop(close.tolist(), upper.tolist(), lower.tolist(), supertrend, direction, start)
+    else:
+        _ai_loop(close.tolist(), upper.tolist(), lower.tolist(), supertrend, direction, start, lag)
+    return np.array(supertrend, dtype=np.float64), np.array(direction, dtype=np.float64)
+
+
+def pandas_alpha(alpha):
+    """The alpha pandas' ewm really uses, it goes through a center of mass and can move by an ulp"""
+    com = (1.0 - alpha) / alpha
+    return 1.0 / (1.0 + com)
+
+
+def supertrend_factor_sweep(high, low, close, atr, factors, perf_alpha, use_jit=True):
+    """
+    'ai' SuperTrend (lag=1) and its performance for every factor in one pass,
+        perf = (close.diff() * sign(close.shift(1) - supertrend)).ewm(alpha=perf_alpha, adjust=False).mean()
+    hl2 and ATR are shared and the band matrices are never materialized.
+    Returns (supertrend, performance) as (bars x factors) float64 matrices.
+    """
+    close = np.ascontiguousarray(close, dtype=np.float64)
+    hl2 = (np.asarray(high, dtype=np.float64) + np.asarray(low, dtype=np.float64)) / 2
+    atr = np.ascontiguousarray(atr, dtype=np.float64)
+    factors = np.ascontiguousarray(factors, dtype=np.float64)
+
+    if use_jit and njit is not None:
+        supertrend = np.full((len(close), len(factors)), np.nan)
+        performance = np.full((len(close), len(factors)), np.nan)
+        _ai_sweep_loop_jit(close, hl2, atr, factors, pandas_alpha(perf_alpha), supertrend, performance)
+        return supertrend, performance
+
+    # Without a compiler one list-based pass per factor is cheaper than per-bar NumPy row ops
+    upper, lower = supertrend_factor_bands(high, low, atr, factors)
+    columns = [supertrend_kernel(close, upper[:, k], lower[:, k], 'ai', 1, 1, use_jit)[0]
+               for k in range(len(factors))]
+    supertrend = np.column_stack(columns) if columns else np.empty((len(close), 0))
+
+    prev_close = np.concatenate(([np.nan], close[:-1]))
+    returns = (close - prev_close)[:, None] * np.sign(prev_close[:, None] - supertrend)
+    performance = pd.DataFrame(returns).ewm(alpha=perf_alpha, adjust=False).mean().to_numpy()
+    return supertrend, performance
@@ -0,0 +1,77 @@
+"""
+Vectorized stop-and-reverse backtest on a trend vector
+
+The strategy is long while trend == 1 and short otherwise (0 for
+supertrend_ai, -1 for supertrend_basic), entering at the close of the first
+flip and reversing at the close of every following flip. The open position
+is closed at the last bar. Bars where the trend is NaN never trigger a flip.
+
+Everything is computed with array operations, there is no per-bar loop.
+"""
+
+import numpy as np
+import pandas as pd
+
+from utils.contract_specs import DEFAULT_COMMISSION_PER_CONTRACT, point_value
+
+
+def vectorized_backtest(index, close, trend, symbol="MES", contracts=1,
+                        commission_per_contract=DEFAULT_COMMISSION_PER_CONTRACT):
+    """
+    index: bar timestamps (used for the trade dates)
+    close, trend: per-bar arrays or Series of the same length
+    Returns a dict with the trades DataFrame, the per-bar equity and drawdown
+    arrays (dollars) and summary stats.
+    """
+    close = np.asarray(close, dtype=np.float64)
+    trend = np.asarray(trend, dtype=np.float64)
+    index = np.asarray(index)
+    multiplier = point_value(symbol) * contracts
+    n = len(close)
+
+    # +1 long, -1 short, flips only between two valid bars
+    state = np.where(trend == 1, 1, -1)
+    valid = ~np.isnan(trend)
+    flip = np.zeros(n, dtype=bool)
+    flip[1:] = (state[1:] != state[:-1]) & valid[1:] & valid[:-1]
+    entries = np.flatnonzero(flip)
+
+    # Position held after each bar: the direction of the last flip, 0 before the first one
+    last_flip = np.maximum.accumulate(np.where(flip, np.arange(n), -1))
+    position = np.where(last_flip >= 0, state[np.maximum(last_flip, 0)], 0)
+
+    # Per-bar PnL of the position held into the bar, commission on every side traded
+    bar_pnl = np.zeros(n)
+    bar_pnl[1:] = position[:-1] * np.diff(close) * multiplier
+    sides = np.abs(np.diff(position, prepend=0))
+    if len(entries):
+        sides[-1] += abs(position[-1])
+    bar_pnl -= sides * commission_per_contract * contracts
+
+    equity = np.cumsum(bar_pnl)
+    drawdown = equity - np.maximum.accumulate(np.maximum(equity, 0))
+
+    # One trade per flip, closed at the next flip or the last bar, no trades if the trend never flips
+    exits = np.append(entries[1:], n - 1) if len(entries) else entries
+    direction = state[entries]
+    profit = (close[exits] - close[entries]) * direction * multiplier - 2 * commission_per_contract * contracts
+
+    trades = pd.DataFrame({
+        'entry_date': index[entries],
+        'entry_price': close[entries],
+        'position': direction * contracts,
+        'exit_date': index[exits],
+        'exit_price': close[exits],
+        'profit': profit,
+    })
+    trades['cumulative_profit'] = trades['profit'].cumsum()
+
+    return {
+        'trades': trades,
+        'equity': equity,
+        'drawdown': drawdown,
+        'total_profit': float(profit.sum()),
+        'max_drawdown': float(drawdown.min()) if n else 0.0,
+        'win_rate': float((profit > 0).mean()) if len(profit) else 0.0,
+        'num_trades': len(trades),
+    }
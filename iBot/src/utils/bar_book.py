@@ -0,0 +1,74 @@
+import numpy as np
+
+# Column layout of BarBook.bars
+OPEN, HIGH, LOW, CLOSE, VOLUME = range(5)
+
+
+class BarBook:
+    """
+    Bars being built for N symbols, kept in one (N, 5) float64 array
+    (open, high, low, close, volume) plus one start time per symbol.
+    Symbols are addressed by their row index, see BarBook.index.
+    """
+
+    def __init__(self, symbols):
+        self.symbols = list(symbols)
+        self.index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.bars = np.full((len(self.symbols), 5), np.nan)
+        self.bars[:, VOLUME] = 0
+        # Epoch seconds of the open bar, NaN while no bar is open for the symbol
+        self.bar_start = np.full(len(self.symbols), np.nan)
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def is_open(self, i):
+        return self.bar_start[i] == self.bar_start[i]
+
+    def open_bar(self, i, start, price, volume=0):
+        """Open row i at price, size ticks that arrived before it (see add_volume) are kept"""
+        self.bar_start[i] = start
+        row = self.bars[i]
+        row[OPEN] = row[HIGH] = row[LOW] = row[CLOSE] = price
+        row[VOLUME] += volume
+
+    def update_price(self, i, price):
+        row = self.bars[i]
+        if price > row[HIGH]:
+            row[HIGH] = price
+        if price < row[LOW]:
+            row[LOW] = price
+        row[CLOSE] = price
+
+    def add_volume(self, i, size):
+        # Also counted while no bar is open, open_bar carries it into the next bar
+        self.bars[i, VOLUME] += size
+
+    def take_volume(self, i):
+        """Volume collected for row i while no bar was open, cleared"""
+        volume = float(self.bars[i, VOLUME])
+        self.bars[i, VOLUME] = 0
+        return volume
+
+    def merge_bar(self, i, start, open_, high, low, close, volume):
+        """Fold a complete finer bar into row i, opening the row at `start` if needed"""
+        row = self.bars[i]
+        if not self.is_open(i):
+            self.bar_start[i] = start
+            row[OPEN], row[HIGH], row[LOW], row[CLOSE], row[VOLUME] = open_, high, low, close, volume
+            return
+        if high > row[HIGH]:
+            row[HIGH] = high
+        if low < row[LOW]:
+            row[LOW] = low
+        row[CLOSE] = close
+        row[VOLUME] += volume
+
+    def close_bar(self, i):
+        """Return (start, open, high, low, close, volume) and clear row i"""
+        start = self.bar_start[i]
+        open_, high, low, close, volume = self.bars[i].tolist()
+        self.bar_start[i] = np.nan
+        self.bars[i, :VOLUME] = np.nan
+        self.bars[i, VOLUME] = 0
+        return start, open_, high, low, close, volume
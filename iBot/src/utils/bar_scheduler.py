@@ -0,0 +1,122 @@
+import threading
+import time
+from datetime import datetime
+
+import pytz
+
+
+def bar_start_for(epoch_seconds, interval, tz_offset=0):
+    """Start (epoch seconds) of the interval-aligned bar containing epoch_seconds"""
+    local = epoch_seconds + tz_offset
+    return local - local % interval - tz_offset
+
+
+def next_boundary(boundary, interval, offset_at):
+    """
+    First interval-aligned boundary on the local clock after `boundary`.
+    offset_at(epoch_seconds) is the UTC offset in effect at that instant, so a
+    DST change in between moves the boundary (a 23 or 25 hour daily bar)
+    instead of shifting every later bar by an hour.
+    """
+    following = boundary + interval
+    if (following + offset_at(following)) % interval == 0:
+        return following
+    # Aligned on the local clock before the change, convert with the offset after it
+    local = boundary + offset_at(boundary) + interval
+    for offset in (offset_at(boundary), offset_at(following)):
+        if offset_at(local - offset) == offset:
+            return local - offset
+    return following
+
+
+class BarCloseScheduler:
+    """
+    Calls callback(boundary, lateness) on every bar boundary, i.e. every
+    multiple of `interval` seconds on the exchange's local clock.
+
+    The wall clock is read once at start and the schedule then runs on the
+    monotonic clock, so NTP adjustments cannot shift or repeat boundaries.
+    Each next boundary is aligned with the UTC offset in effect at it, so
+    bars stay on the local clock across DST changes.
+    The thread sleeps until `spin` seconds before a boundary and busy-waits
+    the rest, which keeps lateness well under a millisecond.
+    """
+
+    def __init__(self, interval, callback, timezone='US/Eastern', spin=0.002):
+        if interval <= 0:
+            raise ValueError("interval must be positive")
+        self.interval = interval
+        self.callback = callback
+        self.timezone = pytz.timezone(timezone)
+        self.spin = spin
+        self.stop_event = threading.Event()
+        self.thread = None
+
+        # Lateness of each callback, seconds past the boundary
+        self.lateness_count = 0
+        self.total_lateness = 0.0
+        self.last_lateness = 0.0
+        self.max_lateness = 0.0
+
+    def tz_offset(self, epoch_seconds=None):
+        """UTC offset in seconds of the exchange timezone at epoch_seconds, now by default"""
+        if epoch_seconds is None:
+            epoch_seconds = time.time()
+        return datetime.fromtimestamp(epoch_seconds, self.timezone).utcoffset().total_seconds()
+
+    def current_bar_start(self):
+        return bar_start_for(time.time(), self.interval, self.tz_offset())
+
+    def start(self):
+        if self.thread is not None and self.thread.is_alive():
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join()
+
+    def run(self):
+        # Anchor the wall clock to the monotonic clock once
+        wall_anchor = time.time()
+        mono_anchor = time.monotonic()
+        boundary = next_boundary(bar_start_for(wall_anchor, self.interval, self.tz_offset(wall_anchor)),
+                                 self.interval, self.tz_offset)
+
+        while not self.stop_event.is_set():
+            target = mono_anchor + (boundary - wall_anchor)
+            remaining = target - time.monotonic()
+            if remaining > self.spin:
+                self.stop_event.wait(remaining - self.spin)
+                continue
+
+            while time.monotonic() < target:
+                pass
+
+            lateness = time.monotonic() - target
+            self.record_lateness(lateness)
+            try:
+                self.callback(boundary, lateness)
+            except Exception as e:
+                print(f"Error in bar close callback: {e}")
+
+            boundary = next_boundary(boundary, self.interval, self.tz_offset)
+
+    def record_lateness(self, lateness):
+        self.lateness_count += 1
+        self.total_lateness += lateness
+        self.last_lateness = lateness
+        self.max_lateness = max(self.max_lateness, lateness)
+
+    def get_stats(self):
+        """Bar close lateness in milliseconds"""
+        count = self.lateness_count
+        return {
+            'bars_closed': count,
+            'last_lateness_ms': self.last_lateness * 1000,
+            'avg_lateness_ms': self.total_lateness / count * 1000 if count else 0.0,
+            'max_lateness_ms': self.max_lateness * 1000,
+        }
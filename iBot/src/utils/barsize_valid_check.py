@@ -60,4 +60,33 @@ def barsize_valid_check(frequency):
     elif unit == "hour":
         return "1 hour"
     elif unit == "day":
-        return "1 day"
\ No newline at end of file
+        return "1 day"
+
+def barsize_to_seconds(frequency):
+
+    """
+    Convert a bar size to a number of seconds.
+    Accepts IB style settings ("1 min", "5 secs"), the compact form used in
+    our file names ("1min", "60s", "1day") or a plain number of seconds.
+    """
+
+    if isinstance(frequency, (int, float)):
+        return int(frequency)
+
+    unit_seconds = {
+        "s": 1, "sec": 1, "secs": 1, "second": 1, "seconds": 1,
+        "m": 60, "min": 60, "mins": 60, "minute": 60, "minutes": 60,
+        "h": 3600, "hour": 3600, "hours": 3600, "hourly": 3600,
+        "d": 86400, "day": 86400, "days": 86400,
+    }
+
+    text = frequency.replace(" ", "")
+    digits = len(text) - len(text.lstrip("0123456789"))
+    if digits == 0:
+        raise ValueError(f"Invalid frequency format: {frequency}. Expected 'value unit'.")
+
+    value, unit = int(text[:digits]), text[digits:]
+    if unit.lower() not in unit_seconds:
+        raise ValueError(f"Invalid frequency unit: {unit}. Expected one of {list(unit_seconds.keys())}.")
+
+    return value * unit_seconds[unit.lower()]
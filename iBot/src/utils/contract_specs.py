@@ -0,0 +1,31 @@
+"""
+Contract specs of the micro futures we trade (MicroFamily table in README.md)
+
+tick_value is the dollar value of one tick_size move for one contract.
+"""
+
+MICRO_FAMILY = {
+    "MES": {'name': "Micro E-mini S&P 500", 'exchange': "CME", 'tick_size': 0.25, 'tick_value': 1.25},
+    "MNQ": {'name': "Micro E-mini Nasdaq-100", 'exchange': "CME", 'tick_size': 0.25, 'tick_value': 0.50},
+    "MGC": {'name': "Micro Gold", 'exchange': "COMEX", 'tick_size': 0.10, 'tick_value': 1.00},
+    "MCL": {'name': "Micro Crude Oil", 'exchange': "NYMEX", 'tick_size': 0.01, 'tick_value': 1.00},
+    "MBT": {'name': "Micro Bitcoin", 'exchange': "CME", 'tick_size': 5.00, 'tick_value': 0.50},
+    "MYM": {'name': "Micro E-mini Dow", 'exchange': "CME", 'tick_size': 1.00, 'tick_value': 0.50},
+    "M2K": {'name': "Micro E-mini Russell 2000", 'exchange': "CME", 'tick_size': 0.10, 'tick_value': 0.50},
+}
+
+# IBKR fixed rate for micro futures, per contract per side, including exchange fees
+DEFAULT_COMMISSION_PER_CONTRACT = 0.62
+
+
+def get_contract_spec(symbol):
+    spec = MICRO_FAMILY.get(symbol)
+    if spec is None:
+        raise ValueError(f"No contract spec for symbol {symbol}")
+    return spec
+
+
+def point_value(symbol):
+    """Dollar value of a one point move for one contract"""
+    spec = get_contract_spec(symbol)
+    return spec['tick_value'] / spec['tick_size']
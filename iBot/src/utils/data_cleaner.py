@@ -22,4 +22,21 @@ def clean_data(data):
 
     # Print info about the cleaned dataset
     print(f"Dataset shape after cleaning: from {original_shape} to {data.shape}. Removed {removed_invalid_timestamp} invalid timestamps and {removed_duplicates} duplicates.")
-    print(f"Date range: from {data.index.min()} to {data.index.max()}")
\ No newline at end of file
+    print(f"Date range: from {data.index.min()} to {data.index.max()}")
+
+def to_epoch_seconds(timestamps):
+    """
+    Convert the TEXT timestamps we store ('20240924  06:30:00', '20231025',
+    '2024-10-22T18:22:00') to int64 epoch seconds. Naive values are taken
+    as-is, i.e. the wall clock time is stored as if it were UTC.
+    Unparseable values come back as -1.
+    """
+    values = pd.Series(timestamps)
+    if values.dtype == object:
+        values = values.astype(str).str.replace(r'\s+', ' ', regex=True)
+    parsed = pd.to_datetime(values, errors='coerce')
+    if parsed.dt.tz is not None:
+        parsed = parsed.dt.tz_convert('UTC').dt.tz_localize(None)
+    epoch = parsed.values.astype('datetime64[s]').astype('int64')
+    epoch[parsed.isna().values] = -1
+    return epoch
@@ -0,0 +1,153 @@
+"""
+Idempotency layer for webhook alerts. TradingView retries an alert when the
+response is slow or fails, and every retry used to become another order.
+
+An alert is identified by a hash of (ticker, action, reason, price, bar
+time). Alerts without a bar time ("time": "{{time}}" in the alert message)
+are never deduplicated, two genuine signals could not be told apart from a
+retry. The first request claims the key, the handler runs and its response
+is stored under the key. Retries within the TTL get the stored response
+back without reaching OrderManager. Keys live in a bounded in-memory LRU
+and, if a redis client is given, in Redis (SET NX EX) so several processes
+and restarts share them. While Redis fails, the in-memory LRU is used
+alone, so a Redis outage never blocks an order.
+
+Usage:
+    cache = IdempotencyCache(ttl=300, redis_client=redis.Redis())
+    key = alert_key(alert)
+    if key is None:
+        return handle(alert)                # no bar time, not deduplicated
+    cached = cache.claim(key)
+    if cached is not None:
+        return cached                       # duplicate
+    try:
+        response = handle(alert)
+    except Exception:
+        cache.release(key)                  # let the retry through
+        raise
+    cache.complete(key, response)
+"""
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+# Response of a duplicate that arrives while the first request is still being handled
+IN_PROGRESS = ("Duplicate alert, already being processed", 202)
+
+
+def alert_key(alert: dict):
+    """
+    Hash of (ticker, action, reason, price, bar time) of an alert from
+    utils.webhook_ingest.parse_alert, None if the alert has no bar time
+    """
+    raw = alert.get('raw', {})
+    bar_time = raw.get('time', raw.get('bar_time'))
+    if bar_time is None or bar_time == '':
+        return None
+    fields = (str(raw.get('ticker', alert.get('symbol'))), alert['action'], alert['reason'],
+              repr(float(alert['price'])), str(bar_time))
+    return hashlib.sha1("|".join(fields).encode()).hexdigest()
+
+
+class IdempotencyCache:
+    def __init__(self, ttl=300.0, max_size=10000, redis_client=None, prefix="alert:"):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.redis = redis_client
+        self.prefix = prefix
+        # key -> (expires_at, response), response is None while in progress
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.redis_errors = 0
+
+    def claim(self, key: str):
+        """None if the key is new (and now claimed), else the response to answer the duplicate with"""
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] > now:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[1] or IN_PROGRESS
+            if self.redis is None:
+                self._store(key, None, now)
+                self.misses += 1
+                return None
+
+        # Another process may have seen the alert, the key is claimed in Redis atomically
+        redis_key = self.prefix + key
+        try:
+            claimed = self.redis.set(redis_key, "", nx=True, ex=int(self.ttl))
+            stored = None if claimed else self.redis.get(redis_key)
+        except Exception as e:
+            self._redis_error("claim", e)
+            claimed = True  # claim it in memory only
+        if claimed:
+            with self.lock:
+                # A concurrent request may have claimed it in memory meanwhile
+                entry = self.entries.get(key)
+                if entry is not None and entry[0] > now:
+                    self.hits += 1
+                    return entry[1] or IN_PROGRESS
+                self._store(key, None, now)
+                self.misses += 1
+            return None
+        response = tuple(json.loads(stored)) if stored else None
+        with self.lock:
+            self._store(key, response, now)
+            self.hits += 1
+        return response or IN_PROGRESS
+
+    def complete(self, key: str, response):
+        """Remember the response of a handled alert, e.g. (body, status)"""
+        with self.lock:
+            self._store(key, tuple(response), time.monotonic())
+        if self.redis is not None:
+            try:
+                self.redis.set(self.prefix + key, json.dumps(list(response)), ex=int(self.ttl))
+            except Exception as e:
+                self._redis_error("complete", e)
+
+    def release(self, key: str):
+        """Forget a claimed key whose handling failed, so a retry is processed"""
+        with self.lock:
+            self.entries.pop(key, None)
+        if self.redis is not None:
+            try:
+                self.redis.delete(self.prefix + key)
+            except Exception as e:
+                self._redis_error("release", e)
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'redis_errors': self.redis_errors,
+                'size': len(self.entries),
+            }
+
+    def _redis_error(self, operation, error):
+        print(f"Redis error in idempotency {operation}, using the in-memory cache only: {error}")
+        with self.lock:
+            self.redis_errors += 1
+
+    def _store(self, key, response, now):
+        self.entries[key] = (now + self.ttl, response)
+        self.entries.move_to_end(key)
+        # Expired entries are at the front unless touched recently, the LRU bound covers the rest
+        while self.entries:
+            oldest_key, (expires_at, _) = next(iter(self.entries.items()))
+            if expires_at > now and len(self.entries) <= self.max_size:
+                break
+            del self.entries[oldest_key]
+            self.evictions += 1
@@ -0,0 +1,81 @@
+"""
+Order id allocator shared by every code path that places orders on one IB
+client connection.
+
+Ids come from a single itertools.count. next() on it is atomic under the
+GIL, so concurrent webhook threads get unique, increasing ids without
+taking a lock. Only resync() (on nextValidId, i.e. at connect and
+reconnect) serializes. A small gap is skipped on the same counter. A large
+jump swaps in a counter starting at the new id, far above anything a
+thread still holding the old counter can draw, so no id is handed out
+twice either way.
+
+Usage:
+    allocator = OrderIdAllocator()
+    allocator.resync(orderId)           # in nextValidId
+    order_id = allocator.next_id()
+    parent_id, tp_id, sl_id = allocator.reserve(3)
+"""
+
+import itertools
+import threading
+
+# Largest gap resync() burns on the shared counter, larger jumps get a new counter
+MAX_SKIP = 64
+
+
+class OrderIdAllocator:
+    def __init__(self):
+        self._counter = None
+        self._resync_lock = threading.Lock()
+        self._ready = threading.Event()
+        self.last_valid_id = None
+        self.resyncs = 0
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    def wait_ready(self, timeout=None) -> bool:
+        """Block until the first nextValidId was received, returns False on timeout"""
+        return self._ready.wait(timeout)
+
+    def next_id(self) -> int:
+        counter = self._counter
+        if counter is None:
+            raise RuntimeError("No valid order id yet, wait for nextValidId")
+        return next(counter)
+
+    def reserve(self, n: int) -> list:
+        """
+        Reserve n ids, e.g. for a bracket order. The ids are unique and increasing
+        but other threads may draw ids in between, so they are not always consecutive.
+        """
+        if n < 1:
+            raise ValueError("Must reserve at least one order id")
+        counter = self._counter
+        if counter is None:
+            raise RuntimeError("No valid order id yet, wait for nextValidId")
+        return [next(counter) for _ in range(n)]
+
+    def resync(self, next_valid_id: int):
+        """Make sure every id handed out from now on is at least next_valid_id"""
+        with self._resync_lock:
+            self.last_valid_id = next_valid_id
+            if self._counter is None:
+                self._counter = itertools.count(next_valid_id)
+                self._ready.set()
+                return
+
+            # TWS normally reports the id after the highest one it has seen, so the
+            # gap is small and burning it keeps every thread on the same counter
+            current = next(self._counter)
+            if next_valid_id - current > MAX_SKIP:
+                # E.g. TWS reset its ids or a resync from the journal, replace the counter
+                # instead of stepping it. Threads drawing from the old one in the meantime
+                # get ids just above current, well below the new start.
+                self._counter = itertools.count(max(current + 1, next_valid_id))
+            else:
+                while current < next_valid_id - 1:
+                    current = next(self._counter)
+            self.resyncs += 1
@@ -0,0 +1,74 @@
+"""
+Append-only journal of order state transitions, written through the batched
+SQLiteHelper writer thread so callbacks never wait on a commit. On startup
+the journal is replayed to rebuild the live orders (see utils.order_state).
+"""
+
+import os
+import sqlite3
+import time
+
+from .sqlite_helper import SQLiteHelper
+
+# src/data/OrderJournal.db, independent of the working directory
+DEFAULT_JOURNAL_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data",
+                                    "OrderJournal.db")
+JOURNAL_COLUMNS = ('timestamp', 'event', 'order_id', 'perm_id', 'client_id', 'symbol', 'action',
+                   'order_type', 'price', 'quantity', 'state', 'status', 'filled', 'avg_fill_price')
+
+
+class OrderJournal(SQLiteHelper):
+    TABLE = 'order_journal'
+
+    def __init__(self, db_name=DEFAULT_JOURNAL_PATH, batch_size=50, flush_interval=0.2):
+        directory = os.path.dirname(db_name)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        super().__init__(db_name, batch_size=batch_size, flush_interval=flush_interval, profile='journal')
+
+    def create_data_table(self, db, table_name=None):
+        db.execute(f'''
+        CREATE TABLE IF NOT EXISTS {self.TABLE} (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp REAL,
+            event TEXT,
+            order_id INTEGER,
+            perm_id INTEGER,
+            client_id INTEGER,
+            symbol TEXT,
+            action TEXT,
+            order_type TEXT,
+            price REAL,
+            quantity REAL,
+            state TEXT,
+            status TEXT,
+            filled REAL,
+            avg_fill_price REAL
+        )
+        ''')
+        db.commit()
+        self.created_tables.add(self.TABLE)
+
+    def insert_many_to_sqlite(self, db, args, table_name=None):
+        db.executemany(f'''
+        INSERT INTO {self.TABLE} ({", ".join(JOURNAL_COLUMNS)})
+        VALUES ({", ".join("?" * len(JOURNAL_COLUMNS))})
+        ''', args)
+
+    def append(self, event, order):
+        """Queue one transition of a LiveOrder"""
+        self.sqlite_queue.put(("INSERT", (self.TABLE, (
+            time.time(), event, order.order_id, order.perm_id, order.client_id, order.symbol, order.action,
+            order.order_type, order.price, order.quantity, order.state, order.status, order.filled,
+            order.avg_fill_price))))
+
+    def read(self) -> list:
+        """Every journaled transition as a dict, oldest first, raises if the writer is not running"""
+        self.wait_ready()
+        self.flush()
+        db = sqlite3.connect(self.db_name)
+        try:
+            rows = db.execute(f"SELECT {', '.join(JOURNAL_COLUMNS)} FROM {self.TABLE} ORDER BY seq").fetchall()
+        finally:
+            db.close()
+        return [dict(zip(JOURNAL_COLUMNS, row)) for row in rows]
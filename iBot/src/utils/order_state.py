@@ -0,0 +1,247 @@
+"""
+State machine of the orders placed through one client.
+
+    PendingSubmit -> Submitted -> PartiallyFilled -> Filled
+                  \\____________\\_________________\\-> Cancelled, Unknown
+
+IB statuses are mapped onto these states (PreSubmitted counts as Submitted,
+ApiCancelled / Inactive / Rejected as Cancelled). Transitions that would go
+backwards, e.g. a stale Submitted arriving after Filled, are ignored. Live
+orders are indexed by (clientId, orderId), since order ids are only unique
+per client and TWS hands each client ids above its last one, by permId and
+by (symbol, action, price). They are removed from
+every index once they reach a terminal state, so lookups and cancel-all
+never walk over finished orders.
+
+Every accepted transition is appended to an OrderJournal if one is given.
+replay() rebuilds the live orders from it on startup and reconcile() closes
+the ones TWS no longer reports as open as Unknown: they were filled or
+cancelled while we were away and the journal does not know which.
+"""
+
+import threading
+
+PENDING_SUBMIT = 'PendingSubmit'
+SUBMITTED = 'Submitted'
+PARTIALLY_FILLED = 'PartiallyFilled'
+FILLED = 'Filled'
+CANCELLED = 'Cancelled'
+# Closed by reconcile(), TWS no longer reports the order, its outcome is not known
+UNKNOWN = 'Unknown'
+
+TERMINAL_STATES = (FILLED, CANCELLED, UNKNOWN)
+# Allowed next states, staying in the same state is always allowed
+TRANSITIONS = {
+    PENDING_SUBMIT: {SUBMITTED, PARTIALLY_FILLED, FILLED, CANCELLED, UNKNOWN},
+    SUBMITTED: {PARTIALLY_FILLED, FILLED, CANCELLED, UNKNOWN},
+    PARTIALLY_FILLED: {FILLED, CANCELLED, UNKNOWN},
+    FILLED: set(),
+    CANCELLED: set(),
+    UNKNOWN: set(),
+}
+
+IB_STATUS_TO_STATE = {
+    'ApiPending': PENDING_SUBMIT,
+    'PendingSubmit': PENDING_SUBMIT,
+    'PreSubmitted': SUBMITTED,
+    'Submitted': SUBMITTED,
+    'PendingCancel': SUBMITTED,
+    'Filled': FILLED,
+    'Cancelled': CANCELLED,
+    'ApiCancelled': CANCELLED,
+    'Inactive': CANCELLED,
+    'Rejected': CANCELLED,
+    UNKNOWN: UNKNOWN,
+}
+
+
+def state_for_status(status: str, filled: float = 0) -> str:
+    state = IB_STATUS_TO_STATE.get(status, SUBMITTED)
+    if state == SUBMITTED and filled:
+        return PARTIALLY_FILLED
+    return state
+
+
+class LiveOrder:
+    def __init__(self, order_id, symbol, action, order_type, price, quantity, perm_id=0, client_id=None,
+                 contract=None, order=None):
+        self.order_id = order_id
+        self.perm_id = perm_id or 0
+        self.client_id = client_id
+        self.symbol = symbol
+        self.action = action
+        self.order_type = order_type
+        self.price = price
+        self.quantity = quantity
+        self.state = PENDING_SUBMIT
+        self.status = PENDING_SUBMIT  # last raw IB status
+        self.filled = 0.0
+        self.avg_fill_price = 0.0
+        # IB objects, only known for orders of this session or reported by TWS
+        self.contract = contract
+        self.order = order
+
+    @property
+    def key(self):
+        """Order ids are only unique per client"""
+        return (self.client_id, self.order_id)
+
+    @property
+    def details_key(self):
+        return (self.symbol, self.action, self.price)
+
+    @property
+    def is_live(self) -> bool:
+        return self.state not in TERMINAL_STATES
+
+    def __repr__(self):
+        return (f"LiveOrder({self.order_id}, {self.symbol} {self.action} {self.quantity} "
+                f"{self.order_type} @ {self.price}, {self.state})")
+
+
+class OrderStateMachine:
+    def __init__(self, journal=None, client_id=None):
+        self.journal = journal
+        self.client_id = client_id
+        self.lock = threading.Lock()
+        self.by_order_id = {}  # (clientId, orderId) -> LiveOrder
+        self.by_perm_id = {}
+        # (symbol, action, price) -> {(clientId, orderId): LiveOrder}, insertion ordered
+        self.by_details = {}
+        self.reported_open = set()
+
+    def on_submit(self, order_id, contract, order) -> LiveOrder:
+        """Record an order about to be sent"""
+        live = LiveOrder(order_id, contract.symbol, order.action, order.orderType, order.lmtPrice,
+                         order.totalQuantity, client_id=self.client_id, contract=contract, order=order)
+        with self.lock:
+            self._index(live)
+            self._journal('submit', live)
+        return live
+
+    def on_open_order(self, order_id, contract, order, status):
+        with self.lock:
+            live = self._find(order_id, order.permId, order.clientId)
+            if live is None:
+                # Opened by another session or client, e.g. reported by reqAllOpenOrders
+                live = LiveOrder(order_id, contract.symbol, order.action, order.orderType, order.lmtPrice,
+                                 order.totalQuantity, perm_id=order.permId, client_id=order.clientId)
+                self._index(live)
+            live.contract, live.order = contract, order
+            if order.permId and live.perm_id != order.permId:
+                live.perm_id = order.permId
+                self.by_perm_id[live.perm_id] = live
+            self.reported_open.add(id(live))
+            self._transition(live, 'open', status, live.filled, live.avg_fill_price)
+
+    def on_order_status(self, order_id, status, filled, avg_fill_price, perm_id=0, client_id=None):
+        """client_id of the order, this client's by default"""
+        with self.lock:
+            live = self._find(order_id, perm_id, self.client_id if client_id is None else client_id)
+            if live is None:
+                return
+            if perm_id and not live.perm_id:
+                live.perm_id = perm_id
+                self.by_perm_id[perm_id] = live
+            self._transition(live, 'status', status, float(filled), avg_fill_price)
+
+    def get(self, order_id, client_id=None):
+        """Live order with this id of client_id, this client's by default"""
+        with self.lock:
+            return self.by_order_id.get((self.client_id if client_id is None else client_id, order_id))
+
+    def get_by_perm_id(self, perm_id):
+        with self.lock:
+            return self.by_perm_id.get(perm_id)
+
+    def find_by_details(self, symbol, action, price, client_id=None):
+        """First live order with these details, of client_id if given, None if there is none"""
+        with self.lock:
+            for live in self.by_details.get((symbol, action, price), {}).values():
+                if client_id is None or live.client_id == client_id:
+                    return live
+            return None
+
+    def live_orders(self, client_id=None) -> list:
+        """Live orders, only those of client_id if given (ids of other clients cannot be cancelled)"""
+        with self.lock:
+            return [live for live in self.by_order_id.values() if client_id is None or live.client_id == client_id]
+
+    def replay(self, rows):
+        """Rebuild the live orders from journal rows, oldest first"""
+        with self.lock:
+            for row in rows:
+                live = self._find(row['order_id'], row['perm_id'], row['client_id'])
+                if live is None:
+                    if row['state'] in TERMINAL_STATES:
+                        continue
+                    live = LiveOrder(row['order_id'], row['symbol'], row['action'], row['order_type'],
+                                     row['price'], row['quantity'], row['perm_id'], row['client_id'])
+                    self._index(live)
+                elif row['perm_id'] and not live.perm_id:
+                    live.perm_id = row['perm_id']
+                    self.by_perm_id[live.perm_id] = live
+                live.state, live.status = row['state'], row['status']
+                live.filled, live.avg_fill_price = row['filled'], row['avg_fill_price']
+                if not live.is_live:
+                    self._unindex(live)
+            self.reported_open.clear()
+
+    def reconcile(self) -> list:
+        """
+        Call once TWS finished reporting the open orders (openOrderEnd). Live
+        orders it did not report were filled or cancelled while we were away,
+        they are closed as Unknown rather than guessing which. Returns them.
+        """
+        with self.lock:
+            stale = [live for live in self.by_order_id.values()
+                     if id(live) not in self.reported_open and live.order is None]
+            for live in stale:
+                self._transition(live, 'reconcile', UNKNOWN, live.filled, live.avg_fill_price)
+            self.reported_open.clear()
+            return stale
+
+    def _find(self, order_id, perm_id, client_id):
+        if perm_id:
+            live = self.by_perm_id.get(perm_id)
+            if live is not None:
+                return live
+        live = self.by_order_id.get((client_id, order_id))
+        # Same client and orderId but another order, e.g. a client id reused by a later session
+        if live is not None and perm_id and live.perm_id and live.perm_id != perm_id:
+            return None
+        return live
+
+    def _index(self, live):
+        self.by_order_id[live.key] = live
+        if live.perm_id:
+            self.by_perm_id[live.perm_id] = live
+        self.by_details.setdefault(live.details_key, {})[live.key] = live
+
+    def _unindex(self, live):
+        if self.by_order_id.get(live.key) is live:
+            del self.by_order_id[live.key]
+        if live.perm_id and self.by_perm_id.get(live.perm_id) is live:
+            del self.by_perm_id[live.perm_id]
+        orders = self.by_details.get(live.details_key)
+        if orders is not None and orders.get(live.key) is live:
+            del orders[live.key]
+            if not orders:
+                del self.by_details[live.details_key]
+
+    def _transition(self, live, event, status, filled, avg_fill_price):
+        state = state_for_status(status, filled)
+        if state != live.state and state not in TRANSITIONS[live.state]:
+            return
+        # TWS repeats statuses, only changes are journaled
+        if (state, status, filled) == (live.state, live.status, live.filled) and event != 'reconcile':
+            return
+        live.state, live.status = state, status
+        live.filled, live.avg_fill_price = filled, avg_fill_price
+        self._journal(event, live)
+        if not live.is_live:
+            self._unindex(live)
+
+    def _journal(self, event, live):
+        if self.journal is not None:
+            self.journal.append(event, live)
@@ -0,0 +1,194 @@
+"""
+Turns the openOrder / orderStatus / execDetails / error callbacks of an
+order into futures, so callers can wait for an acknowledgement or a fill
+instead of sleeping and polling.
+
+Each placed order gets an OrderTicket. Its futures resolve to the ticket:
+    acknowledged  TWS accepted the order (openOrder or a working status)
+    first_fill    first execution, partial or complete
+    filled_future nothing remaining
+    done          terminal: filled, cancelled or rejected
+An order that ends without reaching a stage still resolves that stage's
+future, so waiting never hangs on a rejected order. Check ticket.status
+or ticket.is_filled. Only a terminal status or a known rejection code
+ends an order, other errors (e.g. a rejected cancel) are kept in
+ticket.error while the order keeps working.
+
+Usage:
+    ticket = order_manager.place_order("MES1!", "FUT", "LMT", "BUY", 1, 5800)
+    ticket.wait_acknowledged(timeout=5)
+    print(ticket.ack_latency)
+    await ticket  # from asyncio code, waits for done
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import Future
+
+# orderStatus values after which nothing changes anymore
+TERMINAL_STATUSES = {'Filled', 'Cancelled', 'ApiCancelled', 'Inactive', 'Rejected'}
+# orderStatus values of an order TWS accepted
+WORKING_STATUSES = {'PreSubmitted', 'Submitted', 'PendingCancel', 'PendingSubmit'}
+# Order never reached TWS, reported by OrderManager.send_order
+SEND_FAILED = -1
+# Error codes after which the order is not working: 103 duplicate order id, 110 price
+# off the tick size, 200 no security definition, 201 order rejected, 203 security not
+# allowed, 321 invalid request, 382/383 size or value limits, 387/388 unsupported or
+# too small size, 392 contract expired, 434 order size 0
+REJECTION_CODES = {SEND_FAILED, 103, 110, 200, 201, 203, 321, 382, 383, 387, 388, 392, 434}
+# Confirmation of a cancel
+CANCELLED_CODE = 202
+
+
+def is_order_warning(error_code: int) -> bool:
+    """Informational messages TWS sends with an order id, e.g. 2109 outside RTH, 399 warnings"""
+    return error_code == 399 or 2100 <= error_code < 2200
+
+
+class OrderTicket:
+    def __init__(self, order_id: int, symbol: str = None, action: str = None, quantity: float = None):
+        self.order_id = order_id
+        self.symbol = symbol
+        self.action = action
+        self.quantity = quantity
+
+        self.status = 'PendingSubmit'
+        self.filled = 0.0
+        self.remaining = quantity
+        self.avg_fill_price = 0.0
+        self.fills = {}  # execId -> (shares, price)
+        self.error = None  # last (errorCode, errorString) reported for the order
+
+        self.submit_time = time.monotonic()
+        self.ack_time = None
+        self.first_fill_time = None
+        self.done_time = None
+
+        self.acknowledged = Future()
+        self.first_fill = Future()
+        self.filled_future = Future()
+        self.done = Future()
+
+    @property
+    def is_filled(self) -> bool:
+        return self.status == 'Filled'
+
+    @property
+    def ack_latency(self):
+        """Seconds from placement to acknowledgement, None until acknowledged"""
+        return None if self.ack_time is None else self.ack_time - self.submit_time
+
+    @property
+    def fill_latency(self):
+        return None if self.first_fill_time is None else self.first_fill_time - self.submit_time
+
+    def wait_acknowledged(self, timeout=None):
+        return self.acknowledged.result(timeout)
+
+    def wait_filled(self, timeout=None):
+        return self.filled_future.result(timeout)
+
+    def wait_done(self, timeout=None):
+        return self.done.result(timeout)
+
+    def __await__(self):
+        return asyncio.wrap_future(self.done).__await__()
+
+    def __repr__(self):
+        return (f"OrderTicket({self.order_id}, {self.symbol} {self.action} {self.quantity}, "
+                f"status={self.status}, filled={self.filled})")
+
+
+class OrderTracker:
+    """orderId -> OrderTicket index, fed from the EWrapper callbacks"""
+
+    def __init__(self):
+        self.tickets = {}
+        self.lock = threading.Lock()
+
+    def track(self, order_id: int, symbol: str = None, action: str = None, quantity: float = None) -> OrderTicket:
+        """Register an order before it is sent, so no callback can arrive first"""
+        ticket = OrderTicket(order_id, symbol, action, quantity)
+        with self.lock:
+            self.tickets[order_id] = ticket
+        return ticket
+
+    def get(self, order_id: int):
+        with self.lock:
+            return self.tickets.get(order_id)
+
+    def open_tickets(self) -> list:
+        with self.lock:
+            return [ticket for ticket in self.tickets.values() if not ticket.done.done()]
+
+    def on_open_order(self, order_id: int, status: str):
+        ticket = self.get(order_id)
+        if ticket is None:
+            return
+        with self.lock:
+            self._acknowledge(ticket)
+            if status in TERMINAL_STATUSES:
+                self._finish(ticket, status)
+
+    def on_order_status(self, order_id: int, status: str, filled: float, remaining: float, avg_fill_price: float):
+        ticket = self.get(order_id)
+        if ticket is None:
+            return
+        with self.lock:
+            ticket.status = status
+            ticket.filled = float(filled)
+            ticket.remaining = float(remaining)
+            ticket.avg_fill_price = avg_fill_price
+            if status in WORKING_STATUSES or status == 'Filled' or ticket.filled > 0:
+                self._acknowledge(ticket)
+            if ticket.filled > 0:
+                self._first_fill(ticket)
+            if status in TERMINAL_STATUSES:
+                self._finish(ticket, status)
+
+    def on_exec_details(self, order_id: int, exec_id: str, shares: float, price: float):
+        ticket = self.get(order_id)
+        if ticket is None:
+            return
+        with self.lock:
+            # Executions can be reported again, e.g. after reqExecutions
+            if exec_id in ticket.fills:
+                return
+            ticket.fills[exec_id] = (float(shares), price)
+            self._acknowledge(ticket)
+            self._first_fill(ticket)
+
+    def on_error(self, order_id: int, error_code: int, error_string: str):
+        ticket = self.get(order_id)
+        if ticket is None or is_order_warning(error_code):
+            return
+        with self.lock:
+            if ticket.done.done():
+                return
+            ticket.error = (error_code, error_string)
+            # Anything else, e.g. 161/10148 cancel rejected or 404 order held, leaves the
+            # order working, a terminal orderStatus ends it if it does end
+            if error_code == CANCELLED_CODE:
+                self._finish(ticket, 'Cancelled')
+            elif error_code in REJECTION_CODES:
+                self._finish(ticket, 'Rejected')
+
+    def _acknowledge(self, ticket):
+        if not ticket.acknowledged.done():
+            ticket.ack_time = time.monotonic()
+            ticket.acknowledged.set_result(ticket)
+
+    def _first_fill(self, ticket):
+        if not ticket.first_fill.done():
+            ticket.first_fill_time = time.monotonic()
+            ticket.first_fill.set_result(ticket)
+
+    def _finish(self, ticket, status):
+        if ticket.done.done():
+            return
+        ticket.status = status
+        ticket.done_time = time.monotonic()
+        for future in (ticket.acknowledged, ticket.first_fill, ticket.filled_future, ticket.done):
+            if not future.done():
+                future.set_result(ticket)
@@ -0,0 +1,197 @@
+"""
+In-process position cache, so the webhook reads positions without a
+network call and without waiting on the IB reader thread.
+
+Writers (position / execDetails / positionEnd callbacks) hold a lock, build
+a new symbol -> position mapping and publish it as an immutable, versioned
+PositionSnapshot. Readers only load the current snapshot reference, which
+is atomic, so reads take no lock and always see a consistent mapping.
+
+Sources:
+    apply_fill()    execDetails, applied right away, deduplicated by execId
+    on_position()   position updates of the reqPositions subscription, these
+                    are authoritative and overwrite the cached value
+    reconcile       begin_reconcile() + reqPositions ... end_reconcile() on
+                    positionEnd, drops positions TWS no longer reports, run
+                    periodically by start_periodic()
+
+Fills and position updates usually arrive on different connections
+(OrderManager and IBotView), so a position update can already include a
+fill whose execDetails arrives later. A position change no fill explained
+is remembered for `fill_grace` seconds and consumes matching fills instead
+of counting them twice. The first report of a key and the reports of the
+initial reconcile are a snapshot, not a change, and are never matched
+against fills.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from types import MappingProxyType
+
+FILL_SIDES = {'BOT': 1, 'BUY': 1, 'SLD': -1, 'SELL': -1}
+
+
+class PositionSnapshot:
+    __slots__ = ('version', 'positions', 'timestamp')
+
+    def __init__(self, version, positions, timestamp):
+        self.version = version
+        self.positions = positions  # read-only symbol -> position
+        self.timestamp = timestamp
+
+    def get(self, symbol, default=0):
+        return self.positions.get(symbol, default)
+
+
+class PositionCache:
+    def __init__(self, fill_grace=2.0, max_exec_ids=10000):
+        self.fill_grace = fill_grace
+        self.max_exec_ids = max_exec_ids
+        self._snapshot = PositionSnapshot(0, MappingProxyType({}), time.time())
+
+        # Writer state, only touched under lock
+        self.lock = threading.Lock()
+        self.accounts = {}  # (account, symbol) -> position
+        self.unexplained = {}  # (account, symbol) -> (monotonic time, change not explained by fills)
+        self.exec_ids = OrderedDict()
+        self.reconciling = False
+        self.reconciled = False  # the first positionEnd was received
+        self.reported = set()
+
+        self.stats = {'fills': 0, 'duplicate_fills': 0, 'fills_already_reported': 0,
+                      'position_updates': 0, 'corrections': 0, 'reconciles': 0}
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    @property
+    def version(self) -> int:
+        return self._snapshot.version
+
+    def snapshot(self) -> PositionSnapshot:
+        """Current snapshot, lock-free, never changes after it was published"""
+        return self._snapshot
+
+    def get(self, symbol, default=0):
+        """Position of symbol summed over accounts, lock-free"""
+        return self._snapshot.positions.get(symbol, default)
+
+    def apply_fill(self, exec_id, account, symbol, side, shares):
+        """Apply one execution, e.g. from execDetails, returns False if it was ignored"""
+        delta = FILL_SIDES.get(side, 0) * float(shares)
+        with self.lock:
+            if exec_id in self.exec_ids:
+                self.stats['duplicate_fills'] += 1
+                return False
+            self.exec_ids[exec_id] = None
+            while len(self.exec_ids) > self.max_exec_ids:
+                self.exec_ids.popitem(last=False)
+            if not delta:
+                return False
+
+            key = (account, symbol)
+            if self.reconciling:
+                self.reported.add(key)
+            self.stats['fills'] += 1
+            if self._already_reported(key, delta):
+                self.stats['fills_already_reported'] += 1
+                return False
+            self.accounts[key] = self.accounts.get(key, 0.0) + delta
+            self._publish(symbol)
+            return True
+
+    def on_position(self, account, symbol, position):
+        """Authoritative position from the position callback"""
+        key = (account, symbol)
+        position = float(position)
+        with self.lock:
+            self.stats['position_updates'] += 1
+            if self.reconciling:
+                self.reported.add(key)
+            previous = self.accounts.get(key)
+            change = position - (previous or 0.0)
+            if not change:
+                return
+            self.stats['corrections'] += 1
+            if previous is not None and (self.reconciled or not self.reconciling):
+                self.unexplained[key] = (time.monotonic(), change)
+            self.accounts[key] = position
+            self._publish(symbol)
+
+    def begin_reconcile(self):
+        """Call right before reqPositions"""
+        with self.lock:
+            self.reconciling = True
+            self.reported = set()
+
+    def end_reconcile(self):
+        """Call on positionEnd, positions that were not reported are closed"""
+        with self.lock:
+            if not self.reconciling:
+                return
+            self.reconciling = False
+            self.reconciled = True
+            self.stats['reconciles'] += 1
+            stale = [key for key, position in self.accounts.items() if key not in self.reported and position]
+            for key in stale:
+                self.accounts[key] = 0.0
+                self.stats['corrections'] += 1
+            if stale:
+                self._publish(*{symbol for _, symbol in stale})
+
+    def start_periodic(self, request_positions, interval=60.0):
+        """Call request_positions() now and every interval seconds, it must end in end_reconcile()"""
+        if self.thread is not None and self.thread.is_alive():
+            return
+        self.stop_event.clear()
+
+        def run():
+            while not self.stop_event.is_set():
+                self.begin_reconcile()
+                try:
+                    request_positions()
+                except Exception as e:
+                    print(f"Error requesting positions: {e}")
+                self.stop_event.wait(interval)
+
+        self.thread = threading.Thread(target=run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join()
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            stats = dict(self.stats)
+        stats['version'] = self._snapshot.version
+        return stats
+
+    def _already_reported(self, key, delta) -> bool:
+        """Whether a recent position update already included this fill, consumes it if so"""
+        entry = self.unexplained.get(key)
+        if entry is None:
+            return False
+        received, change = entry
+        if time.monotonic() - received > self.fill_grace:
+            del self.unexplained[key]
+            return False
+        if change * delta <= 0 or abs(delta) > abs(change):
+            return False
+        remaining = change - delta
+        if remaining:
+            self.unexplained[key] = (received, remaining)
+        else:
+            del self.unexplained[key]
+        return True
+
+    def _publish(self, *symbols):
+        positions = dict(self._snapshot.positions)
+        for symbol in symbols:
+            total = sum(position for (_, s), position in self.accounts.items() if s == symbol)
+            if total:
+                positions[symbol] = total
+            else:
+                positions.pop(symbol, None)
+        self._snapshot = PositionSnapshot(self._snapshot.version + 1, MappingProxyType(positions), time.time())
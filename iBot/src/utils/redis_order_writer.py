@@ -0,0 +1,182 @@
+"""
+Background writer for the order hashes IBotView keeps in Redis.
+
+IB callbacks only merge their fields into a pending dict keyed by orderId
+and return, they never wait on the network. Several status callbacks of an
+order arriving within one flush window collapse into a single write. A
+writer thread flushes every `flush_interval` seconds: new order hashes
+first, then one conditional update per order, all in one pipeline, so a
+batch costs a single round trip.
+
+Status updates only touch orders that were recorded (exists-then-hset). A
+Lua script does that atomically on the server. Where scripting is not
+available, e.g. fakeredis without lupa, the writer falls back to two
+pipelined round trips: EXISTS for the batch, then HSET for the keys found.
+
+A batch that fails, e.g. while Redis is down, is merged back into the
+pending dicts under any fields queued since, and retried with an
+exponential backoff up to `max_backoff` seconds.
+"""
+
+import threading
+import time
+
+# KEYS[1] order hash, ARGV field/value pairs, only updates an existing hash
+UPDATE_IF_EXISTS = """
+if redis.call('exists', KEYS[1]) == 1 then
+    redis.call('hset', KEYS[1], unpack(ARGV))
+    return 1
+end
+return 0
+"""
+
+
+def order_key(order_id) -> str:
+    return f"order:{order_id}"
+
+
+class OrderStatusWriter:
+    def __init__(self, redis_client, flush_interval=0.05, use_script=True, max_backoff=5.0):
+        self.redis = redis_client
+        self.flush_interval = flush_interval
+        self.max_backoff = max_backoff
+        self.backoff = 0.0  # wait before retrying a failed batch, 0 while writes succeed
+
+        self.script_sha = None
+        if use_script:
+            try:
+                self.script_sha = self.redis.script_load(UPDATE_IF_EXISTS)
+            except Exception as e:
+                print(f"Redis scripting unavailable, using pipelined EXISTS + HSET: {e}")
+
+        self.lock = threading.Lock()
+        self.creates = {}  # orderId -> full mapping, written unconditionally
+        self.updates = {}  # orderId -> fields, written only if the hash exists
+        self.wakeup = threading.Event()
+        self.stopping = False
+
+        self.stats = {'updates': 0, 'coalesced': 0, 'creates': 0, 'batches': 0, 'written': 0,
+                      'missing': 0, 'errors': 0, 'requeued': 0, 'last_flush_ms': 0.0, 'max_flush_ms': 0.0}
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def create(self, order_id, mapping: dict):
+        """Queue a new order hash"""
+        with self.lock:
+            fields = self.creates.setdefault(order_id, {})
+            fields.update(mapping)
+            # A status that arrived first is newer than the initial fields
+            fields.update(self.updates.pop(order_id, {}))
+            self.stats['creates'] += 1
+
+    def update(self, order_id, mapping: dict):
+        """Queue fields for an existing order hash, merged with pending fields of the same order"""
+        with self.lock:
+            self.stats['updates'] += 1
+            pending = self.creates.get(order_id)
+            if pending is None:
+                pending = self.updates.get(order_id)
+                if pending is None:
+                    self.updates[order_id] = dict(mapping)
+                    return
+            pending.update(mapping)
+            self.stats['coalesced'] += 1
+
+    def run(self):
+        while True:
+            self.wakeup.wait(self.backoff or self.flush_interval)
+            self.wakeup.clear()
+            self.flush()
+            if self.stopping:
+                self.flush()
+                return
+
+    def flush(self):
+        with self.lock:
+            creates, self.creates = self.creates, {}
+            updates, self.updates = self.updates, {}
+        if not creates and not updates:
+            return
+
+        start = time.perf_counter()
+        try:
+            try:
+                written, missing = self.write(creates, updates)
+            except Exception as e:
+                # The script cache is empty after a Redis restart, load it again and retry once
+                if self.script_sha is None or 'NOSCRIPT' not in str(e):
+                    raise
+                self.script_sha = self.redis.script_load(UPDATE_IF_EXISTS)
+                written, missing = self.write(creates, updates)
+        except Exception as e:
+            with self.lock:
+                self.requeue(creates, updates)
+                self.stats['errors'] += 1
+                self.stats['requeued'] += len(creates) + len(updates)
+                self.backoff = min(max(self.backoff * 2, self.flush_interval), self.max_backoff)
+            print(f"Error writing order status to Redis, retrying in {self.backoff:.2f}s: {e}")
+            return
+        elapsed = (time.perf_counter() - start) * 1000
+        with self.lock:
+            self.backoff = 0.0
+            self.stats['batches'] += 1
+            self.stats['written'] += written
+            self.stats['missing'] += missing
+            self.stats['last_flush_ms'] = elapsed
+            self.stats['max_flush_ms'] = max(self.stats['max_flush_ms'], elapsed)
+
+    def requeue(self, creates, updates):
+        """Put a failed batch back, called under lock. Fields queued since are newer and win."""
+        for order_id, mapping in creates.items():
+            fields = dict(mapping)
+            fields.update(self.creates.get(order_id, {}))
+            fields.update(self.updates.pop(order_id, {}))
+            self.creates[order_id] = fields
+        for order_id, mapping in updates.items():
+            pending = self.creates if order_id in self.creates else self.updates
+            fields = dict(mapping)
+            fields.update(pending.get(order_id, {}))
+            pending[order_id] = fields
+
+    def write(self, creates, updates):
+        """Write one batch, returns (hashes written, updates skipped because the order is unknown)"""
+        keys = [order_key(order_id) for order_id in updates]
+        pipe = self.redis.pipeline(transaction=False)
+        for order_id, mapping in creates.items():
+            pipe.hset(order_key(order_id), mapping=mapping)
+
+        if self.script_sha is not None:
+            for key, mapping in zip(keys, updates.values()):
+                args = [item for pair in mapping.items() for item in pair]
+                pipe.evalsha(self.script_sha, 1, key, *args)
+            results = pipe.execute()[len(creates):]
+            found = sum(1 for result in results if result)
+            return len(creates) + found, len(updates) - found
+
+        for key in keys:
+            pipe.exists(key)
+        exists = pipe.execute()[len(creates):]
+        pipe = self.redis.pipeline(transaction=False)
+        found = 0
+        for key, mapping, present in zip(keys, updates.values(), exists):
+            if present:
+                pipe.hset(key, mapping=mapping)
+                found += 1
+        if found:
+            pipe.execute()
+        return len(creates) + found, len(updates) - found
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            stats = dict(self.stats)
+            stats['pending'] = len(self.creates) + len(self.updates)
+        return stats
+
+    def close(self):
+        """Write everything pending, then stop the writer thread"""
+        self.stopping = True
+        self.wakeup.set()
+        self.thread.join()
+        pending = self.get_stats()['pending']
+        if pending:
+            print(f"Redis unavailable, {pending} order hashes were not written")
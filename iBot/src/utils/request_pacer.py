@@ -0,0 +1,183 @@
+"""
+Paces outbound requests of one EClient connection.
+
+TWS disconnects a client that sends more than about 50 messages per second
+(error 100) and rejects historical data requests beyond its pacing limits
+(error 162, at most 60 requests per 10 minutes). Requests are submitted to
+the pacer instead of being sent directly, a dispatcher thread sends them
+through a token bucket, highest priority class first and FIFO within a
+class. Bursts wait in the queue instead of being sent at once.
+
+Usage:
+    pacer = RequestPacer()
+    pacer.submit(RequestPacer.ORDER, self.placeOrder, order_id, contract, order)
+    pacer.submit(RequestPacer.CANCEL, self.cancelOrder, order_id)
+    ...
+    pacer.close()  # sends what is queued except historical requests, then stops the dispatcher
+    pacer.open()   # accepts requests again, e.g. on reconnect
+"""
+
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+
+class RequestPacer:
+    # Priority classes, lower is sent first
+    CANCEL = 0
+    ORDER = 1
+    MARKET_DATA = 2
+    HISTORICAL = 3
+    PRIORITY_NAMES = {CANCEL: 'cancel', ORDER: 'order', MARKET_DATA: 'market_data', HISTORICAL: 'historical'}
+
+    def __init__(self, rate=45.0, burst=5, historical_limit=60, historical_window=600.0):
+        """
+        rate: messages per second, burst: messages that may go out back to back.
+            Any one second window sees at most rate + burst messages, keep it under 50.
+        historical_limit / historical_window: at most that many historical
+            requests per sliding window of seconds.
+        """
+        if rate <= 0 or burst < 1:
+            raise ValueError("rate must be positive and burst at least 1")
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.tokens = self.burst
+        self.last_refill = time.monotonic()
+        self.historical_limit = historical_limit
+        self.historical_window = historical_window
+        self.historical_sent = deque()
+
+        self.queue = []
+        self.seq = itertools.count()
+        self.condition = threading.Condition()
+        self.closing = False
+        self.thread = None
+
+        # Queue wait per priority class, seconds from submit() to send
+        self.stats = {name: {'sent': 0, 'errors': 0, 'dropped': 0, 'total_wait': 0.0, 'max_wait': 0.0}
+                      for name in self.PRIORITY_NAMES.values()}
+
+    def submit(self, priority, fn, *args, **kwargs) -> Future:
+        """Queue fn(*args, **kwargs), the returned future resolves once it was sent"""
+        if priority not in self.PRIORITY_NAMES:
+            raise ValueError(f"Unknown priority {priority}")
+        future = Future()
+        with self.condition:
+            if self.closing:
+                raise RuntimeError("RequestPacer is closed")
+            heapq.heappush(self.queue, (priority, next(self.seq), time.monotonic(), fn, args, kwargs, future))
+            self.condition.notify()
+        self.start()
+        return future
+
+    def start(self):
+        if self.thread is not None and self.thread.is_alive():
+            return
+        with self.condition:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.run, daemon=True)
+                self.thread.start()
+
+    def open(self):
+        """Accept requests again after close(), call it when the connection is (re)established"""
+        with self.condition:
+            self.closing = False
+        self.start()
+
+    def close(self, timeout=None):
+        """
+        Send everything still queued, then stop the dispatcher, open() undoes it.
+        Queued historical requests are cancelled instead, they can wait minutes for
+        the pacing window and would hold up a disconnect.
+        """
+        with self.condition:
+            self.closing = True
+            dropped = [entry for entry in self.queue if entry[0] == self.HISTORICAL]
+            if dropped:
+                self.queue = [entry for entry in self.queue if entry[0] != self.HISTORICAL]
+                heapq.heapify(self.queue)
+                self.stats[self.PRIORITY_NAMES[self.HISTORICAL]]['dropped'] += len(dropped)
+            self.condition.notify()
+        for entry in dropped:
+            entry[-1].cancel()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join(timeout)
+
+    def queue_depth(self) -> dict:
+        with self.condition:
+            depth = {name: 0 for name in self.PRIORITY_NAMES.values()}
+            for entry in self.queue:
+                depth[self.PRIORITY_NAMES[entry[0]]] += 1
+            return depth
+
+    def get_stats(self) -> dict:
+        with self.condition:
+            stats = {name: dict(values) for name, values in self.stats.items()}
+        for name, values in stats.items():
+            values['avg_wait'] = values['total_wait'] / values['sent'] if values['sent'] else 0.0
+        for name, depth in self.queue_depth().items():
+            stats[name]['queued'] = depth
+        return stats
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.last_refill) * self.rate)
+        self.last_refill = now
+
+    def _delay(self, priority, now) -> float:
+        """Seconds until a request of this priority may be sent, 0 if now"""
+        delay = 0.0
+        if self.tokens < 1:
+            delay = (1 - self.tokens) / self.rate
+        if priority == self.HISTORICAL:
+            while self.historical_sent and now - self.historical_sent[0] >= self.historical_window:
+                self.historical_sent.popleft()
+            if len(self.historical_sent) >= self.historical_limit:
+                delay = max(delay, self.historical_sent[0] + self.historical_window - now)
+        return delay
+
+    def _next_request(self):
+        """Wait until the head of the queue may be sent and pop it, None once closed and empty"""
+        with self.condition:
+            while True:
+                if not self.queue:
+                    if self.closing:
+                        return None
+                    self.condition.wait()
+                    continue
+
+                now = time.monotonic()
+                self._refill(now)
+                priority = self.queue[0][0]
+                delay = self._delay(priority, now)
+                if delay > 0:
+                    # A higher priority request submitted meanwhile is re-evaluated right away
+                    self.condition.wait(delay)
+                    continue
+
+                self.tokens -= 1
+                if priority == self.HISTORICAL:
+                    self.historical_sent.append(now)
+                entry = heapq.heappop(self.queue)
+                stats = self.stats[self.PRIORITY_NAMES[priority]]
+                wait = now - entry[2]
+                stats['sent'] += 1
+                stats['total_wait'] += wait
+                stats['max_wait'] = max(stats['max_wait'], wait)
+                return entry
+
+    def run(self):
+        while True:
+            entry = self._next_request()
+            if entry is None:
+                return
+            priority, _, _, fn, args, kwargs, future = entry
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except Exception as e:
+                with self.condition:
+                    self.stats[self.PRIORITY_NAMES[priority]]['errors'] += 1
+                print(f"Error sending {self.PRIORITY_NAMES[priority]} request: {e}")
+                future.set_exception(e)
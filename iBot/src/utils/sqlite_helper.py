@@ -1,14 +1,105 @@
 import sqlite3
 import threading
 import queue
+import time
+from contextlib import contextmanager
 import pandas as pd
 
+# PRAGMA settings applied to every connection opened with a given profile.
+# 'market_data' puts the file in WAL mode so readers never block the single
+# writer thread (and vice versa); journal_mode is persisted in the file.
+STORAGE_PROFILES = {
+    'default': {},
+    'market_data': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'mmap_size': 256 * 1024 * 1024,
+        'cache_size': -64 * 1024,  # negative value is in KiB, i.e. 64 MiB
+        'temp_store': 'MEMORY',
+        'busy_timeout': 5000,
+    },
+    # Small append-only logs, e.g. the order journal
+    'journal': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 5000,
+    },
+}
+
+# Settings that can only be changed by a connection allowed to write
+WRITER_ONLY_PRAGMAS = ('journal_mode', 'synchronous')
+
+
+def apply_pragmas(db, profile='default', read_only=False):
+    """Apply the PRAGMA settings of a storage profile to a connection"""
+    if profile not in STORAGE_PROFILES:
+        raise ValueError(f"Unknown storage profile: {profile}. Expected one of {list(STORAGE_PROFILES.keys())}.")
+
+    for pragma, value in STORAGE_PROFILES[profile].items():
+        if read_only and pragma in WRITER_ONLY_PRAGMAS:
+            continue
+        db.execute(f"PRAGMA {pragma}={value}")
+
+    if read_only:
+        db.execute("PRAGMA query_only=ON")
+
+
+class SQLiteReaderPool:
+    """
+    Pool of read-only connections for notebooks and strategies reading a
+    store that is being written by a SQLiteHelper at the same time.
+    """
+
+    def __init__(self, db_name, size=4, profile='market_data'):
+        self.db_name = db_name
+        self.profile = profile
+        self.pool = queue.Queue(maxsize=size)
+        self.connections = []
+        for _ in range(size):
+            db = sqlite3.connect(f"file:{db_name}?mode=ro", uri=True, check_same_thread=False)
+            apply_pragmas(db, profile, read_only=True)
+            self.connections.append(db)
+            self.pool.put(db)
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """Borrow a connection, waits if all of them are in use"""
+        db = self.pool.get(timeout=timeout)
+        try:
+            yield db
+        finally:
+            self.pool.put(db)
+
+    def execute(self, query, params=()):
+        with self.connection() as db:
+            return db.execute(query, params).fetchall()
+
+    def read_sql(self, query, params=None):
+        with self.connection() as db:
+            return pd.read_sql_query(query, db, params=params)
+
+    def close(self):
+        for db in self.connections:
+            db.close()
+        self.connections = []
+
+
 class SQLiteHelper:
-    def __init__(self, db_name):
+    def __init__(self, db_name, batch_size=1, flush_interval=0.5, profile='default'):
+        """
+        batch_size: rows committed per transaction. 1 keeps the commit-per-row
+            behaviour, anything larger switches the worker to group commit.
+        flush_interval: max seconds a row may wait in a partial batch before
+            the batch is committed anyway.
+        profile: key of STORAGE_PROFILES applied to the writer connection.
+        """
+        if profile not in STORAGE_PROFILES:
+            raise ValueError(f"Unknown storage profile: {profile}. Expected one of {list(STORAGE_PROFILES.keys())}.")
+
         self.db_name = db_name
-        self.sqlite_queue = queue.Queue()
-        self.sqlite_thread = threading.Thread(target=self.sqlite_worker, daemon=True)
-        self.sqlite_thread.start()
+        self.batch_size = max(int(batch_size), 1)
+        self.flush_interval = flush_interval
+        self.profile = profile
 
         if 'market' in self.db_name.lower():
             self.table_name = 'market_data'
@@ -17,25 +108,86 @@ class SQLiteHelper:
         else:
             self.table_name = 'data'
 
+        # Writer metrics, see get_stats()
+        self.stats_lock = threading.Lock()
+        self.rows_committed = 0
+        self.batches_committed = 0
+        self.total_commit_time = 0.0
+        self.last_commit_time = 0.0
+        self.max_commit_time = 0.0
+
+        self.created_tables = set()
+        # Set once the writer opened the database, or failed to (see error)
+        self.ready = threading.Event()
+        self.error = None
+        self.sqlite_queue = queue.Queue()
+        self.sqlite_thread = threading.Thread(target=self.sqlite_worker, daemon=True)
+        self.sqlite_thread.start()
+
     def sqlite_worker(self):
-        with sqlite3.connect(self.db_name) as db:
+        db = None
+        try:
+            db = sqlite3.connect(self.db_name)
+            apply_pragmas(db, self.profile)
             self.create_data_table(db)
-            
+        except Exception as e:
+            # E.g. the directory of db_name does not exist, wait_ready() raises it
+            self.error = e
+            print(f"Error opening {self.db_name}: {e}")
+            if db is not None:
+                db.close()
+            return
+        finally:
+            self.ready.set()
+
+        try:
+            # Pending rows per table, committed together in one transaction
+            pending = {}
+            pending_rows = 0
+            deadline = None
             while True:
-                operation, args = self.sqlite_queue.get()
-                
-                if operation == "INSERT":
-                    self.insert_data_to_sqlite(db, args)
-                elif operation == "INSERT_MANY":
-                    self.insert_many_to_sqlite(db, args)
+                timeout = max(deadline - time.monotonic(), 0) if pending_rows else None
+                try:
+                    operation, args = self.sqlite_queue.get(timeout=timeout)
+                except queue.Empty:
+                    # Time window elapsed before the batch filled up
+                    self.commit_batch(db, pending)
+                    pending, pending_rows = {}, 0
+                    continue
+
+                if operation in ("INSERT", "INSERT_MANY"):
+                    table_name, rows = args
+                    if operation == "INSERT":
+                        rows = [rows]
+                    if not pending_rows:
+                        deadline = time.monotonic() + self.flush_interval
+                    pending.setdefault(table_name, []).extend(rows)
+                    pending_rows += len(rows)
+                elif operation == "FLUSH":
+                    self.commit_batch(db, pending)
+                    pending, pending_rows = {}, 0
+                    args.set()
                 elif operation == "CLOSE":
+                    self.commit_batch(db, pending)
+                    self.sqlite_queue.task_done()
                     break
-                
+
+                # batch_size 1 commits every queued operation right away
+                if pending_rows >= self.batch_size:
+                    self.commit_batch(db, pending)
+                    pending, pending_rows = {}, 0
+
                 self.sqlite_queue.task_done()
+        except Exception as e:
+            self.error = e
+            raise
+        finally:
+            db.close()
 
-    def create_data_table(self, db):
+    def create_data_table(self, db, table_name=None):
+        table_name = table_name or self.table_name
         db.execute(f'''
-        CREATE TABLE IF NOT EXISTS {self.table_name} (
+        CREATE TABLE IF NOT EXISTS {table_name} (
             timestamp TEXT,
             symbol TEXT,
             open REAL,
@@ -47,32 +199,95 @@ class SQLiteHelper:
         )
         ''')
         db.commit()
+        self.created_tables.add(table_name)
 
-    def insert_data_to_sqlite(self, db, args):
-        db.execute(f'''
-        INSERT OR REPLACE INTO {self.table_name} 
-        (timestamp, symbol, open, high, low, close, volume)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', args)
-        db.commit()
-
-    def insert_many_to_sqlite(self, db, args):
+    def insert_many_to_sqlite(self, db, args, table_name=None):
+        table_name = table_name or self.table_name
+        if table_name not in self.created_tables:
+            self.create_data_table(db, table_name)
         db.executemany(f'''
-        INSERT OR REPLACE INTO {self.table_name} 
+        INSERT OR REPLACE INTO {table_name}
         (timestamp, symbol, open, high, low, close, volume)
         VALUES (?, ?, ?, ?, ?, ?, ?)
         ''', args)
+
+    def commit_batch(self, db, pending):
+        """Write all pending rows, for every table, in a single transaction"""
+        if not pending:
+            return
+        start = time.perf_counter()
+        for table_name, rows in pending.items():
+            self.insert_many_to_sqlite(db, rows, table_name)
         db.commit()
+        self.record_commit(sum(len(rows) for rows in pending.values()), time.perf_counter() - start)
+
+    def record_commit(self, row_count, elapsed):
+        with self.stats_lock:
+            self.rows_committed += row_count
+            self.batches_committed += 1
+            self.total_commit_time += elapsed
+            self.last_commit_time = elapsed
+            self.max_commit_time = max(self.max_commit_time, elapsed)
 
-    def queue_insert(self, data):
+    def get_stats(self):
+        """Queue depth and commit latency (ms) of the writer thread"""
+        with self.stats_lock:
+            batches = self.batches_committed
+            return {
+                'queue_depth': self.sqlite_queue.qsize(),
+                'rows_committed': self.rows_committed,
+                'batches_committed': batches,
+                'avg_batch_rows': self.rows_committed / batches if batches else 0.0,
+                'last_commit_ms': self.last_commit_time * 1000,
+                'avg_commit_ms': self.total_commit_time / batches * 1000 if batches else 0.0,
+                'max_commit_ms': self.max_commit_time * 1000,
+            }
+
+    def queue_insert(self, data, table_name=None):
+        """Queue a row or a DataFrame, into table_name (created on first use) or the default table"""
+        table_name = table_name or self.table_name
         if isinstance(data, (list, tuple)) and len(data) == 7:
-            self.sqlite_queue.put(("INSERT", data))
+            self.sqlite_queue.put(("INSERT", (table_name, data)))
         elif isinstance(data, pd.DataFrame):
             records = data.to_records(index=False)
-            self.sqlite_queue.put(("INSERT_MANY", list(records)))
+            self.sqlite_queue.put(("INSERT_MANY", (table_name, list(records))))
         else:
             raise ValueError("Invalid data format for insertion")
 
+    def wait_ready(self, timeout=None):
+        """Block until the writer opened the database, raises if it could not or has stopped"""
+        if not self.ready.wait(timeout):
+            return False
+        self.check_writer()
+        return True
+
+    def check_writer(self):
+        if self.error is not None:
+            raise RuntimeError(f"SQLite writer for {self.db_name} failed: {self.error}") from self.error
+        if not self.sqlite_thread.is_alive():
+            raise RuntimeError(f"SQLite writer for {self.db_name} is not running")
+
+    def reader_pool(self, size=4):
+        """Read-only connections that run concurrently with this writer"""
+        # The file and table must exist before a read-only connection can open it
+        self.wait_ready()
+        return SQLiteReaderPool(self.db_name, size=size, profile=self.profile)
+
+    def flush(self, timeout=None):
+        """Block until every row queued so far is committed to disk, raises if the writer is not running"""
+        self.check_writer()
+        done = threading.Event()
+        self.sqlite_queue.put(("FLUSH", done))
+        deadline = None if timeout is None else time.monotonic() + timeout
+        # Poll, so a writer that dies meanwhile raises instead of blocking forever
+        while not done.wait(0.1):
+            self.check_writer()
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+        return True
+
     def close(self):
-        self.sqlite_queue.put(("CLOSE", None))
-        self.sqlite_thread.join()
+        """Commit any pending batch and stop the writer thread"""
+        if self.sqlite_thread.is_alive():
+            self.sqlite_queue.put(("CLOSE", None))
+            self.sqlite_thread.join()
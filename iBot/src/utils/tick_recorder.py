@@ -0,0 +1,223 @@
+"""
+Raw tick capture into fixed-width binary logs
+
+One file per day, ticks_YYYYMMDD.bin, made of a 64 byte header followed by
+28 byte records (monotonic ns, symbol id, tick type, price, size). The header
+stores a wall clock / monotonic clock anchor pair so readers can turn the
+monotonic timestamps back into epoch time. Symbol ids are listed in a
+ticks_YYYYMMDD.symbols.json file next to the log. A recorder reopening the
+day's log with other symbols appends them to that list, so ids already in
+the log keep their symbol.
+"""
+
+import json
+import os
+import struct
+import threading
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+MAGIC = b"IBTICKS1"
+VERSION = 1
+HEADER_FORMAT = "<8sIIqq"  # magic, version, record size, wall anchor ns, monotonic anchor ns
+HEADER_SIZE = 64
+RECORD_FORMAT = "<qHHdd"   # monotonic ns, symbol id, tick type, price, size
+RECORD_SIZE = struct.calcsize(RECORD_FORMAT)
+
+TICK_DTYPE = np.dtype([
+    ('ts_ns', '<i8'),
+    ('symbol_id', '<u2'),
+    ('tick_type', '<u2'),
+    ('price', '<f8'),
+    ('size', '<f8'),
+])
+assert TICK_DTYPE.itemsize == RECORD_SIZE
+
+# IB tick types used to rebuild bars
+TICK_LAST = 4
+TICK_LAST_SIZE = 5
+
+
+class TickRecorder:
+    def __init__(self, directory, symbols, buffer_records=4096, fsync_interval=1.0):
+        """
+        symbols: list of symbols, record() takes the position of a symbol in it.
+        buffer_records: records kept in memory before they are written to the file.
+        fsync_interval: seconds between fsync calls of the background thread.
+        """
+        self.directory = directory
+        self.symbols = list(symbols)
+        self.fsync_interval = fsync_interval
+        os.makedirs(directory, exist_ok=True)
+
+        self.lock = threading.Lock()
+        self.buffer = bytearray(RECORD_SIZE * buffer_records)
+        self.buffer_offset = 0
+        self.records_written = 0
+        self.file = None
+        self.path = None
+        self.rotate_at_ns = 0
+        self.open_log()
+
+        self.stop_event = threading.Event()
+        self.fsync_thread = threading.Thread(target=self.fsync_worker, daemon=True)
+        self.fsync_thread.start()
+
+    def open_log(self):
+        """Open (or append to) today's log and schedule the next rotation at midnight"""
+        now = datetime.now()
+        self.path = os.path.join(self.directory, f"ticks_{now.strftime('%Y%m%d')}.bin")
+        wall_ns, mono_ns = time.time_ns(), time.monotonic_ns()
+
+        reopened = os.path.exists(self.path) and os.path.getsize(self.path) >= HEADER_SIZE
+        if reopened:
+            # Records appended after a restart must use the anchor already in the header
+            self.file = open(self.path, "r+b")
+            _, _, _, old_wall_ns, old_mono_ns = struct.unpack(HEADER_FORMAT, self.file.read(struct.calcsize(HEADER_FORMAT)))
+            self.mono_offset_ns = (wall_ns - old_wall_ns) - (mono_ns - old_mono_ns)
+            size = os.path.getsize(self.path)
+            self.file.seek(size - (size - HEADER_SIZE) % RECORD_SIZE)
+            self.file.truncate()
+        else:
+            self.file = open(self.path, "wb")
+            header = struct.pack(HEADER_FORMAT, MAGIC, VERSION, RECORD_SIZE, wall_ns, mono_ns)
+            self.file.write(header.ljust(HEADER_SIZE, b"\0"))
+            self.mono_offset_ns = 0
+
+        self.symbol_ids = self.register_symbols(reopened)
+
+        midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+        self.rotate_at_ns = mono_ns + int((midnight - now).total_seconds() * 1e9)
+
+    def register_symbols(self, reopened):
+        """Symbol id in the log of each of self.symbols, new symbols are appended to the sidecar"""
+        symbols_path = self.path[:-len(".bin")] + ".symbols.json"
+        log_symbols = []
+        if reopened and os.path.exists(symbols_path):
+            with open(symbols_path) as f:
+                log_symbols = json.load(f)
+        added = [symbol for symbol in self.symbols if symbol not in log_symbols]
+        if added or not reopened:
+            log_symbols += added
+            tmp_path = symbols_path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(log_symbols, f)
+            os.replace(tmp_path, symbols_path)
+        return [log_symbols.index(symbol) for symbol in self.symbols]
+
+    def record(self, index, tick_type, price, size=0.0):
+        """Append one tick of self.symbols[index], called from the IB reader thread"""
+        ts_ns = time.monotonic_ns()
+        with self.lock:
+            if ts_ns >= self.rotate_at_ns:
+                self.rotate()
+            struct.pack_into(RECORD_FORMAT, self.buffer, self.buffer_offset,
+                             ts_ns + self.mono_offset_ns, self.symbol_ids[index], tick_type, price, size)
+            self.buffer_offset += RECORD_SIZE
+            if self.buffer_offset == len(self.buffer):
+                self.write_buffer()
+
+    def write_buffer(self):
+        if self.buffer_offset:
+            self.file.write(memoryview(self.buffer)[:self.buffer_offset])
+            self.records_written += self.buffer_offset // RECORD_SIZE
+            self.buffer_offset = 0
+
+    def flush(self):
+        """Write buffered records and fsync the log"""
+        with self.lock:
+            if self.file is None:
+                return
+            self.write_buffer()
+            self.file.flush()
+            os.fsync(self.file.fileno())
+
+    def rotate(self):
+        self.write_buffer()
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+        self.open_log()
+
+    def fsync_worker(self):
+        while not self.stop_event.wait(self.fsync_interval):
+            self.flush()
+
+    def close(self):
+        self.stop_event.set()
+        self.fsync_thread.join()
+        self.flush()
+        with self.lock:
+            self.file.close()
+            self.file = None
+
+
+def read_header(path):
+    with open(path, "rb") as f:
+        magic, version, record_size, wall_anchor_ns, mono_anchor_ns = struct.unpack(
+            HEADER_FORMAT, f.read(struct.calcsize(HEADER_FORMAT)))
+    if magic != MAGIC or record_size != RECORD_SIZE:
+        raise ValueError(f"{path} is not a tick log (version {VERSION})")
+    return {'version': version, 'wall_anchor_ns': wall_anchor_ns, 'mono_anchor_ns': mono_anchor_ns}
+
+
+def read_symbols(path):
+    with open(path[:-len(".bin")] + ".symbols.json") as f:
+        return json.load(f)
+
+
+def read_ticks(path):
+    """Memory-map a tick log as a read-only NumPy structured array (TICK_DTYPE)"""
+    read_header(path)
+    count = (os.path.getsize(path) - HEADER_SIZE) // RECORD_SIZE
+    if count == 0:
+        return np.empty(0, dtype=TICK_DTYPE)
+    return np.memmap(path, dtype=TICK_DTYPE, mode='r', offset=HEADER_SIZE, shape=(count,))
+
+
+def tick_epoch_ns(ticks, header):
+    """Wall clock epoch ns of each tick"""
+    return ticks['ts_ns'] - header['mono_anchor_ns'] + header['wall_anchor_ns']
+
+
+def local_offset_ns(epoch_ns):
+    """Local UTC offset in ns in effect at each timestamp, looked up once per hour (DST changes on the hour)"""
+    hours, inverse = np.unique(np.asarray(epoch_ns) // (3600 * 10**9), return_inverse=True)
+    offsets = np.array([int(datetime.fromtimestamp(int(hour) * 3600).astimezone().utcoffset().total_seconds() * 1e9)
+                        for hour in hours], dtype=np.int64)
+    return offsets[inverse]
+
+
+def ticks_to_bars(ticks, header, symbol_id, interval_seconds):
+    """
+    Rebuild OHLCV bars of one symbol from a tick log. Prices come from LAST
+    ticks, volume from LAST_SIZE ticks. Bars are keyed by their start in
+    epoch seconds (local wall clock, like the realtime bars).
+    """
+    ticks = ticks[ticks['symbol_id'] == symbol_id]
+    epoch_ns = tick_epoch_ns(ticks, header)
+    bucket = (epoch_ns + local_offset_ns(epoch_ns)) // (interval_seconds * 10**9) * interval_seconds
+
+    prices = ticks['tick_type'] == TICK_LAST
+    price_bucket, price = bucket[prices], ticks['price'][prices]
+    starts, first = np.unique(price_bucket, return_index=True)
+    if len(starts) == 0:
+        return {col: np.empty(0) for col in ('timestamp', 'open', 'high', 'low', 'close', 'volume')}
+    last = np.append(first[1:], len(price)) - 1
+
+    sizes = ticks['tick_type'] == TICK_LAST_SIZE
+    volume = np.zeros(len(starts))
+    positions = np.searchsorted(starts, bucket[sizes])
+    valid = (positions < len(starts)) & (starts[np.minimum(positions, len(starts) - 1)] == bucket[sizes])
+    np.add.at(volume, positions[valid], ticks['size'][sizes][valid])
+
+    return {
+        'timestamp': starts,
+        'open': price[first],
+        'high': np.maximum.reduceat(price, first),
+        'low': np.minimum.reduceat(price, first),
+        'close': price[last],
+        'volume': volume,
+    }
@@ -0,0 +1,178 @@
+"""
+TradingView alert ingestion decoupled from order placement.
+
+The HTTP handler only parses and validates the alert (once), hands it to
+OrderWorkers and answers 202. Placing the order and recording it happen on
+worker threads. Alerts of one symbol always go to the same worker, so they
+are processed in arrival order, while different symbols proceed in
+parallel.
+
+With an IdempotencyCache the handler claims the alert's key and the worker
+completes it once the order was placed, or releases it if placing failed,
+so a retry of a failed alert is processed again.
+
+Usage:
+    workers = OrderWorkers(handle_alert, num_workers=4, idempotency=IdempotencyCache())
+    run_server(workers, port=5678)  # aiohttp, blocks
+"""
+
+import json
+import queue
+import threading
+import time
+import zlib
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+REQUIRED_FIELDS = ('ticker', 'action', 'contract', 'order', 'price', 'reason')
+DEFAULT_QUANTITY = 1
+# Answer to retries of an alert whose order was placed
+PLACED_RESPONSE = ("Order placed successfully", 200)
+
+
+class AlertError(ValueError):
+    """Alert that cannot be turned into an order, answered with 400"""
+
+
+def parse_alert(body) -> dict:
+    """Parse and normalize a webhook body (bytes or str), raises AlertError"""
+    try:
+        data = orjson.loads(body) if orjson is not None else json.loads(body)
+    except ValueError as e:  # orjson.JSONDecodeError and json.JSONDecodeError both subclass it
+        raise AlertError(f"Invalid JSON: {e}")
+    if not isinstance(data, dict):
+        raise AlertError("Invalid JSON: expected an object")
+
+    for field in REQUIRED_FIELDS:
+        if field not in data:
+            raise AlertError(f"Missing required field: {field}")
+
+    symbol = str(data['ticker'])  # MES1!, MGC1!, AAPL
+    contract_type = data['contract']  # STK, FUT
+    # Handle futures contract symbols
+    if contract_type == "FUT":
+        symbol = symbol[:-2] if len(symbol) > 2 and symbol[-1] == '!' and symbol[-2].isdigit() else symbol
+
+    try:
+        price = float(data['price'])
+        quantity = int(data.get('quantity', DEFAULT_QUANTITY))
+    except (TypeError, ValueError) as e:
+        raise AlertError(f"Invalid price or quantity format: {str(e)}")
+
+    return {
+        'symbol': symbol,
+        'contract_type': contract_type,
+        'exchange': data.get('exchange'),  # SMART, CME, NYSE, etc
+        'order_type': data['order'],  # MKT, LMT
+        'action': str(data['action']).upper(),  # BUY, SELL
+        'reason': str(data['reason']).lower(),  # Open-Long, Open-Short, Close-Long, Close-Short
+        'price': price,
+        'quantity': quantity,
+        'received': time.monotonic(),
+        'raw': data,
+    }
+
+
+class OrderWorkers:
+    """Worker threads calling handler(alert), alerts of a symbol stay in arrival order"""
+
+    def __init__(self, handler, num_workers=4, idempotency=None):
+        if num_workers < 1:
+            raise ValueError("num_workers must be at least 1")
+        self.handler = handler
+        self.idempotency = idempotency
+        self.queues = [queue.Queue() for _ in range(num_workers)]
+        self.threads = [threading.Thread(target=self.run, args=(q,), daemon=True) for q in self.queues]
+
+        self.stats_lock = threading.Lock()
+        self.stats = {'enqueued': 0, 'processed': 0, 'failed': 0, 'total_wait': 0.0, 'max_wait': 0.0}
+        for thread in self.threads:
+            thread.start()
+
+    def submit(self, alert: dict, key=None):
+        """Queue an alert, key is its claimed idempotency key, if any"""
+        # crc32 rather than hash(), which is salted per process
+        index = zlib.crc32(alert['symbol'].encode()) % len(self.queues)
+        self.queues[index].put((alert, key))
+        with self.stats_lock:
+            self.stats['enqueued'] += 1
+
+    def run(self, alerts: queue.Queue):
+        while True:
+            item = alerts.get()
+            if item is None:
+                return
+            alert, key = item
+            wait = time.monotonic() - alert['received']
+            try:
+                self.handler(alert)
+                failed = False
+            except Exception as e:
+                print(f"Error executing alert {alert['symbol']} {alert['action']}: {e}")
+                failed = True
+            if key is not None:
+                if failed:
+                    self.idempotency.release(key)
+                else:
+                    self.idempotency.complete(key, PLACED_RESPONSE)
+            with self.stats_lock:
+                self.stats['failed' if failed else 'processed'] += 1
+                self.stats['total_wait'] += wait
+                self.stats['max_wait'] = max(self.stats['max_wait'], wait)
+
+    def get_stats(self) -> dict:
+        with self.stats_lock:
+            stats = dict(self.stats)
+        done = stats['processed'] + stats['failed']
+        stats['avg_wait'] = stats['total_wait'] / done if done else 0.0
+        stats['queued'] = sum(q.qsize() for q in self.queues)
+        return stats
+
+    def close(self):
+        """Finish the queued alerts, then stop the workers"""
+        for q in self.queues:
+            q.put(None)
+        for thread in self.threads:
+            thread.join()
+
+
+def create_app(workers: OrderWorkers, path='/webhook'):
+    """aiohttp application accepting alerts on path, duplicates are dropped if the workers have an IdempotencyCache"""
+    from aiohttp import web
+    from .idempotency_cache import alert_key
+
+    idempotency = workers.idempotency
+
+    async def webhook(request):
+        try:
+            alert = parse_alert(await request.read())
+        except AlertError as e:
+            return web.Response(status=400, text=str(e))
+
+        # Completed or released by the worker once the order was placed or failed
+        key = alert_key(alert) if idempotency is not None else None
+        if key is not None:
+            cached = idempotency.claim(key)
+            if cached is not None:
+                return web.Response(status=cached[1], text=cached[0])
+        workers.submit(alert, key)
+        return web.Response(status=202, text="Accepted")
+
+    async def stats(request):
+        stats = workers.get_stats()
+        if idempotency is not None:
+            stats['idempotency'] = idempotency.get_stats()
+        return web.json_response(stats)
+
+    app = web.Application()
+    app.router.add_post(path, webhook)
+    app.router.add_get(f"{path}/stats", stats)
+    return app
+
+
+def run_server(workers: OrderWorkers, port=5678, host='127.0.0.1'):
+    from aiohttp import web
+    web.run_app(create_app(workers), host=host, port=port)
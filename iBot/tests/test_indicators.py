@@ -0,0 +1,61 @@
+import os
+import sqlite3
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+sys.path.append(SRC_DIR)
+
+from strategies.indicators import ATR, SuperTrend, TrueRange
+from strategies.supertrend_basic import clean_data, supertrend
+
+TEST_DB = os.path.join(SRC_DIR, "strategies", "historical_data_for_test_indicators.db")
+
+
+@pytest.fixture(scope="module")
+def data():
+    with sqlite3.connect(TEST_DB) as conn:
+        return clean_data(pd.read_sql_query("SELECT * FROM historical_data", conn))
+
+
+def batch_true_range(data):
+    high, low, close = data['high'], data['low'], data['close']
+    return pd.concat([high - low, abs(high - close.shift(1)), abs(low - close.shift(1))], axis=1).max(axis=1)
+
+
+def stream(indicator, data):
+    return [indicator.update(bar) for bar in data[['high', 'low', 'close']].to_dict('records')]
+
+
+def test_true_range_matches_batch(data):
+    assert np.array_equal(stream(TrueRange(), data), batch_true_range(data).to_numpy())
+
+
+def test_ewm_atr_matches_pandas_exactly(data):
+    expected = batch_true_range(data).ewm(com=10, min_periods=10).mean().to_numpy()
+    assert np.array_equal(stream(ATR(10, 'ewm'), data), expected, equal_nan=True)
+
+
+def test_sma_atr_matches_rolling_mean(data):
+    expected = batch_true_range(data).rolling(window=10).mean().to_numpy()
+    np.testing.assert_allclose(stream(ATR(10, 'sma'), data), expected, rtol=1e-12, atol=1e-12)
+
+
+def test_wilder_atr(data):
+    tr = batch_true_range(data).to_numpy()
+    values = stream(ATR(10, 'wilder'), data)
+    assert np.isnan(values[:9]).all()
+    assert values[9] == pytest.approx(tr[:10].mean())
+    assert values[10] == pytest.approx((values[9] * 9 + tr[10]) / 10)
+
+
+@pytest.mark.parametrize("period,multiplier", [(10, 3), (7, 2.5)])
+def test_supertrend_matches_batch_exactly(data, period, multiplier):
+    expected = supertrend(data, period, multiplier)
+    results = stream(SuperTrend(period, multiplier), data)
+
+    assert np.array_equal([value for value, _ in results], expected['supertrend'].to_numpy(), equal_nan=True)
+    assert np.array_equal([direction for _, direction in results], expected['direction'].to_numpy(), equal_nan=True)
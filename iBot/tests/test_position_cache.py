@@ -0,0 +1,42 @@
+import os
+import sys
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+sys.path.append(SRC_DIR)
+
+from utils.position_cache import PositionCache
+
+
+def test_fill_after_first_position_report_is_applied():
+    cache = PositionCache()
+    cache.on_position('A', 'MES', 1)
+    assert cache.apply_fill('e1', 'A', 'MES', 'BOT', 1)
+    assert cache.get('MES') == 2
+
+
+def test_fill_after_initial_reconcile_is_applied():
+    cache = PositionCache()
+    cache.apply_fill('e1', 'A', 'MES', 'BOT', 1)
+    cache.begin_reconcile()
+    cache.on_position('A', 'MES', 3)  # snapshot of fills made before the cache started
+    cache.end_reconcile()
+    assert cache.apply_fill('e2', 'A', 'MES', 'BOT', 1)
+    assert cache.get('MES') == 4
+
+
+def test_fill_already_in_a_position_update_is_not_counted_twice():
+    cache = PositionCache()
+    cache.on_position('A', 'MES', 1)
+    cache.on_position('A', 'MES', 2)  # includes the fill below
+    assert not cache.apply_fill('e1', 'A', 'MES', 'BOT', 1)
+    assert cache.get('MES') == 2
+    # The change is consumed, the next fill is new
+    assert cache.apply_fill('e2', 'A', 'MES', 'BOT', 1)
+    assert cache.get('MES') == 3
+
+
+def test_duplicate_exec_id_is_ignored():
+    cache = PositionCache()
+    assert cache.apply_fill('e1', 'A', 'MES', 'SLD', 2)
+    assert not cache.apply_fill('e1', 'A', 'MES', 'SLD', 2)
+    assert cache.get('MES') == -2
@@ -0,0 +1,104 @@
+import os
+import sys
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+sys.path.append(SRC_DIR)
+
+from utils.redis_order_writer import OrderStatusWriter
+
+
+def has_lua():
+    try:
+        fakeredis.FakeRedis().script_load("return 1")
+        return True
+    except Exception:
+        return False
+
+
+@pytest.fixture(params=[False, pytest.param(True, marks=pytest.mark.skipif(not has_lua(), reason="needs lupa"))],
+                ids=["pipelined", "lua"])
+def writer(request):
+    # Long interval so the test decides when a batch is flushed
+    writer = OrderStatusWriter(fakeredis.FakeRedis(decode_responses=True), flush_interval=60,
+                               use_script=request.param)
+    yield writer
+    writer.close()
+
+
+def test_updates_of_an_order_are_coalesced(writer):
+    writer.create(1, {'symbol': 'MES', 'status': 'Submitted', 'filled': '0'})
+    writer.flush()
+    for filled in ('1', '2', '3'):
+        writer.update(1, {'status': 'PartiallyFilled', 'filled': filled})
+    writer.update(1, {'status': 'Filled'})
+    writer.flush()
+
+    assert writer.redis.hgetall("order:1") == {'symbol': 'MES', 'status': 'Filled', 'filled': '3'}
+    stats = writer.get_stats()
+    assert stats['batches'] == 2 and stats['coalesced'] == 3 and stats['written'] == 2
+
+
+def test_status_of_unrecorded_order_is_skipped(writer):
+    writer.update(7, {'status': 'Submitted'})
+    writer.flush()
+
+    assert not writer.redis.exists("order:7")
+    assert writer.get_stats()['missing'] == 1
+
+
+def test_status_before_record_is_kept_in_same_batch(writer):
+    writer.update(2, {'status': 'Filled'})
+    writer.create(2, {'symbol': 'MNQ', 'status': 'Submitted'})
+    writer.flush()
+
+    assert writer.redis.hgetall("order:2") == {'symbol': 'MNQ', 'status': 'Filled'}
+
+
+def test_close_flushes_pending_writes():
+    writer = OrderStatusWriter(fakeredis.FakeRedis(decode_responses=True), flush_interval=60, use_script=False)
+    writer.create(3, {'symbol': 'MGC'})
+    writer.close()
+
+    assert writer.redis.hgetall("order:3") == {'symbol': 'MGC'}
+
+
+class FlakyRedis:
+    """fakeredis whose pipelines fail while down is set"""
+
+    def __init__(self):
+        self.redis = fakeredis.FakeRedis(decode_responses=True)
+        self.down = True
+
+    def pipeline(self, transaction=True):
+        if self.down:
+            raise ConnectionError("Redis is down")
+        return self.redis.pipeline(transaction=transaction)
+
+    def __getattr__(self, name):
+        return getattr(self.redis, name)
+
+
+def test_failed_batch_is_retried_under_newer_fields():
+    writer = OrderStatusWriter(FlakyRedis(), flush_interval=60, use_script=False)
+    try:
+        writer.create(4, {'symbol': 'MES', 'status': 'PendingSubmit'})
+        writer.update(5, {'status': 'Submitted', 'filled': '0'})
+        writer.flush()
+        assert writer.get_stats()['errors'] == 1 and writer.get_stats()['pending'] == 2
+        assert writer.backoff > 0
+
+        writer.update(4, {'status': 'Submitted'})
+        writer.update(5, {'status': 'Filled'})
+        writer.redis.down = False
+        writer.redis.hset("order:5", mapping={'symbol': 'MNQ'})
+        writer.flush()
+    finally:
+        writer.close()
+
+    assert writer.redis.hgetall("order:4") == {'symbol': 'MES', 'status': 'Submitted'}
+    assert writer.redis.hgetall("order:5") == {'symbol': 'MNQ', 'status': 'Filled', 'filled': '0'}
+    assert writer.get_stats()['pending'] == 0 and writer.backoff == 0
@@ -0,0 +1,75 @@
+import os
+import sys
+
+import pytest
+
+pytest.importorskip("ibapi")
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+sys.path.append(SRC_DIR)
+
+from strategies.BaseStrategy import BaseStrategy
+from strategies.SignalProcessor import SignalProcessor, SignalType, TradingSignal
+
+
+class DelayedOrderManager:
+    """Records orders, the position only changes when the test fills them"""
+
+    def __init__(self, position=0):
+        self.position = position
+        self.orders = []
+
+    def get_position_for_symbol(self, symbol):
+        return {'position': self.position}
+
+    def placeOrder(self, contract, order):
+        self.orders.append((order.action, order.totalQuantity))
+
+    def fill_all(self):
+        for action, quantity in self.orders:
+            self.position += quantity if action == "BUY" else -quantity
+        self.orders = []
+
+
+class AlwaysBuy(BaseStrategy):
+    def __init__(self):
+        super().__init__()
+        self.symbols = {'MES'}
+
+    def generate_signals(self):
+        return [TradingSignal('MES', SignalType.BUY, 5000.0)]
+
+
+@pytest.fixture
+def processor():
+    order_manager = DelayedOrderManager(position=-1)
+    processor = SignalProcessor(order_manager, max_position_size=1)
+    processor.add_strategy(AlwaysBuy())
+    return processor
+
+
+def test_repeat_is_suppressed_while_the_position_has_not_moved(processor):
+    order_manager = processor.order_manager
+    for _ in range(5):
+        processor.on_price('MES', 5000.0)
+    assert order_manager.orders == [("BUY", 1)]
+
+    # The fill arrives, the next step of the reversal goes out once
+    order_manager.fill_all()
+    for _ in range(5):
+        processor.on_price('MES', 5000.0)
+    assert order_manager.orders == [("BUY", 1)]
+
+    order_manager.fill_all()
+    for _ in range(5):
+        processor.on_price('MES', 5000.0)
+    assert order_manager.orders == [] and order_manager.position == 1
+    assert processor.coalescer.get_stats()['forwarded'] == 3
+
+
+def test_reset_lets_the_repeat_through(processor):
+    processor.on_price('MES', 5000.0)
+    # The order was rejected, the position will not move
+    processor.coalescer.reset('AlwaysBuy', 'MES')
+    processor.on_price('MES', 5000.0)
+    assert processor.order_manager.orders == [("BUY", 1), ("BUY", 1)]
@@ -0,0 +1,29 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+sys.path.append(SRC_DIR)
+
+from strategies.vectorized_backtest import vectorized_backtest
+
+
+@pytest.mark.parametrize("close, trend", [([1., 2., 3.], [1, 1, 1]), ([], [])], ids=["no_flip", "empty"])
+def test_no_flip_gives_no_trades_and_flat_equity(close, trend):
+    result = vectorized_backtest(np.arange(len(close)), close, trend)
+
+    assert result['trades'].empty and result['num_trades'] == 0
+    assert np.array_equal(result['equity'], np.zeros(len(close)))
+    assert result['total_profit'] == 0.0 and result['max_drawdown'] == 0.0 and result['win_rate'] == 0.0
+
+
+def test_flips_reverse_the_position():
+    close = [10., 11., 12., 11., 9.]
+    result = vectorized_backtest(np.arange(5), close, [-1, 1, 1, -1, -1], commission_per_contract=0)
+
+    trades = result['trades']
+    assert list(trades['position']) == [1, -1]
+    assert list(trades['entry_price']) == [11., 11.] and list(trades['exit_price']) == [11., 9.]
+    assert result['equity'][-1] == result['total_profit'] == trades['profit'].sum()
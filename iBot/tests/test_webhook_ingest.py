@@ -0,0 +1,118 @@
+import asyncio
+import json
+import os
+import sys
+import threading
+
+import pytest
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+sys.path.append(SRC_DIR)
+
+from utils.idempotency_cache import IN_PROGRESS, IdempotencyCache, alert_key
+from utils.webhook_ingest import PLACED_RESPONSE, AlertError, OrderWorkers, create_app, parse_alert
+
+ALERT = {"ticker": "MES1!", "contract": "FUT", "exchange": "CME", "order": "LMT", "action": "buy",
+         "price": "5000.25", "quantity": "2", "reason": "Open-Long", "time": "2026-01-02T15:30:00Z"}
+
+
+def body(**fields):
+    return json.dumps(dict(ALERT, **fields)).encode()
+
+
+def test_parse_alert_normalizes_fields():
+    alert = parse_alert(body())
+    assert alert['symbol'] == 'MES'
+    assert alert['action'] == 'BUY' and alert['reason'] == 'open-long'
+    assert alert['price'] == 5000.25 and alert['quantity'] == 2
+    assert alert['raw']['ticker'] == 'MES1!'
+
+
+def test_parse_alert_keeps_stock_symbol():
+    assert parse_alert(body(ticker="AAPL", contract="STK"))['symbol'] == 'AAPL'
+
+
+@pytest.mark.parametrize("raw", [b"not json", b"[1, 2]", json.dumps({"ticker": "MES1!"}).encode(),
+                                 body(price="abc")])
+def test_parse_alert_rejects_invalid_bodies(raw):
+    with pytest.raises(AlertError):
+        parse_alert(raw)
+
+
+class Handler:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.alerts = []
+        self.called = threading.Event()
+
+    def __call__(self, alert):
+        self.alerts.append(alert)
+        self.called.set()
+        if self.fail:
+            raise ConnectionError("TWS not connected")
+
+
+def run_alert(handler, cache):
+    workers = OrderWorkers(handler, num_workers=2, idempotency=cache)
+    alert = parse_alert(body())
+    key = alert_key(alert)
+    assert cache.claim(key) is None
+    workers.submit(alert, key)
+    workers.close()
+    return workers, key
+
+
+def test_failed_alert_releases_its_key():
+    cache = IdempotencyCache()
+    workers, key = run_alert(Handler(fail=True), cache)
+
+    assert workers.get_stats()['failed'] == 1
+    # The retry is processed again instead of being answered from the cache
+    assert cache.claim(key) is None
+
+
+def test_placed_alert_completes_its_key():
+    cache = IdempotencyCache()
+    workers, key = run_alert(Handler(), cache)
+
+    assert workers.get_stats()['processed'] == 1
+    assert cache.claim(key) == PLACED_RESPONSE
+
+
+def post_alerts(workers, *bodies):
+    pytest.importorskip("aiohttp")
+    from aiohttp.test_utils import TestClient, TestServer
+
+    async def post():
+        async with TestClient(TestServer(create_app(workers))) as client:
+            responses = []
+            for raw in bodies:
+                response = await client.post('/webhook', data=raw)
+                responses.append((response.status, await response.text()))
+            return responses
+
+    return asyncio.run(post())
+
+
+def test_handler_answers_202_and_queues_the_alert():
+    handler = Handler()
+    workers = OrderWorkers(handler, num_workers=1)
+    try:
+        accepted, invalid = post_alerts(workers, body(), b"not json")
+        assert handler.called.wait(1)
+    finally:
+        workers.close()
+    assert accepted == (202, "Accepted") and invalid[0] == 400
+    assert [alert['symbol'] for alert in handler.alerts] == ['MES']
+
+
+def test_handler_answers_retry_while_the_order_is_placed():
+    release = threading.Event()
+    workers = OrderWorkers(lambda alert: release.wait(1), num_workers=1, idempotency=IdempotencyCache())
+    try:
+        first, retry = post_alerts(workers, body(), body())
+    finally:
+        release.set()
+        workers.close()
+    assert first == (202, "Accepted")
+    assert retry == (IN_PROGRESS[1], IN_PROGRESS[0])